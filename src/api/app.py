@@ -1,9 +1,9 @@
 import asyncio
 
-import sentry_sdk
 from fastapi import FastAPI
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 
+from api.auth import get_key_set
 from api.dependencies import UnauthenticatedException
 from api.error_handling import handle_unauthenticated_exception
 from api.router.full_project_structure import full_project_router
@@ -12,20 +12,29 @@ from api.router.project_credentials import project_credentials_router
 from api.router.project_deploy import project_deploy_router
 from config import settings
 from database.db import DatabaseWrapper
+from database.indexes import ensure_indexes
+from utils.profiling import startup_phase
+from utils.tracing import TailSamplingMiddleware, init_tracing, keeps_slow_requests
 
 
 def get_application(loop=None):
-    sentry_sdk.init(dsn=settings.sentry_url, traces_sample_rate=1.0)
+    with startup_phase("sentry"):
+        init_tracing()
 
     DatabaseWrapper.set_event_loop(loop or asyncio.get_event_loop())
 
-    app = FastAPI(title="Deploy Service")
+    with startup_phase("application"):
+        app = FastAPI(title="Deploy Service")
 
-    app.include_router(projects_router)
-    app.include_router(project_credentials_router)
-    app.include_router(project_deploy_router)
-    app.include_router(full_project_router)
-    app.add_exception_handler(
-        UnauthenticatedException, handle_unauthenticated_exception
-    )
+        app.include_router(projects_router)
+        app.include_router(project_credentials_router)
+        app.include_router(project_deploy_router)
+        app.include_router(full_project_router)
+        app.add_exception_handler(
+            UnauthenticatedException, handle_unauthenticated_exception
+        )
+        app.add_event_handler("startup", ensure_indexes)
+        app.add_event_handler("startup", get_key_set)
+    if settings.tracing_enabled and keeps_slow_requests():
+        return SentryAsgiMiddleware(TailSamplingMiddleware(app))
     return SentryAsgiMiddleware(app)
@@ -0,0 +1,90 @@
+import functools
+import hashlib
+import time
+import typing
+
+from jose import jwk, jwt
+from jose.backends.base import Key
+from jose.constants import ALGORITHMS
+
+from config import settings
+from utils.cache import TTLCache
+
+AUDIENCE = "fastapi-users:auth"
+
+
+class PreparedKey(typing.NamedTuple):
+    algorithm: str
+    kid: str | None
+    key: Key
+
+
+class KeySet:
+    """
+    Keys valid tokens are signed with, built once. A token is verified with
+    the keys of its algorithm and of its "kid", keys without a kid match any.
+    """
+
+    def __init__(self, keys: list[PreparedKey]):
+        self.keys = keys
+        self.algorithms = sorted({key.algorithm for key in keys})
+
+    @classmethod
+    def from_settings(cls) -> "KeySet":
+        keys = [
+            PreparedKey(
+                ALGORITHMS.HS256,
+                None,
+                jwk.construct(settings.jwt_secret, ALGORITHMS.HS256),
+            )
+        ]
+        for key_data in settings.jwt_keys:
+            keys.append(
+                PreparedKey(
+                    key_data["alg"], key_data.get("kid"), jwk.construct(key_data)
+                )
+            )
+        return cls(keys)
+
+    def get_keys(self, header: dict) -> list[Key]:
+        kid = header.get("kid")
+        return [
+            key.key
+            for key in self.keys
+            if key.algorithm == header.get("alg") and key.kid in (None, kid)
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_key_set() -> KeySet:
+    return KeySet.from_settings()
+
+
+# claims of verified tokens by the digest of the token
+verified_tokens: TTLCache[bytes, dict] = TTLCache(
+    ttl=settings.jwt_cache_ttl, maxsize=settings.jwt_cache_size
+)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Claims of a valid token, raises JWTError (ExpiredSignatureError if it
+    expired) otherwise. Tokens verified before are reused until they expire.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = verified_tokens.get(digest)
+    if claims is not None:
+        return claims
+
+    key_set = get_key_set()
+    claims = jwt.decode(
+        token,
+        key_set.get_keys(jwt.get_unverified_header(token)),
+        algorithms=key_set.algorithms,
+        audience=AUDIENCE,
+    )
+    expires_at = claims.get("exp")
+    verified_tokens.set(
+        digest, claims, None if expires_at is None else expires_at - time.time()
+    )
+    return claims
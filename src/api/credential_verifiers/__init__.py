@@ -1,18 +1,33 @@
-from api.credential_verifiers.amazon import verify_aws_credentials
-from api.credential_verifiers.azure import verify_azure_credentials
-from api.credential_verifiers.google import verify_gcp_credentials
+import functools
+
+from api.credential_verifiers.amazon import check_aws_credentials
+from api.credential_verifiers.azure import check_azure_credentials
+from api.credential_verifiers.google import check_gcp_credentials
+from api.credential_verifiers.verifier import CredentialsVerifier
 from api.models import ProjectCredentialsCreate
 from database.models import ProjectDB
+from shared.models.credentials import AWSCredentials, AzureCredentials, GCPCredentials
 from shared.models.providers import ServiceProviderType
 
 
+@functools.lru_cache(maxsize=None)
+def get_credentials_verifier() -> CredentialsVerifier:
+    return CredentialsVerifier(
+        {
+            ServiceProviderType.GCP: (GCPCredentials, check_gcp_credentials),
+            ServiceProviderType.AWS: (AWSCredentials, check_aws_credentials),
+            ServiceProviderType.AZURE: (AzureCredentials, check_azure_credentials),
+        }
+    )
+
+
 async def verify_credentials(
     project: ProjectDB, project_credentials: ProjectCredentialsCreate
-):
-    if project.service_provider == ServiceProviderType.GCP:
-        return await verify_gcp_credentials(project_credentials)
-    elif project.service_provider == ServiceProviderType.AWS:
-        return await verify_aws_credentials(project_credentials)
-    elif project.service_provider == ServiceProviderType.AZURE:
-        return await verify_azure_credentials(project_credentials)
-    return False
+) -> bool:
+    """
+    Whether the credentials are valid for the provider of the project, raises
+    VerificationUnavailable if the provider can't tell now
+    """
+    return await get_credentials_verifier().verify(
+        project.service_provider, project_credentials.credentials
+    )
@@ -1,6 +1,99 @@
-from api.models import ProjectCredentialsCreate
+import datetime
+import hashlib
+import hmac
 
+import httpx
 
-async def verify_aws_credentials(project_credentials: ProjectCredentialsCreate):
-    # TODO:
+from api.credential_verifiers.verifier import VerificationUnavailable
+from config import settings
+from shared.models.credentials import AWSCredentials
+
+STS_HOST = "sts.amazonaws.com"
+STS_REGION = "us-east-1"
+GET_CALLER_IDENTITY = "Action=GetCallerIdentity&Version=2011-06-15"
+FORM_CONTENT_TYPE = "application/x-www-form-urlencoded; charset=utf-8"
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def sign_request(
+    credentials: AWSCredentials,
+    method: str,
+    host: str,
+    query: str,
+    body: str,
+    headers: dict[str, str],
+    region: str,
+    service: str,
+    now: datetime.datetime,
+) -> dict[str, str]:
+    """Headers of a request signed with AWS Signature Version 4"""
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = now.strftime("%Y%m%d")
+    headers = {
+        **{name.lower(): value for name, value in headers.items()},
+        "host": host,
+        "x-amz-date": amz_date,
+    }
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join(
+        [
+            method,
+            "/",
+            query,
+            *(f"{name}:{headers[name]}" for name in sorted(headers)),
+            "",
+            signed_headers,
+            hashlib.sha256(body.encode()).hexdigest(),
+        ]
+    )
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join(
+        [
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ]
+    )
+    key = f"AWS4{credentials.secret_access_key}".encode()
+    for part in (date, region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    headers["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={credentials.access_key_id}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
+
+
+def check_aws_credentials(credentials: AWSCredentials) -> bool:
+    """Ask STS who the access key belongs to, any valid key may"""
+    headers = sign_request(
+        credentials,
+        "POST",
+        STS_HOST,
+        "",
+        GET_CALLER_IDENTITY,
+        {"content-type": FORM_CONTENT_TYPE},
+        STS_REGION,
+        "sts",
+        datetime.datetime.utcnow(),
+    )
+    try:
+        response = httpx.post(
+            f"https://{STS_HOST}/",
+            content=GET_CALLER_IDENTITY,
+            headers=headers,
+            timeout=settings.credentials_verification_timeout,
+        )
+    except httpx.HTTPError as e:
+        raise VerificationUnavailable(str(e))
+    # unknown keys and wrong secrets are 403
+    if response.status_code == 403:
+        return False
+    if response.status_code != 200:
+        raise VerificationUnavailable(f"AWS STS answered {response.status_code}")
     return True
@@ -1,6 +1,33 @@
-from api.models import ProjectCredentialsCreate
+import urllib.parse
 
+import httpx
 
-async def verify_azure_credentials(project_credentials: ProjectCredentialsCreate):
-    # TODO:
+from api.credential_verifiers.verifier import VerificationUnavailable
+from config import settings
+from shared.models.credentials import AzureCredentials
+
+TOKEN_URL = "https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+MANAGEMENT_SCOPE = "https://management.azure.com/.default"
+
+
+def check_azure_credentials(credentials: AzureCredentials) -> bool:
+    """Request an access token of the service principal"""
+    try:
+        response = httpx.post(
+            TOKEN_URL.format(tenant_id=urllib.parse.quote(credentials.tenant_id, "")),
+            data={
+                "grant_type": "client_credentials",
+                "client_id": credentials.client_id,
+                "client_secret": credentials.client_secret,
+                "scope": MANAGEMENT_SCOPE,
+            },
+            timeout=settings.credentials_verification_timeout,
+        )
+    except httpx.HTTPError as e:
+        raise VerificationUnavailable(str(e))
+    # unknown tenants and clients are 400, wrong secrets are 401
+    if response.status_code in (400, 401):
+        return False
+    if response.status_code != 200:
+        raise VerificationUnavailable(f"Azure answered {response.status_code}")
     return True
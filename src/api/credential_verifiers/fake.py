@@ -0,0 +1,33 @@
+import threading
+import time
+
+from pydantic import BaseModel
+
+from api.credential_verifiers.verifier import VerificationUnavailable
+
+
+class FakeProvider:
+    """
+    Provider accepting the `valid` credentials, without network calls. The
+    checks are counted, and take `delay` seconds. For tests.
+    """
+
+    def __init__(
+        self,
+        valid: list[BaseModel] | None = None,
+        delay: float = 0,
+        available: bool = True,
+    ):
+        self.valid = valid or []
+        self.delay = delay
+        self.available = available
+        self.checks = 0
+        self._lock = threading.Lock()
+
+    def check(self, credentials: BaseModel) -> bool:
+        with self._lock:
+            self.checks += 1
+        time.sleep(self.delay)
+        if not self.available:
+            raise VerificationUnavailable("Fake provider is unavailable")
+        return credentials in self.valid
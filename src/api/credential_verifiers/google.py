@@ -1,6 +1,30 @@
-from api.models import ProjectCredentialsCreate
+from api.credential_verifiers.verifier import VerificationUnavailable
+from shared.models.credentials import GCPCredentials
 
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
 
-async def verify_gcp_credentials(project_credentials: ProjectCredentialsCreate):
-    # TODO:
+
+def check_gcp_credentials(credentials: GCPCredentials) -> bool:
+    """Exchange the service account key for an access token"""
+    # the SDK is imported on the first check, it is slow to import and only
+    # needed by the processes verifying GCP credentials
+    from google.auth.exceptions import RefreshError, TransportError
+    from google.auth.transport.requests import Request
+    from google.oauth2 import service_account
+
+    try:
+        service_account_credentials = (
+            service_account.Credentials.from_service_account_info(
+                credentials.dict(), scopes=[CLOUD_PLATFORM_SCOPE]
+            )
+        )
+    except ValueError:
+        # e.g. a malformed private key
+        return False
+    try:
+        service_account_credentials.refresh(Request())
+    except RefreshError:
+        return False
+    except TransportError as e:
+        raise VerificationUnavailable(str(e))
     return True
@@ -0,0 +1,92 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import typing
+
+from pydantic import BaseModel
+
+from config import settings
+from shared.models.providers import ServiceProviderType
+from utils.cache import TTLCache
+
+# blocking check of the credentials with the provider, True if they are valid
+Check = typing.Callable[[BaseModel], bool]
+
+
+class VerificationUnavailable(Exception):
+    """The provider can't tell if the credentials are valid now, e.g. it timed out"""
+
+
+def get_fingerprint(provider: ServiceProviderType, credentials: BaseModel) -> str:
+    encoded = credentials.json(sort_keys=True).encode()
+    return hashlib.sha256(provider.value.encode() + b":" + encoded).hexdigest()
+
+
+class CredentialsVerifier:
+    """
+    Checks credentials with their provider without blocking the event loop.
+
+    Checks run in a bounded thread pool and time out after `timeout`
+    seconds. Results are cached by a fingerprint of the credentials, valid
+    ones for `valid_ttl` seconds and invalid ones for `invalid_ttl`, and
+    concurrent verifications of the same credentials share one check.
+    Unavailable providers aren't cached.
+    """
+
+    def __init__(
+        self,
+        checks: dict[ServiceProviderType, tuple[typing.Type[BaseModel], Check]],
+        timeout: float = settings.credentials_verification_timeout,
+        max_workers: int = settings.credentials_verification_workers,
+        valid_ttl: float = settings.credentials_valid_cache_ttl,
+        invalid_ttl: float = settings.credentials_invalid_cache_ttl,
+        cache_size: int = settings.credentials_cache_size,
+    ):
+        self.checks = checks
+        self.timeout = timeout
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="credentials-verifier"
+        )
+        self.cache: TTLCache[str, bool] = TTLCache(
+            ttl=max(valid_ttl, invalid_ttl), maxsize=cache_size
+        )
+        self._pending: dict[str, asyncio.Future] = {}
+
+    async def verify(
+        self, provider: ServiceProviderType, credentials: BaseModel
+    ) -> bool:
+        credentials_type, check = self.checks.get(provider, (None, None))
+        if check is None or not isinstance(credentials, credentials_type):
+            return False
+
+        fingerprint = get_fingerprint(provider, credentials)
+        valid = self.cache.get(fingerprint)
+        if valid is not None:
+            return valid
+
+        pending = self._pending.get(fingerprint)
+        if pending is None:
+            pending = asyncio.ensure_future(self.check(fingerprint, check, credentials))
+            self._pending[fingerprint] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(fingerprint, None))
+        # a cancelled request doesn't cancel the check of the other ones
+        return await asyncio.shield(pending)
+
+    async def check(
+        self, fingerprint: str, check: Check, credentials: BaseModel
+    ) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            valid = await asyncio.wait_for(
+                loop.run_in_executor(self.executor, check, credentials), self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise VerificationUnavailable(
+                f"Verification timed out after {self.timeout} seconds"
+            )
+        self.cache.set(
+            fingerprint, valid, self.valid_ttl if valid else self.invalid_ttl
+        )
+        return valid
@@ -1,13 +1,69 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import ExpiredSignatureError, JWTError, jwt
+from jose import ExpiredSignatureError, JWTError
 from pydantic import UUID4
 
+from api.auth import decode_token
 from api.models import InterServiceData, JwtUserData
-from config import settings
+from database.db import MongoDatabase
 from database.exceptions import ObjectDoesntExist
-from database.manager import ProjectManager, get_project_manager
-from database.models import ProjectDB
+from database.identity_map import IdentityMap, get_identity_map
+from database.manager import (
+    DeployBatchManager,
+    DeployJobManager,
+    ProjectCredentialsManager,
+    ProjectDeployManager,
+    ProjectDeployPlanManager,
+    ProjectManager,
+)
+from database.models import (
+    ProjectDB,
+    get_deploy_batch_database,
+    get_deploy_job_database,
+    get_project_credentials_database,
+    get_project_database,
+    get_project_deploy_database,
+    get_project_deploy_plan_database,
+)
+
+
+def get_project_manager(
+    project_db: MongoDatabase = Depends(get_project_database),
+    identity_map: IdentityMap | None = Depends(get_identity_map),
+):
+    return ProjectManager(project_db, identity_map)
+
+
+def get_project_credentials_manager(
+    project_credentials_db: MongoDatabase = Depends(get_project_credentials_database),
+    identity_map: IdentityMap | None = Depends(get_identity_map),
+):
+    return ProjectCredentialsManager(project_credentials_db, identity_map)
+
+
+def get_project_deploy_manager(
+    project_deploy_db: MongoDatabase = Depends(get_project_deploy_database),
+    identity_map: IdentityMap | None = Depends(get_identity_map),
+):
+    return ProjectDeployManager(project_deploy_db, identity_map)
+
+
+def get_project_deploy_plan_manager(
+    project_deploy_plan_db: MongoDatabase = Depends(get_project_deploy_plan_database),
+):
+    return ProjectDeployPlanManager(project_deploy_plan_db)
+
+
+def get_deploy_batch_manager(
+    deploy_batch_db: MongoDatabase = Depends(get_deploy_batch_database),
+):
+    return DeployBatchManager(deploy_batch_db)
+
+
+def get_deploy_job_manager(
+    deploy_job_db: MongoDatabase = Depends(get_deploy_job_database),
+):
+    return DeployJobManager(deploy_job_db)
 
 
 class UnauthenticatedException(Exception):
@@ -26,12 +82,7 @@ async def get_current_user(
     if authorization is None:
         raise UnauthenticatedException()
     try:
-        payload: dict = jwt.decode(
-            authorization.credentials,
-            settings.jwt_secret,
-            algorithms=jwt.ALGORITHMS.HS256,
-            audience="fastapi-users:auth",
-        )
+        payload: dict = decode_token(authorization.credentials)
     except ExpiredSignatureError:
         print("JWT token expired")
         raise UnauthenticatedException("Token expired")
@@ -47,12 +98,7 @@ async def get_current_inter_service_data(
     if authorization is None:
         raise UnauthenticatedException()
     try:
-        payload: dict = jwt.decode(
-            authorization.credentials,
-            settings.jwt_secret,
-            algorithms=jwt.ALGORITHMS.HS256,
-            audience="fastapi-users:auth",
-        )
+        payload: dict = decode_token(authorization.credentials)
     except ExpiredSignatureError:
         print("JWT token expired")
         raise UnauthenticatedException("Token expired")
@@ -73,3 +119,20 @@ async def get_project_or_404(
         return await project_manager.get(project_id, jwt_user_data.user_id)
     except ObjectDoesntExist:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+
+async def prefetch_project_objects(
+    project_db: ProjectDB = Depends(get_project_or_404),
+    project_deploy_manager: ProjectDeployManager = Depends(get_project_deploy_manager),
+    project_credentials_manager: ProjectCredentialsManager = Depends(
+        get_project_credentials_manager
+    ),
+) -> None:
+    """
+    Start loading the deploy and the credentials of the project in the path
+    at once, after `get_project_or_404` found that the user owns it.
+    Endpoints join the started lookups through the identity map of the
+    request.
+    """
+    project_deploy_manager.get_by_project(project_db.id)
+    project_credentials_manager.get_by_project(project_db.id)
@@ -2,6 +2,7 @@ from pydantic import UUID4, BaseModel
 
 from api import base_models
 from shared.models import credentials as shared_credentials
+from shared.models import deploy_types as shared_deploy_types
 from shared.models import mixins as shared_mixins
 from utils.models import optional
 
@@ -42,6 +43,51 @@ class ProjectDeployCreate(
     pass
 
 
+#########################
+# ProjectDeployPlan #####
+#########################
+class ProjectDeployPlan(shared_mixins.ProjectDeployPlanMixin, BaseModel):
+    pass
+
+
+class ProjectDeployPlanCreate(
+    shared_mixins.ProjectDeployPlanMixin, base_models.BaseCreateModel
+):
+    pass
+
+
+#########################
+# DeployBatch ###########
+#########################
+class DeployBatch(shared_mixins.DeployBatchMixin, BaseModel):
+    id: UUID4
+    progress: dict[str, int]
+
+
+class DeployBatchCreate(shared_mixins.DeployBatchMixin, base_models.BaseCreateModel):
+    pass
+
+
+class BulkProjectDeploy(BaseModel):
+    project_ids: list[UUID4]
+    deploy_type: shared_deploy_types.AWSProjectDeployType | shared_deploy_types.GCPProjectDeployType | shared_deploy_types.AzureProjectDeployType
+
+
+class BulkProjectDestroy(BaseModel):
+    project_ids: list[UUID4]
+
+
+#########################
+# DeployJob #############
+#########################
+class DeployJob(shared_mixins.DeployJobMixin, BaseModel):
+    id: UUID4
+
+
+class DeployJobCreate(shared_mixins.DeployJobMixin, base_models.BaseCreateModel):
+    pass
+
+
 #########################
 # FullProjectStructure ##
 #########################
@@ -0,0 +1,20 @@
+import typing
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+class ModelResponse(Response):
+    """
+    JSON response of a model or a list of models, serialized as they are.
+
+    Returning it skips the validation of `response_model`, so the content
+    must already be the response model (see `database.decoder`).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel | typing.Sequence[BaseModel]) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.json().encode("utf-8")
+        return ("[" + ",".join(model.json() for model in content) + "]").encode("utf-8")
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import UUID4
 
-from api.dependencies import get_current_user, get_project_or_404
+from api.dependencies import get_current_user, get_project_manager, get_project_or_404
 from api.models import JwtUserData, Project, ProjectCreate, ProjectUpdate
-from database.manager import ProjectManager, get_project_manager
+from api.responses import ModelResponse
+from database.decoder import decode, get_document_decoder
+from database.exceptions import ObjectVersionConflict
+from database.manager import ProjectManager
 from database.models import ProjectDB
 
 projects_router = APIRouter(prefix="/v1/projects", tags=["projects"], dependencies=[])
@@ -23,16 +28,44 @@ async def create_project(
     "/{project_id}", status_code=status.HTTP_200_OK, response_model=Project
 )
 async def get_project(project_db: ProjectDB = Depends(get_project_or_404)) -> Project:
-    return Project(**project_db.dict())
+    return ModelResponse(decode(Project, dict(project_db)))
 
 
 @projects_router.get("/", status_code=status.HTTP_200_OK, response_model=list[Project])
 async def list_projects(
+    limit: int | None = Query(None, ge=1, le=1000),
+    after: UUID4 | None = None,
+    stream: bool = False,
     jwt_user_data: JwtUserData = Depends(get_current_user),
     project_manager: ProjectManager = Depends(get_project_manager),
 ) -> list[Project]:
-    results = await project_manager.list(jwt_user_data.user_id)
-    return [Project(**res.dict()) for res in results]
+    """
+    List the user's projects.
+
+    With `limit` a page of projects ordered by id is returned, and the
+    `X-Next-Cursor` header holds the `after` value of the next page if there
+    may be one. With `stream` the projects are sent as NDJSON while they are
+    read, and for a page the id of the last line is the `after` value of the
+    next page.
+    """
+    projects = project_manager.iterate_page(
+        jwt_user_data.user_id, Project.__fields__, limit or 0, after
+    )
+    decode_project = get_document_decoder(Project)
+
+    if stream:
+
+        async def project_lines():
+            async for project in projects:
+                yield decode_project(project).json() + "\n"
+
+        return StreamingResponse(project_lines(), media_type="application/x-ndjson")
+
+    results = [decode_project(project) async for project in projects]
+    headers = {}
+    if limit and len(results) == limit:
+        headers["X-Next-Cursor"] = str(results[-1].id)
+    return ModelResponse(results, headers=headers)
 
 
 @projects_router.patch(
@@ -44,9 +77,15 @@ async def update_project(
     jwt_user_data: JwtUserData = Depends(get_current_user),
     project_manager: ProjectManager = Depends(get_project_manager),
 ):
-    updated_object = await project_manager.update(
-        project, project_db, jwt_user_data.user_id
-    )
+    try:
+        updated_object = await project_manager.update(
+            project, project_db, jwt_user_data.user_id, check_version=True
+        )
+    except ObjectVersionConflict:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"detail": "project was changed by another request"},
+        )
     return Project(**updated_object.dict())
 
 
@@ -2,14 +2,16 @@ from fastapi import APIRouter, Depends, status
 from fastapi.responses import JSONResponse, Response
 
 from api.credential_verifiers import verify_credentials
-from api.dependencies import get_current_user, get_project_or_404
-from api.models import JwtUserData, ProjectCredentialsCreate, ProjectUpdate
-from database.manager import (
-    ProjectCredentialsManager,
-    ProjectManager,
+from api.credential_verifiers.verifier import VerificationUnavailable
+from api.dependencies import (
+    get_current_user,
     get_project_credentials_manager,
     get_project_manager,
+    get_project_or_404,
 )
+from api.models import JwtUserData, ProjectCredentialsCreate, ProjectUpdate
+from database.exceptions import ObjectAlreadyExists
+from database.manager import ProjectCredentialsManager, ProjectManager
 from database.models import ProjectDB
 
 project_credentials_router = APIRouter(
@@ -33,7 +35,13 @@ async def create_project_credentials(
             content={"detail": "project already has valid credentials"},
         )
 
-    verified = await verify_credentials(project_db, project_credentials)
+    try:
+        verified = await verify_credentials(project_db, project_credentials)
+    except VerificationUnavailable as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": f"credentials can't be verified now: {e}"},
+        )
     if not verified:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -41,7 +49,16 @@ async def create_project_credentials(
         )
 
     project_credentials.project = project_db.id
-    await project_credentials_manager.create(project_credentials, jwt_user_data.user_id)
+    try:
+        await project_credentials_manager.create(
+            project_credentials, jwt_user_data.user_id
+        )
+    except ObjectAlreadyExists:
+        # created by a concurrent request, see the unique project index
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project already has valid credentials"},
+        )
     await project_manager.update(
         ProjectUpdate(verified=True), project_db, jwt_user_data.user_id, safe=False
     )
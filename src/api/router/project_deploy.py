@@ -1,25 +1,346 @@
-from fastapi import APIRouter, Depends, status
+import asyncio
+from collections import defaultdict
+
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse, Response
+from pydantic import UUID4
 
-from api.dependencies import get_current_user, get_project_or_404
-from api.models import JwtUserData, ProjectDeployCreate
+from api.dependencies import (
+    get_current_user,
+    get_deploy_batch_manager,
+    get_deploy_job_manager,
+    get_project_credentials_manager,
+    get_project_deploy_manager,
+    get_project_deploy_plan_manager,
+    get_project_manager,
+    get_project_or_404,
+    prefetch_project_objects,
+)
+from api.models import (
+    BulkProjectDeploy,
+    BulkProjectDestroy,
+    DeployBatch,
+    DeployBatchCreate,
+    DeployJob,
+    JwtUserData,
+    ProjectDeployCreate,
+    ProjectDeployPlan,
+)
+from config import settings
+from database.exceptions import ObjectDoesntExist
 from database.manager import (
+    DeployBatchManager,
+    DeployJobManager,
     ProjectCredentialsManager,
     ProjectDeployManager,
+    ProjectDeployPlanManager,
     ProjectManager,
-    get_project_credentials_manager,
-    get_project_deploy_manager,
-    get_project_manager,
 )
-from database.models import ProjectDB
-from worker.tasks import deploy_datalake, destroy_datalake
+from database.models import DeployBatchDB, ProjectCredentialsDB, ProjectDB
+from shared.deployments import DEPLOYMENT_CLASSES
+from shared.deployments.base import MissingResourceNames
+from shared.models.batches import (
+    DeployBatchItem,
+    DeployBatchItemStatus,
+    DeployBatchOperation,
+)
+from shared.models.deploys import ProjectDeployStatus
+from shared.models.jobs import DeployJobOperation, StageHistogram
+from worker.batches import dispatch_batch
+from worker.deploys import deploy_status_on_error, deploy_statuses_on_error
+from worker.tasks import (
+    deploy_datalake,
+    destroy_datalake,
+    plan_datalake,
+    redeploy_datalake,
+)
 
 project_deploy_router = APIRouter(
     prefix="/v1/project_deploy", tags=["deploy"], dependencies=[]
 )
 
+# a failed deploy may have created some of its resources
+DESTROYABLE_STATUSES = [ProjectDeployStatus.DEPLOYED, ProjectDeployStatus.FAILED]
+
+
+def get_bulk_skip_detail(
+    project_db: ProjectDB | None, project_credentials: ProjectCredentialsDB | None
+) -> str | None:
+    if project_db is None:
+        return "project not found"
+    if not project_db.verified:
+        return "project doesn't have valid credentials"
+    if project_credentials is None:
+        return "project doesn't have credentials"
+    return None
+
+
+def to_deploy_batch(deploy_batch: DeployBatchDB) -> DeployBatch:
+    return DeployBatch(**deploy_batch.dict(), progress=deploy_batch.get_progress())
+
+
+@project_deploy_router.post(
+    "/bulk", status_code=status.HTTP_202_ACCEPTED, response_model=DeployBatch
+)
+async def create_project_deploys(
+    bulk_deploy: BulkProjectDeploy,
+    jwt_user_data: JwtUserData = Depends(get_current_user),
+    project_manager: ProjectManager = Depends(get_project_manager),
+    project_credentials_manager: ProjectCredentialsManager = Depends(
+        get_project_credentials_manager
+    ),
+    project_deploy_manager: ProjectDeployManager = Depends(get_project_deploy_manager),
+    deploy_batch_manager: DeployBatchManager = Depends(get_deploy_batch_manager),
+) -> DeployBatch:
+    """
+    Deploy many projects with the same deploy type.
+
+    Projects that can't be deployed are skipped. The deploys run in the
+    worker with a limited concurrency per service provider, the returned
+    batch is polled for the progress.
+    """
+    project_ids = list(dict.fromkeys(bulk_deploy.project_ids))
+    projects = {
+        project_db.id: project_db
+        for project_db in await project_manager.list_by_ids(
+            project_ids, jwt_user_data.user_id
+        )
+    }
+    credentials = {
+        project_credentials.project: project_credentials
+        for project_credentials in await project_credentials_manager.list_by_projects(
+            project_ids
+        )
+    }
+
+    details = {
+        project_id: get_bulk_skip_detail(
+            projects.get(project_id), credentials.get(project_id)
+        )
+        for project_id in project_ids
+    }
+    project_deploys = {
+        project_id: ProjectDeployCreate(
+            deploy_type=bulk_deploy.deploy_type, project=project_id
+        )
+        for project_id in project_ids
+    }
+    reserved = await project_deploy_manager.reserve_many(
+        [
+            project_deploys[project_id]
+            for project_id, detail in details.items()
+            if detail is None
+        ],
+        jwt_user_data.user_id,
+    )
+
+    items = []
+    queued = []
+    for project_id in project_ids:
+        project_db = projects.get(project_id)
+        project_credentials = credentials.get(project_id)
+        project_deploy = project_deploys[project_id]
+        detail = details[project_id]
+        if detail is None and project_id not in reserved:
+            detail = "project already deployed"
+        if detail is not None:
+            items.append(
+                DeployBatchItem(
+                    project=project_id,
+                    status=DeployBatchItemStatus.SKIPPED,
+                    detail=detail,
+                )
+            )
+            continue
+
+        items.append(DeployBatchItem(project=project_id))
+        queued.append(
+            (
+                project_db.service_provider,
+                (
+                    jwt_user_data.dict(),
+                    project_deploy.dict(),
+                    project_db.dict(),
+                    project_credentials.dict(),
+                ),
+            )
+        )
+
+    # the reserved deploys would stay pending if they aren't enqueued
+    async with deploy_statuses_on_error(
+        list(reserved), ProjectDeployStatus.PENDING, ProjectDeployStatus.FAILED
+    ):
+        # the batch has to exist before its tasks update it
+        deploy_batch = await deploy_batch_manager.create(
+            DeployBatchCreate(
+                operation=DeployBatchOperation.DEPLOY,
+                deploy_type=bulk_deploy.deploy_type,
+                items=items,
+            ),
+            jwt_user_data.user_id,
+        )
+        signatures = defaultdict(list)
+        for service_provider, args in queued:
+            signatures[service_provider].append(
+                deploy_datalake.si(*args, batch_id=str(deploy_batch.id))
+            )
+        dispatch_batch(signatures)
+
+    return to_deploy_batch(deploy_batch)
+
 
-@project_deploy_router.post("/{project_id}", status_code=status.HTTP_201_CREATED)
+@project_deploy_router.post(
+    "/bulk/destroy", status_code=status.HTTP_202_ACCEPTED, response_model=DeployBatch
+)
+async def delete_project_deploys(
+    bulk_destroy: BulkProjectDestroy,
+    jwt_user_data: JwtUserData = Depends(get_current_user),
+    project_manager: ProjectManager = Depends(get_project_manager),
+    project_credentials_manager: ProjectCredentialsManager = Depends(
+        get_project_credentials_manager
+    ),
+    project_deploy_manager: ProjectDeployManager = Depends(get_project_deploy_manager),
+    deploy_batch_manager: DeployBatchManager = Depends(get_deploy_batch_manager),
+) -> DeployBatch:
+    """Destroy the deploys of many projects, see `create_project_deploys`"""
+    project_ids = list(dict.fromkeys(bulk_destroy.project_ids))
+    projects = {
+        project_db.id: project_db
+        for project_db in await project_manager.list_by_ids(
+            project_ids, jwt_user_data.user_id
+        )
+    }
+    credentials = {
+        project_credentials.project: project_credentials
+        for project_credentials in await project_credentials_manager.list_by_projects(
+            project_ids
+        )
+    }
+
+    details = {
+        project_id: get_bulk_skip_detail(
+            projects.get(project_id), credentials.get(project_id)
+        )
+        for project_id in project_ids
+    }
+    destroyable = [
+        project_id for project_id, detail in details.items() if detail is None
+    ]
+    project_deploys = dict(
+        zip(
+            destroyable,
+            await asyncio.gather(
+                *(
+                    project_deploy_manager.transition(
+                        project_id, DESTROYABLE_STATUSES, ProjectDeployStatus.DESTROYING
+                    )
+                    for project_id in destroyable
+                )
+            ),
+        )
+    )
+
+    items = []
+    queued = []
+    for project_id in project_ids:
+        project_db = projects.get(project_id)
+        project_credentials = credentials.get(project_id)
+        project_deploy = project_deploys.get(project_id)
+        detail = details[project_id]
+        if detail is None and project_deploy is None:
+            detail = "project not deployed or deploy in progress"
+        if detail is not None:
+            items.append(
+                DeployBatchItem(
+                    project=project_id,
+                    status=DeployBatchItemStatus.SKIPPED,
+                    detail=detail,
+                )
+            )
+            continue
+
+        items.append(DeployBatchItem(project=project_id))
+        queued.append(
+            (
+                project_db.service_provider,
+                (project_deploy.dict(), project_db.dict(), project_credentials.dict()),
+            )
+        )
+
+    async with deploy_statuses_on_error(
+        [
+            project_id
+            for project_id, project_deploy in project_deploys.items()
+            if project_deploy is not None
+        ],
+        ProjectDeployStatus.DESTROYING,
+        ProjectDeployStatus.FAILED,
+    ):
+        deploy_batch = await deploy_batch_manager.create(
+            DeployBatchCreate(operation=DeployBatchOperation.DESTROY, items=items),
+            jwt_user_data.user_id,
+        )
+        signatures = defaultdict(list)
+        for service_provider, args in queued:
+            signatures[service_provider].append(
+                destroy_datalake.si(*args, batch_id=str(deploy_batch.id))
+            )
+        dispatch_batch(signatures)
+
+    return to_deploy_batch(deploy_batch)
+
+
+@project_deploy_router.get(
+    "/bulk/{batch_id}", status_code=status.HTTP_200_OK, response_model=DeployBatch
+)
+async def get_project_deploys_batch(
+    batch_id: UUID4,
+    jwt_user_data: JwtUserData = Depends(get_current_user),
+    deploy_batch_manager: DeployBatchManager = Depends(get_deploy_batch_manager),
+) -> DeployBatch:
+    try:
+        deploy_batch = await deploy_batch_manager.get(batch_id, jwt_user_data.user_id)
+    except ObjectDoesntExist:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return to_deploy_batch(deploy_batch)
+
+
+@project_deploy_router.get(
+    "/jobs/histogram",
+    status_code=status.HTTP_200_OK,
+    response_model=list[StageHistogram],
+)
+async def get_deploy_job_stage_histograms(
+    operation: DeployJobOperation | None = None,
+    jwt_user_data: JwtUserData = Depends(get_current_user),
+    deploy_job_manager: DeployJobManager = Depends(get_deploy_job_manager),
+) -> list[StageHistogram]:
+    """Durations of the finished stages of the user's jobs, by `le` seconds buckets"""
+    return await deploy_job_manager.get_stage_histograms(
+        jwt_user_data.user_id, settings.deploy_job_histogram_buckets, operation
+    )
+
+
+@project_deploy_router.get(
+    "/jobs/{job_id}", status_code=status.HTTP_200_OK, response_model=DeployJob
+)
+async def get_deploy_job(
+    job_id: UUID4,
+    jwt_user_data: JwtUserData = Depends(get_current_user),
+    deploy_job_manager: DeployJobManager = Depends(get_deploy_job_manager),
+) -> DeployJob:
+    try:
+        deploy_job = await deploy_job_manager.get(job_id, jwt_user_data.user_id)
+    except ObjectDoesntExist:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return DeployJob(**deploy_job.dict())
+
+
+@project_deploy_router.post(
+    "/{project_id}",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(prefetch_project_objects)],
+)
 async def create_project_deploy(
     project_deploy: ProjectDeployCreate,
     project_db: ProjectDB = Depends(get_project_or_404),
@@ -29,6 +350,7 @@ async def create_project_deploy(
         get_project_credentials_manager
     ),
     project_manager: ProjectManager = Depends(get_project_manager),
+    deploy_job_manager: DeployJobManager = Depends(get_deploy_job_manager),
 ) -> JSONResponse:
     if not project_db.verified:
         return JSONResponse(
@@ -36,32 +358,261 @@ async def create_project_deploy(
             content={"detail": "project doesn't have valid credentials"},
         )
 
-    another_pd = await project_deploy_manager.get_by_project(project_db.id)
-    if another_pd:
+    project_credentials = await project_credentials_manager.get_by_project(
+        project_db.id
+    )
+
+    if not project_credentials:
+        # TODO:
+        pass
+
+    # the worker makes the pending deploy deployed or failed
+    project_deploy.project = project_db.id
+    if not await project_deploy_manager.reserve(project_deploy, jwt_user_data.user_id):
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"detail": "project already deployed"},
         )
 
+    # the deploy would stay pending if it isn't enqueued
+    async with deploy_status_on_error(
+        project_db.id, ProjectDeployStatus.PENDING, ProjectDeployStatus.FAILED
+    ):
+        deploy_job = await deploy_job_manager.create_queued(
+            project_db.id, DeployJobOperation.DEPLOY, jwt_user_data.user_id
+        )
+        deploy_datalake.delay(
+            jwt_user_data.dict(),
+            project_deploy.dict(),
+            project_db.dict(),
+            project_credentials.dict(),
+            job_id=str(deploy_job.id),
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_201_CREATED, content={"job_id": str(deploy_job.id)}
+    )
+
+
+@project_deploy_router.post(
+    "/{project_id}/plan",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(prefetch_project_objects)],
+    response_model=ProjectDeployPlan,
+    responses={status.HTTP_202_ACCEPTED: {"description": "The plan is being created"}},
+)
+async def plan_project_deploy(
+    project_deploy: ProjectDeployCreate,
+    project_db: ProjectDB = Depends(get_project_or_404),
+    jwt_user_data: JwtUserData = Depends(get_current_user),
+    project_deploy_manager: ProjectDeployManager = Depends(get_project_deploy_manager),
+    project_credentials_manager: ProjectCredentialsManager = Depends(
+        get_project_credentials_manager
+    ),
+    project_deploy_plan_manager: ProjectDeployPlanManager = Depends(
+        get_project_deploy_plan_manager
+    ),
+    deploy_job_manager: DeployJobManager = Depends(get_deploy_job_manager),
+):
+    """
+    Preview the changes a deploy would make.
+
+    Plans are cached by the hash of the rendered configuration. If there is
+    no plan for the current configuration yet, it is created by the worker
+    and 202 is returned, the client should repeat the request later. The
+    repeats return the job creating the plan, it is enqueued once.
+    """
+    if not project_db.verified:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project doesn't have valid credentials"},
+        )
+
     project_credentials = await project_credentials_manager.get_by_project(
         project_db.id
     )
 
     if not project_credentials:
-        # TODO:
-        pass
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project doesn't have credentials"},
+        )
+
+    # a deployed project is planned against the names of its resources
+    deployed_project_deploy = await project_deploy_manager.get_by_project(project_db.id)
+    if (
+        deployed_project_deploy
+        and deployed_project_deploy.get_status() == ProjectDeployStatus.FAILED
+    ):
+        # a failed deploy is deployed again like a new one
+        deployed_project_deploy = None
+    if (
+        deployed_project_deploy
+        and deployed_project_deploy.get_status() != ProjectDeployStatus.DEPLOYED
+    ):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project deploy is in progress"},
+        )
+
+    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type]()
+    try:
+        config_hash = deployment_class.get_config_hash(
+            project_db, project_credentials, deployed_project_deploy
+        )
+    except NotImplementedError:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "deploy type doesn't support plans"},
+        )
+    except MissingResourceNames:
+        # the names are stored by the next update, the worker reads them from
+        # the state
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project deploy has to be updated first"},
+        )
+
+    project_deploy_plan = await project_deploy_plan_manager.get_by_config_hash(
+        project_db.id, config_hash
+    )
+    if project_deploy_plan:
+        return ProjectDeployPlan(**project_deploy_plan.dict())
+
+    deploy_job = await deploy_job_manager.get_unfinished_plan(
+        project_db.id, config_hash
+    )
+    if deploy_job is None:
+        deploy_job = await deploy_job_manager.create_queued(
+            project_db.id,
+            DeployJobOperation.PLAN,
+            jwt_user_data.user_id,
+            config_hash=config_hash,
+        )
+        plan_datalake.delay(
+            jwt_user_data.dict(),
+            project_deploy.dict(),
+            project_db.dict(),
+            project_credentials.dict(),
+            deployed_project_deploy.dict() if deployed_project_deploy else None,
+            job_id=str(deploy_job.id),
+        )
 
-    deploy_datalake.delay(
-        jwt_user_data.dict(),
-        project_deploy.dict(),
-        project_db.dict(),
-        project_credentials.dict(),
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "detail": "plan is being created",
+            "config_hash": config_hash,
+            "job_id": str(deploy_job.id),
+        },
     )
 
-    return JSONResponse(status_code=status.HTTP_201_CREATED)
 
+@project_deploy_router.put(
+    "/{project_id}",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(prefetch_project_objects)],
+)
+async def update_project_deploy(
+    project_db: ProjectDB = Depends(get_project_or_404),
+    jwt_user_data: JwtUserData = Depends(get_current_user),
+    project_deploy_manager: ProjectDeployManager = Depends(get_project_deploy_manager),
+    project_credentials_manager: ProjectCredentialsManager = Depends(
+        get_project_credentials_manager
+    ),
+    deploy_job_manager: DeployJobManager = Depends(get_deploy_job_manager),
+) -> JSONResponse:
+    """
+    Apply the current configuration to a deployed project.
+
+    Nothing is enqueued if the rendered configuration matches the applied
+    one. Only the resources of the changed files are applied when possible.
+    """
+    if not project_db.verified:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project doesn't have valid credentials"},
+        )
 
-@project_deploy_router.delete("/{project_id}")
+    project_deploy = await project_deploy_manager.get_by_project(project_db.id)
+    if not project_deploy:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project not deployed"},
+        )
+    if project_deploy.get_status() != ProjectDeployStatus.DEPLOYED:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project deploy is in progress"},
+        )
+
+    project_credentials = await project_credentials_manager.get_by_project(
+        project_db.id
+    )
+
+    if not project_credentials:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project doesn't have credentials"},
+        )
+
+    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type]()
+    try:
+        config_hash = deployment_class.get_config_hash(
+            project_db, project_credentials, project_deploy
+        )
+    except NotImplementedError:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "deploy type doesn't support updates"},
+        )
+    except MissingResourceNames:
+        # the worker reads the names from the state, the configuration can't
+        # be compared before
+        config_hash = None
+
+    if config_hash is not None and config_hash == project_deploy.config_hash:
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"detail": "project deploy is up to date"},
+        )
+
+    project_deploy = await project_deploy_manager.transition(
+        project_db.id, [ProjectDeployStatus.DEPLOYED], ProjectDeployStatus.UPDATING
+    )
+    if not project_deploy:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project deploy is in progress"},
+        )
+
+    async with deploy_status_on_error(
+        project_db.id, ProjectDeployStatus.UPDATING, ProjectDeployStatus.DEPLOYED
+    ):
+        deploy_job = await deploy_job_manager.create_queued(
+            project_db.id, DeployJobOperation.REDEPLOY, jwt_user_data.user_id
+        )
+        redeploy_datalake.delay(
+            jwt_user_data.dict(),
+            project_deploy.dict(),
+            project_db.dict(),
+            project_credentials.dict(),
+            job_id=str(deploy_job.id),
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "detail": "project deploy is being updated",
+            "config_hash": config_hash,
+            "job_id": str(deploy_job.id),
+        },
+    )
+
+
+@project_deploy_router.delete(
+    "/{project_id}", dependencies=[Depends(prefetch_project_objects)]
+)
 async def delete_project_deploy(
     project_db: ProjectDB = Depends(get_project_or_404),
     jwt_user_data: JwtUserData = Depends(get_current_user),
@@ -70,6 +621,7 @@ async def delete_project_deploy(
         get_project_credentials_manager
     ),
     project_manager: ProjectManager = Depends(get_project_manager),
+    deploy_job_manager: DeployJobManager = Depends(get_deploy_job_manager),
 ):
     if not project_db.verified:
         return JSONResponse(
@@ -92,8 +644,30 @@ async def delete_project_deploy(
         # TODO:
         pass
 
-    destroy_datalake.delay(
-        project_deploy.dict(), project_db.dict(), project_credentials.dict()
+    project_deploy = await project_deploy_manager.transition(
+        project_db.id, DESTROYABLE_STATUSES, ProjectDeployStatus.DESTROYING
     )
+    if not project_deploy:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "project deploy is in progress"},
+        )
 
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    async with deploy_status_on_error(
+        project_db.id, ProjectDeployStatus.DESTROYING, ProjectDeployStatus.FAILED
+    ):
+        deploy_job = await deploy_job_manager.create_queued(
+            project_db.id, DeployJobOperation.DESTROY, jwt_user_data.user_id
+        )
+        destroy_datalake.delay(
+            project_deploy.dict(),
+            project_db.dict(),
+            project_credentials.dict(),
+            job_id=str(deploy_job.id),
+        )
+
+    # 204 can't have a body, the job is referenced by the Location header
+    return Response(
+        status_code=status.HTTP_204_NO_CONTENT,
+        headers={"Location": f"{project_deploy_router.prefix}/jobs/{deploy_job.id}"},
+    )
@@ -1,12 +1,93 @@
 from pydantic import BaseSettings
 
+from shared.models.providers import ServiceProviderType
+
 
 class Settings(BaseSettings):
     database_url: str
     database_name: str = "database_name"
     debug: bool = False
     jwt_secret: str = "SECRET"
+    # other keys tokens may be signed with, as JWKs with an "alg" (and a "kid"
+    # matched against the token header), e.g. the previous secret while
+    # rotating it, or public keys
+    jwt_keys: list[dict] = []
+    # seconds a verified token is reused without verifying it again, never
+    # after it expires
+    jwt_cache_ttl: float = 300
+    jwt_cache_size: int = 10000
     sentry_url: str = None
+    # errors are still reported to sentry without tracing
+    tracing_enabled: bool = True
+    # share of the requests and tasks traced whatever their outcome
+    tracing_sample_rate: float = 0.01
+    # requests slower than this many seconds, or failing, are traced anyway
+    # when it is set. Every request records its spans until it ends then, by
+    # default only the sampled ones do
+    tracing_slow_request_threshold: float | None = None
+    # deploys of a bulk request running at the same time for every provider
+    bulk_deploy_concurrency: int = 4
+    # characters of stderr kept in a failed deploy job stage
+    deploy_job_stderr_limit: int = 4096
+    # upper bounds in seconds of the deploy job stage duration histogram buckets
+    deploy_job_histogram_buckets: list[float] = [
+        1,
+        5,
+        15,
+        30,
+        60,
+        120,
+        300,
+        600,
+        1200,
+        1800,
+        3600,
+    ]
+    # seconds a credentials check with the provider may take
+    credentials_verification_timeout: float = 10
+    # credentials checks running at the same time in an API process
+    credentials_verification_workers: int = 8
+    # seconds the result of a credentials check is reused
+    credentials_valid_cache_ttl: float = 600
+    credentials_invalid_cache_ttl: float = 60
+    credentials_cache_size: int = 1024
+    # run worker tasks as coroutines on one event loop of a threads pool
+    worker_async_mode: bool = False
+    worker_async_concurrency: int = 32
+    # deploys running at the same time in a worker, by service provider
+    worker_provider_concurrency: dict[ServiceProviderType, int] = {}
+    # build models of documents read from the database without validating
+    # them again, they are validated when written
+    trusted_db_reads: bool = True
+    # seconds a full project structure is cached by an API process, it bounds
+    # how long writes made by workers or other API processes stay unseen
+    full_project_cache_ttl: float = 5
+    full_project_cache_size: int = 4096
+    # seconds a lock lease lasts without being renewed, see database.locks
+    lock_ttl: float = 60
+    # seconds to wait for a lock, e.g. for an apply of the project to finish
+    lock_wait_timeout: float = 2 * 60 * 60
+    lock_poll_interval: float = 5
+    # seconds after which a deploy still pending, updating or destroying is
+    # treated as failed, e.g. when its worker crashed. It has to outlast the
+    # task including its wait in the queue, the project lock still keeps
+    # a late task from applying at the same time as a new one
+    deploy_status_timeout: float = 6 * 60 * 60
+    # directory of the credentials files given to terraform, a tmpfs keeps
+    # them off the disk. The temp dir is used if it doesn't exist
+    credentials_dir: str = "/dev/shm"
+    terraform_cache_dir: str = "/var/cache/terraform"
+    terraform_command_timeout: int = 2 * 60 * 60
+    terraform_interrupt_grace_period: int = 60
+    terraform_output_buffer_lines: int = 1000
+    # plans are reused by the workers sharing this directory only, mount a
+    # shared volume here for workers on several hosts
+    terraform_plans_dir: str = "/var/lib/terraform/plans"
+    # seconds a plan that was never applied is kept
+    terraform_plans_max_age: float = 24 * 60 * 60
+    terraform_workspaces_dir: str = "/var/lib/terraform/workspaces"
+    # bytes of workspaces kept, the least recently used ones are removed
+    terraform_workspaces_disk_budget: int = 10 * 1024**3
 
 
 settings = Settings()
@@ -6,6 +6,7 @@ from api.base_models import BCM, BUM
 from database.base_models import BDBM
 from database.db import MongoDatabase
 from database.exceptions import ObjectDoesntExist
+from database.identity_map import IdentityMap
 from utils.logger import setup_logger
 
 LOGGER = setup_logger()
@@ -15,12 +16,36 @@ class BaseDBManager(typing.Generic[BCM, BDBM]):
     object_db_model: typing.Type[BDBM]
 
     # TODO: Synchronize user filters between all operations
-    def __init__(self, model_db: MongoDatabase[BDBM]):
+    def __init__(
+        self, model_db: MongoDatabase[BDBM], identity_map: IdentityMap | None = None
+    ):
         self.model_db = model_db
+        self.identity_map = identity_map
+
+    def lookup(
+        self,
+        field: str,
+        value: typing.Any,
+        loader: typing.Callable[[], typing.Awaitable[BDBM | None]],
+    ) -> typing.Awaitable[BDBM | None]:
+        """
+        Start a lookup, or join the same lookup of the request if there is an
+        identity map. Calling without awaiting prefetches the object.
+        """
+        if self.identity_map is None:
+            return loader()
+        return self.identity_map.load(
+            (self.object_db_model.__name__, field, value), loader
+        )
+
+    def invalidate(self, db_object: BDBM) -> None:
+        """Drop what is cached about the written object"""
+        if self.identity_map is not None:
+            self.identity_map.invalidate(self.object_db_model.__name__)
 
     async def get(self, id: UUID4, user_id: UUID4) -> BDBM:
         """Get an object by id"""
-        db_object = await self.model_db.get(id)
+        db_object = await self.lookup("id", id, lambda: self.model_db.get(id))
         LOGGER.debug(db_object)
 
         if db_object is None or db_object.created_by != user_id:
@@ -38,6 +63,7 @@ class BaseDBManager(typing.Generic[BCM, BDBM]):
         created_object = await self.model_db.create(
             self.create_to_db(create_object, user_id)
         )
+        self.invalidate(created_object)
 
         return created_object
 
@@ -46,7 +72,7 @@ class BaseDBManager(typing.Generic[BCM, BDBM]):
 
     async def list(self, user_id: UUID4, **kwargs) -> list[BDBM]:
         filter_params = {**self.base_filter(user_id), **kwargs}
-        print(filter_params)
+        LOGGER.debug(filter_params)
         return await self.model_db.filter(filter_params)
 
     async def update(
@@ -55,27 +81,41 @@ class BaseDBManager(typing.Generic[BCM, BDBM]):
         current_object: BDBM,
         user_id: UUID4,
         safe: bool = True,
+        check_version: bool = False,
     ) -> BDBM:
         """
         Update an object.
 
+        Only the updated fields are written. With `check_version`
+        ObjectVersionConflict is raised if the object was updated since
+        `current_object` was read.
+
         # TODO: Triggers the on_after_update handler on success
         """
         if safe:
             updated_object_data = object_update.create_update_dict()
         else:
             updated_object_data = object_update.create_update_dict_superuser()
-        updated_object = await self._update(current_object, updated_object_data)
+        updated_object = await self._update(
+            current_object, updated_object_data, check_version
+        )
         # await self.on_after_update(updated_object, updated_object_data)
         return updated_object
 
     async def _update(
-        self, current_object: BDBM, update_dict: dict[str, typing.Any]
+        self,
+        current_object: BDBM,
+        update_dict: dict[str, typing.Any],
+        check_version: bool = False,
     ) -> BDBM:
         for field in update_dict:
             setattr(current_object, field, update_dict[field])
-        return await self.model_db.update(current_object)
+        self.invalidate(current_object)
+        return await self.model_db.update(
+            current_object, update_dict.keys(), check_version
+        )
 
     async def delete(self, db_object: BDBM) -> None:
         """Delete an object"""
         await self.model_db.delete(db_object)
+        self.invalidate(db_object)
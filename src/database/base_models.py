@@ -9,6 +9,8 @@ from pydantic.types import UUID4
 class BaseDBModel(BaseModel):
     created_by: UUID4
     id: UUID4 = Field(default_factory=uuid.uuid4)
+    # increased by every update, see MongoDatabase.update
+    version: int = 0
 
 
 BDBM = typing.TypeVar("BDBM", bound=BaseDBModel)
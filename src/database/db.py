@@ -1,10 +1,16 @@
+import functools
 import typing
 
 import motor.motor_asyncio
 from pydantic import UUID4
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from config import settings
 from database.base_models import BDBM
+from database.decoder import get_document_decoder
+from database.exceptions import ObjectAlreadyExists, ObjectVersionConflict
+from utils.tracing import start_span
 
 
 class DatabaseWrapper:
@@ -13,6 +19,10 @@ class DatabaseWrapper:
     __projects_collection = None
     __project_credentials_collection = None
     __project_deploy_collection = None
+    __project_deploy_plans_collection = None
+    __deploy_batches_collection = None
+    __deploy_jobs_collection = None
+    __locks_collection = None
     __loop = None
 
     @classmethod
@@ -24,10 +34,20 @@ class DatabaseWrapper:
         cls.__client = None
         cls.__project_credentials_collection = None
         cls.__project_deploy_collection = None
+        cls.__project_deploy_plans_collection = None
+        cls.__deploy_batches_collection = None
+        cls.__deploy_jobs_collection = None
+        cls.__locks_collection = None
         cls.__projects_collection = None
         cls.__db = None
         cls.__loop = None
 
+    @classmethod
+    def close_client(cls):
+        if cls.__client is not None:
+            cls.__client.close()
+        cls.reset_wrapper()
+
     @classmethod
     def get_client(cls):
         if cls.__client is None:
@@ -67,6 +87,48 @@ class DatabaseWrapper:
             cls.__project_deploy_collection = db["project_deploy"]
         return cls.__project_deploy_collection
 
+    @classmethod
+    def get_project_deploy_plans_collection(cls):
+        if cls.__project_deploy_plans_collection is None:
+            db = cls.get_db()
+            cls.__project_deploy_plans_collection = db["project_deploy_plans"]
+        return cls.__project_deploy_plans_collection
+
+    @classmethod
+    def get_deploy_batches_collection(cls):
+        if cls.__deploy_batches_collection is None:
+            db = cls.get_db()
+            cls.__deploy_batches_collection = db["deploy_batches"]
+        return cls.__deploy_batches_collection
+
+    @classmethod
+    def get_deploy_jobs_collection(cls):
+        if cls.__deploy_jobs_collection is None:
+            db = cls.get_db()
+            cls.__deploy_jobs_collection = db["deploy_jobs"]
+        return cls.__deploy_jobs_collection
+
+    @classmethod
+    def get_locks_collection(cls):
+        if cls.__locks_collection is None:
+            db = cls.get_db()
+            cls.__locks_collection = db["locks"]
+        return cls.__locks_collection
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def traced(method):
+    """Trace a query method of MongoDatabase as a span of its collection"""
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        with start_span("db.mongo", f"{self.collection.name}.{method.__name__}"):
+            return await method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class MongoDatabase(typing.Generic[BDBM]):
     """Database adapter for MongoDB"""
@@ -79,30 +141,130 @@ class MongoDatabase(typing.Generic[BDBM]):
         collection: motor.motor_asyncio.AsyncIOMotorClient,
     ):
         self.db_model = db_model
+        self.decode = get_document_decoder(db_model)
+        # indexes are created once at startup, see `database.indexes`
         self.collection = collection
-        self.collection.create_index("id", unique=True)
 
+    @traced
     async def get(self, id: UUID4) -> BDBM | None:
         db_object = await self.collection.find_one({"id": id})
-        return self.db_model(**db_object) if db_object else None
+        return self.decode(db_object) if db_object else None
 
+    @traced
+    async def find_one(self, filter_params: dict) -> BDBM | None:
+        db_object = await self.collection.find_one(filter_params)
+        return self.decode(db_object) if db_object else None
+
+    @traced
     async def filter(self, filter_params: dict) -> list[BDBM]:
         result = []
         async for db_object in self.collection.find(filter_params):
-            result.append(self.db_model(**db_object))
+            result.append(self.decode(db_object))
         return result
 
+    async def iterate(
+        self,
+        filter_params: dict,
+        projection: dict | None = None,
+        sort: list[tuple[str, int]] | None = None,
+        limit: int = 0,
+    ) -> typing.AsyncIterator[dict]:
+        """Raw matching documents as the cursor fetches them, without a model"""
+        cursor = self.collection.find(filter_params, projection, limit=limit)
+        if sort:
+            cursor = cursor.sort(sort)
+        async for document in cursor:
+            yield document
+
+    @traced
     async def create(self, db_object: BDBM) -> BDBM:
-        await self.collection.insert_one(db_object.dict())
+        try:
+            await self.collection.insert_one(db_object.dict())
+        except DuplicateKeyError:
+            raise ObjectAlreadyExists()
         return db_object
 
-    async def update(self, db_object: BDBM) -> BDBM:
-        await self.collection.replace_one({"id": db_object.id}, db_object.dict())
+    @traced
+    async def create_many(self, db_objects: list[BDBM]) -> list[BDBM]:
+        """Insert the objects at once, return the ones that didn't exist yet"""
+        if not db_objects:
+            return []
+        try:
+            await self.collection.insert_many(
+                [db_object.dict() for db_object in db_objects], ordered=False
+            )
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            existing = {error["index"] for error in errors}
+            return [
+                db_object
+                for index, db_object in enumerate(db_objects)
+                if index not in existing
+            ]
+        return db_objects
+
+    @traced
+    async def update(
+        self,
+        db_object: BDBM,
+        fields: typing.Iterable[str] | None = None,
+        check_version: bool = False,
+    ) -> BDBM:
+        """
+        Set `fields` of the object (all of them by default) and increase its
+        version. With `check_version` ObjectVersionConflict is raised if the
+        stored version isn't the version of `db_object` anymore.
+        """
+        filter_params = {"id": db_object.id}
+        if check_version:
+            # objects written before versioning have no version field
+            filter_params["version"] = db_object.version or {"$in": [0, None]}
+        values = db_object.dict(
+            include=set(fields) if fields is not None else None,
+            exclude={"id", "version"},
+        )
+        update = {"$inc": {"version": 1}}
+        if values:
+            update["$set"] = values
+
+        result = await self.collection.update_one(filter_params, update)
+        if check_version and result.matched_count == 0:
+            raise ObjectVersionConflict()
+        db_object.version += 1
         return db_object
 
+    async def update_fields(self, filter_params: dict, fields: dict) -> None:
+        """Set `fields` of the first matching object without replacing it"""
+        await self.update_one(filter_params, {"$set": fields})
+
+    @traced
+    async def update_one(self, filter_params: dict, update: dict) -> None:
+        await self.collection.update_one(filter_params, update)
+
+    @traced
+    async def find_one_and_update(
+        self, filter_params: dict, update: dict
+    ) -> BDBM | None:
+        """Update the first matching object, and return it as it is after that"""
+        db_object = await self.collection.find_one_and_update(
+            filter_params, update, return_document=ReturnDocument.AFTER
+        )
+        return self.decode(db_object) if db_object else None
+
+    @traced
+    async def aggregate(self, pipeline: list[dict]) -> list[dict]:
+        return await self.collection.aggregate(pipeline).to_list(length=None)
+
+    @traced
     async def delete(self, db_object) -> None:
         await self.collection.delete_one({"id": db_object.id})
 
+    @traced
+    async def delete_many(self, filter_params: dict) -> None:
+        await self.collection.delete_many(filter_params)
+
 
 def get_project_collection():
     return DatabaseWrapper.get_projects_collection()
@@ -114,3 +276,19 @@ def get_project_credentials_collection():
 
 def get_project_deploy_collection():
     return DatabaseWrapper.get_project_deploy_collection()
+
+
+def get_project_deploy_plans_collection():
+    return DatabaseWrapper.get_project_deploy_plans_collection()
+
+
+def get_deploy_batches_collection():
+    return DatabaseWrapper.get_deploy_batches_collection()
+
+
+def get_deploy_jobs_collection():
+    return DatabaseWrapper.get_deploy_jobs_collection()
+
+
+def get_locks_collection():
+    return DatabaseWrapper.get_locks_collection()
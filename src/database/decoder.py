@@ -0,0 +1,156 @@
+import enum
+import functools
+import typing
+
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import (
+    SHAPE_DICT,
+    SHAPE_LIST,
+    SHAPE_MAPPING,
+    SHAPE_SEQUENCE,
+    SHAPE_SINGLETON,
+    ModelField,
+)
+from pydantic.utils import lenient_issubclass
+
+from config import settings
+
+M = typing.TypeVar("M", bound=BaseModel)
+
+Decoder = typing.Callable[[typing.Any], typing.Any]
+
+
+class _UndecodableValue(Exception):
+    pass
+
+
+def _identity(value: typing.Any) -> typing.Any:
+    return value
+
+
+def _get_model_field_decoder(model: typing.Type[BaseModel]) -> Decoder:
+    def decode_model(value: typing.Any) -> BaseModel:
+        if isinstance(value, model):
+            return value
+        if not isinstance(value, typing.Mapping):
+            raise _UndecodableValue()
+        return get_decoder(model)(value)
+
+    return decode_model
+
+
+def _get_enum_decoder(enum_type: typing.Type[enum.Enum]) -> Decoder:
+    def decode_enum(value: typing.Any) -> enum.Enum:
+        try:
+            return enum_type(value)
+        except ValueError:
+            raise _UndecodableValue()
+
+    return decode_enum
+
+
+def _get_union_decoder(fields: list[ModelField]) -> Decoder:
+    """
+    Pick the first member the value fits: a model whose required fields are
+    all present, or an enum with the value. Other members aren't decoded.
+    """
+    members = []
+    for field in fields:
+        if lenient_issubclass(field.type_, BaseModel):
+            required = {
+                sub_field.alias
+                for sub_field in field.type_.__fields__.values()
+                if sub_field.required
+            }
+            members.append((field.type_, required, _get_field_decoder(field)))
+        elif lenient_issubclass(field.type_, enum.Enum):
+            members.append((field.type_, None, _get_field_decoder(field)))
+        else:
+            return _identity
+
+    def decode_union(value: typing.Any) -> typing.Any:
+        for member_type, required, decoder in members:
+            if isinstance(value, member_type):
+                return value
+            if required is not None and not (
+                isinstance(value, typing.Mapping) and required <= value.keys()
+            ):
+                continue
+            try:
+                return decoder(value)
+            except _UndecodableValue:
+                continue
+        raise _UndecodableValue()
+
+    return decode_union
+
+
+def _get_field_decoder(field: ModelField) -> Decoder:
+    if field.shape != SHAPE_SINGLETON and not field.sub_fields:
+        return _identity
+    if field.shape in (SHAPE_LIST, SHAPE_SEQUENCE):
+        item_decoder = _get_field_decoder(field.sub_fields[0])
+        if item_decoder is _identity:
+            return _identity
+        return lambda value: [item_decoder(item) for item in value]
+    if field.shape in (SHAPE_DICT, SHAPE_MAPPING):
+        item_decoder = _get_field_decoder(field.sub_fields[0])
+        if item_decoder is _identity:
+            return _identity
+        return lambda value: {key: item_decoder(item) for key, item in value.items()}
+    if field.shape != SHAPE_SINGLETON:
+        return _identity
+
+    if field.sub_fields:
+        decoder = _get_union_decoder(field.sub_fields)
+    elif lenient_issubclass(field.type_, BaseModel):
+        decoder = _get_model_field_decoder(field.type_)
+    elif lenient_issubclass(field.type_, enum.Enum):
+        decoder = _get_enum_decoder(field.type_)
+    else:
+        return _identity
+
+    if not field.allow_none:
+        return decoder
+    return lambda value: None if value is None else decoder(value)
+
+
+@functools.lru_cache(maxsize=None)
+def get_decoder(model: typing.Type[M]) -> typing.Callable[[typing.Mapping], M]:
+    """
+    Build `model` objects from documents that were validated when written,
+    without validating them again.
+
+    Nested models and enums are built like pydantic does, and keys that
+    aren't fields (e.g. `_id`) are dropped. Other values are kept as they
+    are stored. A value that doesn't fit its field is validated instead.
+    """
+    field_decoders = [
+        (field, _get_field_decoder(field)) for field in model.__fields__.values()
+    ]
+
+    def decode(document: typing.Mapping) -> M:
+        values = {}
+        for field, decoder in field_decoders:
+            if field.alias not in document:
+                continue
+            value = document[field.alias]
+            try:
+                values[field.name] = decoder(value)
+            except _UndecodableValue:
+                value, errors = field.validate(value, values, loc=field.alias)
+                if errors:
+                    raise ValidationError([errors], model)
+                values[field.name] = value
+        return model.construct(**values)
+
+    return decode
+
+
+def decode(model: typing.Type[M], document: typing.Mapping) -> M:
+    return get_decoder(model)(document)
+
+
+def get_document_decoder(model: typing.Type[M]) -> typing.Callable[[typing.Mapping], M]:
+    """Decoder of documents read from the database, see `trusted_db_reads`"""
+    return get_decoder(model) if settings.trusted_db_reads else model.parse_obj
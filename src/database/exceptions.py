@@ -8,3 +8,7 @@ class ObjectAlreadyExists(DBManagerException):
 
 class ObjectDoesntExist(DBManagerException):
     pass
+
+
+class ObjectVersionConflict(DBManagerException):
+    pass
@@ -0,0 +1,46 @@
+import asyncio
+import typing
+
+T = typing.TypeVar("T")
+
+
+class IdentityMap:
+    """
+    Lookups of one request, keyed by (model name, field, value).
+
+    A lookup is started once and every caller of the same key awaits the
+    same future, so repeated lookups cost no round-trip and a lookup can be
+    started early and joined later. Writes invalidate the keys of the model.
+    """
+
+    def __init__(self):
+        self._lookups: dict[tuple, asyncio.Future] = {}
+
+    def load(
+        self, key: tuple, loader: typing.Callable[[], typing.Awaitable[T]]
+    ) -> "asyncio.Future[T]":
+        if key not in self._lookups:
+            self._lookups[key] = asyncio.ensure_future(loader())
+        return self._lookups[key]
+
+    def invalidate(self, model_name: str) -> None:
+        for key in [key for key in self._lookups if key[0] == model_name]:
+            del self._lookups[key]
+
+    def close(self) -> None:
+        """Cancel the prefetched lookups nobody awaited"""
+        for lookup in self._lookups.values():
+            if not lookup.done():
+                lookup.cancel()
+            elif not lookup.cancelled():
+                # mark a failed lookup's exception as retrieved
+                lookup.exception()
+        self._lookups.clear()
+
+
+async def get_identity_map():
+    identity_map = IdentityMap()
+    try:
+        yield identity_map
+    finally:
+        identity_map.close()
@@ -0,0 +1,126 @@
+import asyncio
+from collections.abc import Mapping
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from database.db import DatabaseWrapper
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+
+def id_index() -> IndexModel:
+    return IndexModel([("id", ASCENDING)], unique=True)
+
+
+# every index of the service, by collection name, with the default index
+# names so the "id_1" indexes created before are kept
+INDEXES: dict[str, list[IndexModel]] = {
+    "projects": [
+        id_index(),
+        # list_by_ids: {"owner": ..., "id": {"$in": ...}}, list: {"owner": ...}
+        IndexModel([("owner", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "project_credentials": [
+        id_index(),
+        IndexModel([("project", ASCENDING)], unique=True),
+        IndexModel([("created_by", ASCENDING)]),
+    ],
+    "project_deploy": [
+        id_index(),
+        IndexModel([("project", ASCENDING)], unique=True),
+        IndexModel([("created_by", ASCENDING)]),
+    ],
+    "project_deploy_plans": [
+        id_index(),
+        IndexModel(
+            [("project", ASCENDING), ("config_hash", ASCENDING)],
+        ),
+    ],
+    "deploy_batches": [
+        id_index(),
+        IndexModel([("created_by", ASCENDING)]),
+    ],
+    "deploy_jobs": [
+        id_index(),
+        IndexModel(
+            [("created_by", ASCENDING), ("operation", ASCENDING)],
+        ),
+        IndexModel([("project", ASCENDING)]),
+    ],
+    "locks": [
+        # removes leases abandoned by crashed processes, expired leases are
+        # free even before the TTL monitor removes them
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_indexes() -> None:
+    """
+    Create the declared indexes, existing ones are left as they are.
+
+    An index that can't be created (e.g. a unique index over duplicated
+    values, or a changed definition under the same name) is logged and
+    doesn't stop the other ones.
+    """
+    db = DatabaseWrapper.get_db()
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                LOGGER.error(
+                    f"Can't create index {index.document['name']} "
+                    f"on {collection_name}: {e}"
+                )
+
+    drift = await get_index_drift()
+    if drift:
+        LOGGER.warning(f"Indexes differ from the declared ones: {drift}")
+
+
+def get_index_spec(index: dict) -> dict:
+    """Comparable part of an index from `index_information()` or `IndexModel.document`"""
+    key = index["key"]
+    if isinstance(key, Mapping):
+        key = key.items()
+    return {
+        "key": [tuple(field) for field in key],
+        "unique": bool(index.get("unique", False)),
+    }
+
+
+async def get_index_drift() -> dict[str, dict[str, list[str]]]:
+    """
+    Differences between the declared and the existing indexes, as
+    {collection name: {"missing" | "changed" | "unexpected": [index names]}}
+    """
+    db = DatabaseWrapper.get_db()
+    drift = {}
+    for collection_name, indexes in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        existing.pop("_id_", None)
+        declared = {index.document["name"]: index.document for index in indexes}
+
+        collection_drift = {
+            "missing": [name for name in declared if name not in existing],
+            "changed": [
+                name
+                for name in declared
+                if name in existing
+                and get_index_spec(existing[name]) != get_index_spec(declared[name])
+            ],
+            "unexpected": [name for name in existing if name not in declared],
+        }
+        collection_drift = {
+            kind: names for kind, names in collection_drift.items() if names
+        }
+        if collection_drift:
+            drift[collection_name] = collection_drift
+    return drift
+
+
+if __name__ == "__main__":
+    print(asyncio.run(get_index_drift()))
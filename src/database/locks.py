@@ -0,0 +1,152 @@
+import asyncio
+import collections
+import contextlib
+import datetime
+import time
+import typing
+import uuid
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from config import settings
+from database.db import get_locks_collection
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+
+class LockError(Exception):
+    pass
+
+
+class LockNotAcquired(LockError):
+    pass
+
+
+class LockLost(LockError):
+    pass
+
+
+class LockService:
+    """Named locks held for the duration of an `async with lock(name)` block"""
+
+    def lock(self, name: str) -> typing.AsyncContextManager[None]:
+        raise NotImplementedError()
+
+
+class LocalLockService(LockService):
+    """Locks of the current process only, a stand-in for tests"""
+
+    def __init__(self):
+        self._locks: dict[str, asyncio.Lock] = collections.defaultdict(asyncio.Lock)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, name: str):
+        async with self._locks[name]:
+            yield
+
+
+class MongoLockService(LockService):
+    """
+    Locks shared by every process, as leases in the `locks` collection.
+
+    A lease expires `ttl` seconds after it was acquired or renewed, and it
+    is renewed while the block runs, so the lock of a crashed process is
+    free after `ttl` at the latest. If a lease can't be renewed before it
+    expires the block is cancelled and LockLost is raised, since another
+    process may hold the lock by then.
+    """
+
+    def __init__(
+        self,
+        ttl: float | None = None,
+        wait_timeout: float | None = None,
+        poll_interval: float | None = None,
+    ):
+        self.ttl = settings.lock_ttl if ttl is None else ttl
+        self.wait_timeout = (
+            settings.lock_wait_timeout if wait_timeout is None else wait_timeout
+        )
+        self.poll_interval = (
+            settings.lock_poll_interval if poll_interval is None else poll_interval
+        )
+
+    def get_expires_at(self) -> datetime.datetime:
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl)
+
+    async def try_acquire(self, name: str, owner: str) -> bool:
+        collection = get_locks_collection()
+        try:
+            await collection.insert_one(
+                {"_id": name, "owner": owner, "expires_at": self.get_expires_at()}
+            )
+            return True
+        except DuplicateKeyError:
+            pass
+        # take over an expired lease
+        result = await collection.update_one(
+            {"_id": name, "expires_at": {"$lte": datetime.datetime.utcnow()}},
+            {"$set": {"owner": owner, "expires_at": self.get_expires_at()}},
+        )
+        return result.modified_count == 1
+
+    async def acquire(self, name: str, owner: str) -> None:
+        deadline = time.monotonic() + self.wait_timeout
+        while not await self.try_acquire(name, owner):
+            if time.monotonic() >= deadline:
+                raise LockNotAcquired(name)
+            await asyncio.sleep(self.poll_interval)
+
+    async def renew(self, name: str, owner: str) -> bool:
+        result = await get_locks_collection().update_one(
+            {"_id": name, "owner": owner},
+            {"$set": {"expires_at": self.get_expires_at()}},
+        )
+        return result.matched_count == 1
+
+    async def release(self, name: str, owner: str) -> None:
+        await get_locks_collection().delete_one({"_id": name, "owner": owner})
+
+    async def keep_alive(self, name: str, owner: str, holder: asyncio.Task) -> None:
+        """Renew the lease until cancelled, cancel `holder` if it is lost"""
+        expires_at = time.monotonic() + self.ttl
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                renewed = await self.renew(name, owner)
+            except PyMongoError as e:
+                LOGGER.warning(f"Can't renew lock {name}: {e}")
+                renewed = None
+            if renewed:
+                expires_at = time.monotonic() + self.ttl
+            elif renewed is False or time.monotonic() >= expires_at:
+                LOGGER.error(f"Lock {name} is lost")
+                holder.cancel()
+                return
+
+    @contextlib.asynccontextmanager
+    async def lock(self, name: str):
+        owner = uuid.uuid4().hex
+        await self.acquire(name, owner)
+        keep_alive = asyncio.create_task(
+            self.keep_alive(name, owner, asyncio.current_task())
+        )
+        try:
+            yield
+        except asyncio.CancelledError:
+            if keep_alive.done() and not keep_alive.cancelled():
+                raise LockLost(name)
+            raise
+        finally:
+            keep_alive.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await keep_alive
+            try:
+                await self.release(name, owner)
+            except PyMongoError as e:
+                # the lease expires, an error of the block would be hidden
+                LOGGER.error(f"Can't release lock {name}: {e}")
+
+
+def get_lock_service() -> LockService:
+    return MongoLockService()
@@ -1,19 +1,56 @@
-from fastapi import Depends
+import asyncio
+import datetime
+import typing
+
 from pydantic.types import UUID4
+from pymongo import ASCENDING
 
-from api.models import ProjectCreate, ProjectCredentialsCreate, ProjectDeployCreate
+from api.models import (
+    DeployBatchCreate,
+    DeployJobCreate,
+    ProjectCreate,
+    ProjectCredentialsCreate,
+    ProjectDeployCreate,
+    ProjectDeployPlanCreate,
+)
+from config import settings
 from database.base_manager import BaseDBManager
-from database.db import MongoDatabase
+from database.db import DatabaseWrapper
+from database.decoder import get_document_decoder
+from database.exceptions import ObjectAlreadyExists, ObjectDoesntExist
 from database.models import (
+    DeployBatchDB,
+    DeployJobDB,
     ProjectCredentialsDB,
     ProjectDB,
     ProjectDeployDB,
-    get_project_credentials_database,
-    get_project_database,
-    get_project_deploy_database,
+    ProjectDeployPlanDB,
+    get_abandoned_before,
+)
+from shared.models.batches import DeployBatchItemStatus
+from shared.models.deploys import FAILED_DEPLOY_STATUSES, ProjectDeployStatus
+from shared.models.jobs import (
+    DeployJobOperation,
+    DeployJobStage,
+    DeployJobStageRecord,
+    DeployJobStatus,
+    StageHistogram,
+    StageHistogramBucket,
+)
+from utils.cache import TTLCache
+
+FullProject = tuple[ProjectDB, ProjectCredentialsDB | None, ProjectDeployDB | None]
+
+# complete full projects by (user id, project id)
+full_project_cache: TTLCache[tuple[UUID4, UUID4], FullProject] = TTLCache(
+    settings.full_project_cache_ttl, settings.full_project_cache_size
 )
 
 
+def invalidate_full_project(project_id: UUID4) -> None:
+    full_project_cache.invalidate(lambda key: key[1] == project_id)
+
+
 class ProjectManager(BaseDBManager[ProjectCreate, ProjectDB]):
     object_db_model = ProjectDB
 
@@ -23,40 +60,401 @@ class ProjectManager(BaseDBManager[ProjectCreate, ProjectDB]):
     def base_filter(self, user_id: UUID4):
         return {"owner": user_id}
 
+    async def list_by_ids(self, ids: list[UUID4], user_id: UUID4) -> list[ProjectDB]:
+        return await self.list(user_id, id={"$in": ids})
+
+    def iterate_page(
+        self,
+        user_id: UUID4,
+        fields: typing.Iterable[str],
+        limit: int = 0,
+        after: UUID4 | None = None,
+    ) -> typing.AsyncIterator[dict]:
+        """
+        Iterate the user's projects with only `fields` fetched. A page (with
+        `limit` or `after`) is ordered by id and starts after the `after` id,
+        it is served by the (owner, id) index. Without them the projects come
+        in their stored order.
+        """
+        filter_params = self.base_filter(user_id)
+        if after is not None:
+            filter_params["id"] = {"$gt": after}
+        return self.model_db.iterate(
+            filter_params,
+            projection={"_id": 0, **{field: 1 for field in fields}},
+            sort=[("id", ASCENDING)] if limit or after else None,
+            limit=limit,
+        )
+
+    def invalidate(self, db_object: ProjectDB) -> None:
+        super().invalidate(db_object)
+        invalidate_full_project(db_object.id)
+
+    async def get_full_project(self, project_id: UUID4, user_id: UUID4) -> FullProject:
+        """
+        Get the project with its credentials and deploy in one query.
+
+        Projects with both credentials and deploy are cached for
+        `full_project_cache_ttl` seconds.
+        """
+        cache_key = (user_id, project_id)
+        full_project = full_project_cache.get(cache_key)
+        if full_project is not None:
+            return full_project
+
+        result = await self.model_db.aggregate(
+            [
+                {"$match": {"id": project_id, **self.base_filter(user_id)}},
+                {"$limit": 1},
+                {
+                    "$lookup": {
+                        "from": DatabaseWrapper.get_project_credentials_collection().name,
+                        "localField": "id",
+                        "foreignField": "project",
+                        "as": "credentials",
+                    }
+                },
+                {
+                    "$lookup": {
+                        "from": DatabaseWrapper.get_project_deploy_collection().name,
+                        "localField": "id",
+                        "foreignField": "project",
+                        "as": "deploy",
+                    }
+                },
+                {"$project": {"_id": 0, "credentials._id": 0, "deploy._id": 0}},
+            ]
+        )
+        if not result:
+            raise ObjectDoesntExist()
+
+        project_data = result[0]
+        credentials = project_data.pop("credentials")
+        deploy = project_data.pop("deploy")
+        project_credentials = (
+            get_document_decoder(ProjectCredentialsDB)(credentials[0])
+            if credentials
+            else None
+        )
+        project_deploy = (
+            get_document_decoder(ProjectDeployDB)(deploy[0]) if deploy else None
+        )
+        if project_deploy and project_deploy.status not in (
+            ProjectDeployStatus.DEPLOYED,
+            ProjectDeployStatus.UPDATING,
+        ):
+            # its resources don't exist yet or are being destroyed
+            project_deploy = None
+
+        full_project = (
+            self.model_db.decode(project_data),
+            project_credentials,
+            project_deploy,
+        )
+        if project_credentials and project_deploy:
+            full_project_cache.set(cache_key, full_project)
+        return full_project
+
 
 class ProjectCredentialsManager(
     BaseDBManager[ProjectCredentialsCreate, ProjectCredentialsDB]
 ):
     object_db_model = ProjectCredentialsDB
 
-    async def get_by_project(self, project_id: UUID4):
-        result = await self.model_db.filter({"project": project_id})
-        if not result:
-            return None
-        return result[0]
+    def get_by_project(
+        self, project_id: UUID4
+    ) -> typing.Awaitable[ProjectCredentialsDB | None]:
+        return self.lookup(
+            "project",
+            project_id,
+            lambda: self.model_db.find_one({"project": project_id}),
+        )
+
+    def invalidate(self, db_object: ProjectCredentialsDB) -> None:
+        super().invalidate(db_object)
+        invalidate_full_project(db_object.project)
+
+    async def list_by_projects(
+        self, project_ids: list[UUID4]
+    ) -> list[ProjectCredentialsDB]:
+        return await self.model_db.filter({"project": {"$in": project_ids}})
 
 
 class ProjectDeployManager(BaseDBManager[ProjectDeployCreate, ProjectDeployDB]):
     object_db_model = ProjectDeployDB
 
-    async def get_by_project(self, project_id: UUID4):
-        result = await self.model_db.filter({"project": project_id})
+    def create_to_db(
+        self, create_object: ProjectDeployCreate, user_id: UUID4
+    ) -> ProjectDeployDB:
+        # the structure is written by the worker
+        return ProjectDeployDB(
+            **create_object.dict(exclude={"project_structure"}),
+            created_by=user_id,
+            status=ProjectDeployStatus.PENDING,
+            status_changed_at=datetime.datetime.utcnow(),
+        )
+
+    async def reserve(
+        self, project_deploy: ProjectDeployCreate, user_id: UUID4
+    ) -> ProjectDeployDB | None:
+        """
+        Create a pending deploy of the project, or make its failed deploy
+        pending again. The unique project index makes it atomic, so None is
+        returned to every caller but one.
+        """
+        try:
+            return await self.create(project_deploy, user_id)
+        except ObjectAlreadyExists:
+            return await self.reserve_failed(project_deploy)
+
+    async def reserve_many(
+        self, project_deploys: list[ProjectDeployCreate], user_id: UUID4
+    ) -> set[UUID4]:
+        """
+        `reserve` the deploys of many projects, the new ones with a single
+        insert. Return the ids of the projects reserved by this call.
+        """
+        created = await self.model_db.create_many(
+            [
+                self.create_to_db(project_deploy, user_id)
+                for project_deploy in project_deploys
+            ]
+        )
+        for db_object in created:
+            self.invalidate(db_object)
+        reserved = {db_object.project for db_object in created}
+        reserved_failed = await asyncio.gather(
+            *(
+                self.reserve_failed(project_deploy)
+                for project_deploy in project_deploys
+                if project_deploy.project not in reserved
+            )
+        )
+        reserved.update(
+            db_object.project for db_object in reserved_failed if db_object is not None
+        )
+        return reserved
+
+    def reserve_failed(
+        self, project_deploy: ProjectDeployCreate
+    ) -> typing.Awaitable[ProjectDeployDB | None]:
+        return self.transition(
+            project_deploy.project,
+            [ProjectDeployStatus.FAILED],
+            ProjectDeployStatus.PENDING,
+            {"deploy_type": project_deploy.deploy_type},
+        )
+
+    async def transition(
+        self,
+        project_id: UUID4,
+        from_statuses: list[ProjectDeployStatus],
+        to_status: ProjectDeployStatus,
+        fields: dict[str, typing.Any] | None = None,
+    ) -> ProjectDeployDB | None:
+        """
+        Move the project's deploy to `to_status` and set `fields` if it is in
+        one of `from_statuses`, abandoned transient statuses count as the
+        status their task sets on failure. None is returned if it isn't.
+        """
+        statuses = list(from_statuses)
+        if ProjectDeployStatus.DEPLOYED in statuses:
+            # deploys written before the statuses were added
+            statuses.append(None)
+        status_filter = {"status": {"$in": statuses}}
+        abandoned_statuses = [
+            status
+            for status, failed_status in FAILED_DEPLOY_STATUSES.items()
+            if failed_status in from_statuses
+        ]
+        if abandoned_statuses:
+            status_filter = {
+                "$or": [
+                    status_filter,
+                    {
+                        "status": {"$in": abandoned_statuses},
+                        # also written before the time was recorded
+                        "status_changed_at": {"$not": {"$gt": get_abandoned_before()}},
+                    },
+                ]
+            }
+        db_object = await self.model_db.find_one_and_update(
+            {"project": project_id, **status_filter},
+            {
+                "$set": {
+                    **(fields or {}),
+                    "status": to_status,
+                    "status_changed_at": datetime.datetime.utcnow(),
+                },
+                "$inc": {"version": 1},
+            },
+        )
+        if db_object is not None:
+            self.invalidate(db_object)
+        return db_object
+
+    def get_by_project(
+        self, project_id: UUID4
+    ) -> typing.Awaitable[ProjectDeployDB | None]:
+        return self.lookup(
+            "project",
+            project_id,
+            lambda: self.model_db.find_one({"project": project_id}),
+        )
+
+    def invalidate(self, db_object: ProjectDeployDB) -> None:
+        super().invalidate(db_object)
+        invalidate_full_project(db_object.project)
+
+
+class ProjectDeployPlanManager(
+    BaseDBManager[ProjectDeployPlanCreate, ProjectDeployPlanDB]
+):
+    object_db_model = ProjectDeployPlanDB
+
+    async def get_by_config_hash(self, project_id: UUID4, config_hash: str):
+        result = await self.model_db.filter(
+            {"project": project_id, "config_hash": config_hash}
+        )
         if not result:
             return None
         return result[0]
 
+    async def delete_by_project(self, project_id: UUID4) -> None:
+        await self.model_db.delete_many({"project": project_id})
 
-def get_project_manager(project_db: MongoDatabase = Depends(get_project_database)):
-    return ProjectManager(project_db)
 
+class DeployBatchManager(BaseDBManager[DeployBatchCreate, DeployBatchDB]):
+    object_db_model = DeployBatchDB
 
-def get_project_credentials_manager(
-    project_credentials_db: MongoDatabase = Depends(get_project_credentials_database),
-):
-    return ProjectCredentialsManager(project_credentials_db)
+    async def set_item_status(
+        self,
+        batch_id: UUID4,
+        project_id: UUID4,
+        item_status: DeployBatchItemStatus,
+        detail: str | None = None,
+    ) -> None:
+        await self.model_db.update_fields(
+            {"id": batch_id, "items.project": project_id},
+            {"items.$.status": item_status, "items.$.detail": detail},
+        )
 
 
-def get_project_deploy_manager(
-    project_deploy_db: MongoDatabase = Depends(get_project_deploy_database),
-):
-    return ProjectDeployManager(project_deploy_db)
+class DeployJobManager(BaseDBManager[DeployJobCreate, DeployJobDB]):
+    object_db_model = DeployJobDB
+
+    async def create_queued(
+        self,
+        project_id: UUID4,
+        operation: DeployJobOperation,
+        user_id: UUID4,
+        config_hash: str | None = None,
+    ) -> DeployJobDB:
+        return await self.create(
+            DeployJobCreate(
+                project=project_id,
+                operation=operation,
+                config_hash=config_hash,
+                stages=[
+                    DeployJobStageRecord(
+                        stage=DeployJobStage.QUEUED,
+                        started_at=datetime.datetime.utcnow(),
+                    )
+                ],
+            ),
+            user_id,
+        )
+
+    async def get_unfinished_plan(
+        self, project_id: UUID4, config_hash: str
+    ) -> DeployJobDB | None:
+        """
+        The queued or running PLAN job of the configuration. Jobs queued
+        longer than `deploy_status_timeout` ago are ignored, their task may
+        be lost.
+        """
+        return await self.model_db.find_one(
+            {
+                "project": project_id,
+                "operation": DeployJobOperation.PLAN,
+                "config_hash": config_hash,
+                "status": {"$in": [DeployJobStatus.QUEUED, DeployJobStatus.RUNNING]},
+                "stages.0.started_at": {"$gt": get_abandoned_before()},
+            }
+        )
+
+    async def start_stage(self, job_id: UUID4, record: DeployJobStageRecord) -> None:
+        await self.model_db.update_one(
+            {"id": job_id},
+            {
+                "$push": {"stages": record.dict()},
+                "$set": {"status": DeployJobStatus.RUNNING},
+            },
+        )
+
+    async def finish_stage(self, job_id: UUID4, record: DeployJobStageRecord) -> None:
+        await self.model_db.update_fields(
+            {
+                "id": job_id,
+                "stages": {"$elemMatch": {"stage": record.stage, "finished_at": None}},
+            },
+            {"stages.$": record.dict()},
+        )
+
+    async def finish(
+        self, job_id: UUID4, job_status: DeployJobStatus, error: str | None = None
+    ) -> None:
+        await self.model_db.update_fields(
+            {"id": job_id}, {"status": job_status, "error": error}
+        )
+
+    async def get_stage_histograms(
+        self,
+        user_id: UUID4,
+        boundaries: list[float],
+        operation: DeployJobOperation | None = None,
+    ) -> list[StageHistogram]:
+        """Count finished stages of the user's jobs by duration buckets"""
+        job_filter = self.base_filter(user_id)
+        if operation is not None:
+            job_filter["operation"] = operation
+        boundaries = sorted(boundaries)
+        histogram_facets = {
+            stage.value: [
+                {"$match": {"stages.stage": stage}},
+                {
+                    "$bucket": {
+                        "groupBy": "$stages.duration",
+                        # $bucket boundaries are lower bounds
+                        "boundaries": [0, *boundaries],
+                        "default": "overflow",
+                        "output": {"count": {"$sum": 1}},
+                    }
+                },
+            ]
+            for stage in DeployJobStage
+        }
+        result = await self.model_db.aggregate(
+            [
+                {"$match": job_filter},
+                {"$unwind": "$stages"},
+                {"$match": {"stages.duration": {"$ne": None}}},
+                {"$facet": histogram_facets},
+            ]
+        )
+        facets = result[0] if result else {}
+
+        histograms = []
+        for stage in DeployJobStage:
+            counts = {
+                bucket["_id"]: bucket["count"] for bucket in facets.get(stage.value, [])
+            }
+            buckets = [
+                StageHistogramBucket(le=upper_bound, count=counts.get(lower_bound, 0))
+                for lower_bound, upper_bound in zip([0, *boundaries], boundaries)
+            ]
+            buckets.append(
+                StageHistogramBucket(le=None, count=counts.get("overflow", 0))
+            )
+            histograms.append(StageHistogram(stage=stage, buckets=buckets))
+        return histograms
@@ -1,13 +1,20 @@
+import datetime
+
 from pydantic import UUID4
 
+from config import settings
 from database.base_models import BaseDBModel
 from database.db import (
     MongoDatabase,
+    get_deploy_batches_collection,
+    get_deploy_jobs_collection,
     get_project_collection,
     get_project_credentials_collection,
     get_project_deploy_collection,
+    get_project_deploy_plans_collection,
 )
 from shared.models import mixins as shared_mixins
+from shared.models.deploys import FAILED_DEPLOY_STATUSES, ProjectDeployStatus
 
 
 class ProjectDB(shared_mixins.ProjectMixin, BaseDBModel):
@@ -21,7 +28,46 @@ class ProjectCredentialsDB(shared_mixins.ProjectCredentialsMixin, BaseDBModel):
 
 class ProjectDeployDB(shared_mixins.ProjectDeployMixin, BaseDBModel):
     project: UUID4
-    project_structure: dict
+    project_structure: dict = {}
+    # hashes of the applied terraform configuration, written by the worker,
+    # see shared.terraform.config
+    config_hash: str | None = None
+    config_file_hashes: dict[str, str] | None = None
+    # deploys written before the statuses were added are deployed
+    status: ProjectDeployStatus = ProjectDeployStatus.DEPLOYED
+    # set with the status, by the API and the worker
+    status_changed_at: datetime.datetime | None = None
+
+    def get_status(self) -> ProjectDeployStatus:
+        """
+        The status, or the one its task sets on failure if the task is
+        abandoned, see `get_abandoned_before`
+        """
+        if self.status in FAILED_DEPLOY_STATUSES and (
+            self.status_changed_at is None
+            or self.status_changed_at <= get_abandoned_before()
+        ):
+            return FAILED_DEPLOY_STATUSES[self.status]
+        return self.status
+
+
+def get_abandoned_before() -> datetime.datetime:
+    """Transient deploy statuses set before this time are abandoned"""
+    return datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=settings.deploy_status_timeout
+    )
+
+
+class ProjectDeployPlanDB(shared_mixins.ProjectDeployPlanMixin, BaseDBModel):
+    project: UUID4
+
+
+class DeployBatchDB(shared_mixins.DeployBatchMixin, BaseDBModel):
+    pass
+
+
+class DeployJobDB(shared_mixins.DeployJobMixin, BaseDBModel):
+    pass
 
 
 def get_project_database() -> MongoDatabase:
@@ -34,3 +80,15 @@ def get_project_credentials_database() -> MongoDatabase:
 
 def get_project_deploy_database() -> MongoDatabase:
     return MongoDatabase(ProjectDeployDB, get_project_deploy_collection())
+
+
+def get_project_deploy_plan_database() -> MongoDatabase:
+    return MongoDatabase(ProjectDeployPlanDB, get_project_deploy_plans_collection())
+
+
+def get_deploy_batch_database() -> MongoDatabase:
+    return MongoDatabase(DeployBatchDB, get_deploy_batches_collection())
+
+
+def get_deploy_job_database() -> MongoDatabase:
+    return MongoDatabase(DeployJobDB, get_deploy_jobs_collection())
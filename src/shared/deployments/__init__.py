@@ -1,20 +1,92 @@
-from shared.deployments.aws_deployments.aws_1 import AWSDataLakeDeployment1
-from shared.deployments.aws_deployments.aws_2 import AWSDataLakeDeployment2
-from shared.deployments.azure_deployments.azure_1 import AzureDataLakeDeployment1
-from shared.deployments.gcp_deployments.gcp_1 import GCPDataLakeDeployment1
-from shared.deployments.gcp_deployments.gcp_2 import GCPDataLakeDeployment2
-from shared.deployments.gcp_deployments.gcp_3 import GCPDataLakeDeployment3
+import importlib
+import importlib.metadata
+import typing
+
 from shared.models.deploy_types import (
     AWSProjectDeployType,
     AzureProjectDeployType,
     GCPProjectDeployType,
 )
 
-DEPLOYMENT_CLASSES = {
-    AWSProjectDeployType.AWS_1: AWSDataLakeDeployment1,
-    AWSProjectDeployType.AWS_2: AWSDataLakeDeployment2,
-    GCPProjectDeployType.GCP_1: GCPDataLakeDeployment1,
-    GCPProjectDeployType.GCP_2: GCPDataLakeDeployment2,
-    GCPProjectDeployType.GCP_3: GCPDataLakeDeployment3,
-    AzureProjectDeployType.AZURE_1: AzureDataLakeDeployment1,
+if typing.TYPE_CHECKING:
+    from shared.deployments.base import DataLakeDeploymentInterface
+
+# other packages add deploy types with entry points of this group, named
+# after the deploy type, e.g. `GCP_4 = "package.module:Deployment"`
+ENTRY_POINT_GROUP = "datalake_deploy_service.deployments"
+
+BUILTIN_DEPLOYMENTS = {
+    AWSProjectDeployType.AWS_1: (
+        "shared.deployments.aws_deployments.aws_1:AWSDataLakeDeployment1"
+    ),
+    AWSProjectDeployType.AWS_2: (
+        "shared.deployments.aws_deployments.aws_2:AWSDataLakeDeployment2"
+    ),
+    GCPProjectDeployType.GCP_1: (
+        "shared.deployments.gcp_deployments.gcp_1:GCPDataLakeDeployment1"
+    ),
+    GCPProjectDeployType.GCP_2: (
+        "shared.deployments.gcp_deployments.gcp_2:GCPDataLakeDeployment2"
+    ),
+    GCPProjectDeployType.GCP_3: (
+        "shared.deployments.gcp_deployments.gcp_3:GCPDataLakeDeployment3"
+    ),
+    AzureProjectDeployType.AZURE_1: (
+        "shared.deployments.azure_deployments.azure_1:AzureDataLakeDeployment1"
+    ),
 }
+
+
+def load_object(path: str) -> typing.Any:
+    """Object of a "module:attribute" path"""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class DeploymentRegistry(
+    typing.Mapping[str, typing.Type["DataLakeDeploymentInterface"]]
+):
+    """
+    Deployment classes by deploy type, the module of a class is imported the
+    first time the class is looked up. Entry points of `ENTRY_POINT_GROUP`
+    are read when an unknown deploy type is looked up or the registry is
+    iterated, built-in deploy types take precedence over them.
+    """
+
+    def __init__(self, paths: dict[str, str]):
+        self._paths = {
+            getattr(deploy_type, "value", deploy_type): path
+            for deploy_type, path in paths.items()
+        }
+        self._classes: dict[str, typing.Type["DataLakeDeploymentInterface"]] = {}
+        self._entry_points_loaded = False
+
+    def _load_entry_points(self) -> None:
+        if self._entry_points_loaded:
+            return
+        for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+            self._paths.setdefault(entry_point.name, entry_point.value)
+        self._entry_points_loaded = True
+
+    def __getitem__(
+        self, deploy_type: str
+    ) -> typing.Type["DataLakeDeploymentInterface"]:
+        deploy_type = getattr(deploy_type, "value", deploy_type)
+        deployment_class = self._classes.get(deploy_type)
+        if deployment_class is None:
+            if deploy_type not in self._paths:
+                self._load_entry_points()
+            deployment_class = load_object(self._paths[deploy_type])
+            self._classes[deploy_type] = deployment_class
+        return deployment_class
+
+    def __iter__(self) -> typing.Iterator[str]:
+        self._load_entry_points()
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        self._load_entry_points()
+        return len(self._paths)
+
+
+DEPLOYMENT_CLASSES = DeploymentRegistry(BUILTIN_DEPLOYMENTS)
@@ -1,14 +1,21 @@
-import os
-import subprocess
-import uuid
+import contextlib
+import typing
 
 from pydantic import BaseModel
 
-from database.models import ProjectCredentialsDB, ProjectDB, ProjectDeployDB
-from shared.deployments.base import DataLakeDeploymentInterface
-from utils.logger import setup_logger
-
-LOGGER = setup_logger()
+from database.models import ProjectCredentialsDB, ProjectDB
+from shared.deployments.base import TerraformDataLakeDeployment, resource_uuid
+from shared.deployments.fragments import (
+    QQ_STATE_BUCKET,
+    aws_dynamodb,
+    aws_provider,
+    aws_s3_bucket,
+    merge,
+    state,
+)
+from shared.models.deploy_types import AWSProjectDeployType
+from shared.terraform.templates import register_templates
+from utils.aws import get_credentials_env
 
 
 class S3DeployedResource(BaseModel):
@@ -24,130 +31,36 @@ class AWSDeployedResources2(BaseModel):
     dynamodb: DynamoDBResource
 
 
-TF_STATE = """
-terraform {{
-  backend "gcs" {{
-    bucket  = "qqbucket"
-    prefix  = "terraform/{}"
-  }}
-  required_providers {{
-    aws = {{
-      source  = "hashicorp/aws"
-      version = "~> 3.0"
-    }}
-  }}
-}}
-
-# Configure the AWS Provider
-provider "aws" {{
-  region = "us-east-1"
-}}
-
-"""
-
-AWS_STORAGE = """
-resource "aws_s3_bucket" "b" {{
-  bucket = "{}"
-}}
-"""
-
-
-AWS_DYNAMODB = """
-resource "aws_dynamodb_table" "basic-dynamodb-table" {{
-  name           = "{}"
-  billing_mode   = "PROVISIONED"
-  read_capacity  = 1
-  write_capacity = 1
-  hash_key       = "id"
-
-  attribute {{
-    name = "id"
-    type = "S"
-  }}
-}}
-"""
-
-
-class AWSDataLakeDeployment2(DataLakeDeploymentInterface):
-    def deploy_data_lake(self, project: ProjectDB, credentials: ProjectCredentialsDB):
-        LOGGER.info("Creating AWS Data Lake Deployment 2")
-        this_env = dict(
-            os.environ,
-            AWS_ACCESS_KEY_ID=credentials.credentials.access_key_id,
-            AWS_SECRET_ACCESS_KEY=credentials.credentials.secret_access_key,
-        )
-
-        directory_path = f"/usr/app/infrastructure/{project.id}"
-        os.makedirs(directory_path, exist_ok=True)
-        with open(os.path.join(directory_path, "state.tf"), "w") as f:
-            tf_state_f = TF_STATE.format(str(project.id))
-            f.write(tf_state_f)
-
-        process = subprocess.run(
-            ["terraform", f"-chdir={directory_path}", "init"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=this_env,
-        )
-        LOGGER.debug(
-            f"Terraform init execution result:\n"
-            f"stdout: '{process.stdout.decode()}'\n"
-            f"stderr:{process.stderr.decode()}\n"
-            f"exit code:{process.returncode}"
-        )
-
-        bucket_name = f"{uuid.uuid4()}-{project.id}"[:63]
-        dynamodb_name = f"{uuid.uuid4()}-{project.id}"[:63]
-
-        LOGGER.info(f"Creating S3 bucket with name {bucket_name}")
-        with open(os.path.join(directory_path, "bucket.tf"), "w") as f:
-            f.write(AWS_STORAGE.format(bucket_name))
-
-        LOGGER.info(f"Creating DynamoDB with name {dynamodb_name}")
-        with open(os.path.join(directory_path, "dynamodb.tf"), "w") as f:
-            f.write(AWS_DYNAMODB.format(dynamodb_name))
-
-        process = subprocess.run(
-            ["terraform", f"-chdir={directory_path}", "apply", "-auto-approve"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=this_env,
-        )
-        LOGGER.debug(
-            f"Terraform apply execution result:\n"
-            f"stdout: '{process.stdout.decode()}'\n"
-            f"stderr:{process.stderr.decode()}\n"
-            f"exit code:{process.returncode}"
-        )
-        LOGGER.info("AWS Data Lake Deployment 2 created")
-        return AWSDeployedResources2(
-            s3={"bucket_name": bucket_name},
-            dynamodb={"dynamodb_name": dynamodb_name},
-        )
-
-    def delete_data_lake(
-        self,
-        project: ProjectDB,
-        credentials: ProjectCredentialsDB,
-        project_deploy: ProjectDeployDB,
-    ):
-        LOGGER.info("Deleting AWS Data Lake Deployment 2")
-        this_env = dict(
-            os.environ,
-            AWS_ACCESS_KEY_ID=credentials.credentials.access_key_id,
-            AWS_SECRET_ACCESS_KEY=credentials.credentials.secret_access_key,
-        )
-        directory_path = f"/usr/app/infrastructure/{project.id}"
-        process = subprocess.run(
-            ["terraform", f"-chdir={directory_path}", "destroy", "-auto-approve"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=this_env,
-        )
-        LOGGER.debug(
-            f"Terraform destroy execution result:\n"
-            f"stdout: '{process.stdout.decode()}'\n"
-            f"stderr:{process.stderr.decode()}\n"
-            f"exit code:{process.returncode}"
-        )
-        LOGGER.info("AWS Data Lake Deployment 2 deleted")
+TEMPLATES = register_templates(
+    AWSProjectDeployType.AWS_2,
+    {
+        "state.tf.json": merge(state(QQ_STATE_BUCKET), aws_provider()),
+        "bucket.tf.json": aws_s3_bucket(),
+        "dynamodb.tf.json": aws_dynamodb(),
+    },
+)
+
+TF_OUTPUTS = {
+    "s3": {"bucket_name": "s3_bucket_name"},
+    "dynamodb": {"dynamodb_name": "dynamodb_name"},
+}
+
+
+class AWSDataLakeDeployment2(TerraformDataLakeDeployment):
+    name = "AWS Data Lake Deployment 2"
+    deployed_resources_model = AWSDeployedResources2
+    outputs_mapping = TF_OUTPUTS
+    templates = TEMPLATES
+
+    def get_terraform_env(
+        self, credentials: ProjectCredentialsDB
+    ) -> typing.ContextManager[dict[str, str]]:
+        return contextlib.nullcontext(get_credentials_env(credentials.credentials))
+
+    def get_resource_names(
+        self, project: ProjectDB, credentials: ProjectCredentialsDB
+    ) -> dict[str, str]:
+        return {
+            "s3_bucket_name": f"{resource_uuid(project, 's3')}-{project.id}"[:63],
+            "dynamodb_name": f"{resource_uuid(project, 'dynamodb')}-{project.id}"[:63],
+        }
@@ -1,16 +1,18 @@
 from database.models import ProjectCredentialsDB, ProjectDB, ProjectDeployDB
-from shared.deployments.base import DataLakeDeploymentInterface
+from shared.deployments.base import DataLakeDeploymentInterface, DataLakeDeployResult
 from utils.logger import setup_logger
 
 LOGGER = setup_logger()
 
 
 class AzureDataLakeDeployment1(DataLakeDeploymentInterface):
-    def deploy_data_lake(self, project: ProjectDB, credentials: ProjectCredentialsDB):
+    async def deploy_data_lake(
+        self, project: ProjectDB, credentials: ProjectCredentialsDB
+    ) -> DataLakeDeployResult:
         # TODO:
-        return {}
+        return DataLakeDeployResult(project_structure={})
 
-    def delete_data_lake(
+    async def delete_data_lake(
         self,
         project: ProjectDB,
         credentials: ProjectCredentialsDB,
@@ -1,16 +1,468 @@
+import contextlib
+import functools
+import typing
+import uuid
+
+from pydantic import BaseModel
+
+from database.locks import LockService, get_lock_service
 from database.models import ProjectCredentialsDB, ProjectDB, ProjectDeployDB
+from shared.deployments.tracking import StageTracker
+from shared.models.jobs import DeployJobStage
+from shared.models.plans import PlanPreview
+from shared.terraform.config import (
+    get_config_file_hashes,
+    get_config_hash,
+    get_resource_addresses,
+    is_targetable,
+    write_config,
+)
+from shared.terraform.exceptions import TerraformCommandError
+from shared.terraform.outputs import (
+    OutputsMapping,
+    StateValues,
+    read_deployed_resources,
+    read_state_values,
+    recover_deployed_resources,
+    unmap_outputs,
+)
+from shared.terraform.plans import get_or_create_plan, is_stale_plan_error, remove_plans
+from shared.terraform.runner import TerraformRunner
+from shared.terraform.templates import ConfigTemplates, render_templates
+from shared.terraform.workspaces import (
+    get_workspace_path,
+    remove_workspace,
+    use_workspace,
+)
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+
+class MissingResourceNames(Exception):
+    """A deployed project's structure lacks names that only its state has"""
+
+
+class DataLakeDeployResult(BaseModel):
+    project_structure: dict
+    config_hash: str | None = None
+    config_file_hashes: dict[str, str] | None = None
 
 
 class DataLakeDeploymentInterface:
-    def deploy_data_lake(
+    def __init__(
+        self,
+        tracker: StageTracker | None = None,
+        lock_service: LockService | None = None,
+    ):
+        self.tracker = tracker or StageTracker()
+        self.lock_service = lock_service or get_lock_service()
+
+    def get_config_hash(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB | None = None,
+    ) -> str:
+        raise NotImplementedError()
+
+    async def plan_data_lake(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB | None = None,
+    ) -> PlanPreview:
+        raise NotImplementedError()
+
+    async def deploy_data_lake(
         self, project: ProjectDB, credentials: ProjectCredentialsDB
-    ) -> dict:
+    ) -> DataLakeDeployResult:
+        raise NotImplementedError()
+
+    async def redeploy_data_lake(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB,
+    ) -> DataLakeDeployResult | None:
+        """Apply configuration changes, returns None if there is nothing to change"""
         raise NotImplementedError()
 
-    def delete_data_lake(
+    async def delete_data_lake(
         self,
         project: ProjectDB,
         credentials: ProjectCredentialsDB,
         project_deploy: ProjectDeployDB,
     ):
         raise NotImplementedError()
+
+
+def with_project_lock(method):
+    """
+    Hold the lock of the project, the first argument of `method`, while it
+    runs. Operations of different projects don't wait for each other.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self, project: ProjectDB, *args, **kwargs):
+        async with self.lock_service.lock(f"project:{project.id}"):
+            return await method(self, project, *args, **kwargs)
+
+    return wrapper
+
+
+def with_workspace(method):
+    """Keep the workspace of the project, the first argument of `method`, while it runs"""
+
+    @functools.wraps(method)
+    async def wrapper(self, project: ProjectDB, *args, **kwargs):
+        async with use_workspace(project.id):
+            return await method(self, project, *args, **kwargs)
+
+    return wrapper
+
+
+def resource_uuid(project: ProjectDB, resource: str) -> uuid.UUID:
+    """Stable per-project identifier for naming a cloud resource"""
+    return uuid.uuid5(project.id, resource)
+
+
+class TerraformDataLakeDeployment(DataLakeDeploymentInterface):
+    """
+    Deployment driven by a rendered terraform configuration.
+
+    The configuration files are the `templates` of the deployment, rendered
+    with the resource names and the `get_template_params` of the project.
+    The configuration is planned once into a binary plan artifact keyed by the
+    project and the hash of the rendered files, and the apply consumes it.
+    Rendering must be deterministic for the same project and credentials.
+
+    Resource names are keyed by the names of the terraform outputs that
+    expose them, so the names of a deployed project can be restored from its
+    stored project structure. Names that structures stored by earlier
+    versions lack are read from the state, see `state_names`.
+
+    Every terraform operation holds the lock of the project, so operations
+    of workers sharing the working directory of a project never overlap.
+    The working directory is built again by every operation from the
+    rendered configuration and the remote backend, so any worker can run
+    any operation, see `shared.terraform.workspaces`.
+    """
+
+    name: str
+    deployed_resources_model: typing.Type[BaseModel]
+    outputs_mapping: OutputsMapping
+    templates: ConfigTemplates
+    # names of deployed resources that weren't always stored in the project
+    # structure, they are read from the state since new names would replace
+    # the resources
+    state_names: StateValues = {}
+
+    def get_terraform_env(
+        self, credentials: ProjectCredentialsDB
+    ) -> typing.ContextManager[dict[str, str]]:
+        """
+        Environment of the terraform commands, files it points to (e.g. key
+        files) exist until the context exits
+        """
+        raise NotImplementedError()
+
+    def get_resource_names(
+        self, project: ProjectDB, credentials: ProjectCredentialsDB
+    ) -> dict[str, str]:
+        """Names of new resources as {terraform output name: resource name}"""
+        raise NotImplementedError()
+
+    def get_template_params(
+        self, project: ProjectDB, credentials: ProjectCredentialsDB
+    ) -> dict[str, typing.Any]:
+        """Template parameters other than the resource names"""
+        return {"state_prefix": f"terraform/{project.id}"}
+
+    def render_config(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        names: dict[str, str],
+    ) -> dict[str, str]:
+        """Terraform files of the deployment as {file name: content}"""
+        params = self.get_template_params(project, credentials)
+        return render_templates(self.templates, dict(params, **names))
+
+    def get_missing_names(self, project_deploy: ProjectDeployDB) -> set[str]:
+        """The `state_names` the deploy's stored project structure lacks"""
+        if not project_deploy.project_structure:
+            # nothing was applied yet, or the apply failed: the resources have
+            # their new names
+            return set()
+        stored_names = unmap_outputs(
+            self.outputs_mapping, project_deploy.project_structure
+        )
+        return self.state_names.keys() - stored_names.keys()
+
+    def render(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB | None = None,
+        names: dict[str, str] | None = None,
+    ) -> dict[str, str]:
+        """
+        Render the configuration with the names of the resources of
+        `project_deploy`, `names`, and new names for the other resources.
+        Raises MissingResourceNames if a name of the deployed resources is
+        unknown, `init_rendered_workspace` reads them from the state.
+        """
+        resource_names = self.get_resource_names(project, credentials)
+        if project_deploy is not None:
+            missing_names = (
+                self.get_missing_names(project_deploy) - (names or {}).keys()
+            )
+            if missing_names:
+                raise MissingResourceNames(sorted(missing_names))
+            resource_names.update(
+                unmap_outputs(self.outputs_mapping, project_deploy.project_structure)
+            )
+        resource_names.update(names or {})
+        return self.render_config(project, credentials, resource_names)
+
+    def render_with_new_names(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB,
+    ) -> dict[str, str]:
+        """
+        `render` with new names for the ones the deploy's structure lacks,
+        enough to initialize the workspace or to destroy the state
+        """
+        new_names = self.get_resource_names(project, credentials)
+        return self.render(
+            project,
+            credentials,
+            project_deploy,
+            {name: new_names[name] for name in self.get_missing_names(project_deploy)},
+        )
+
+    def get_config_hash(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB | None = None,
+    ) -> str:
+        config = self.render(project, credentials, project_deploy)
+        return get_config_hash(get_config_file_hashes(config))
+
+    def get_directory_path(self, project: ProjectDB) -> str:
+        return get_workspace_path(project.id)
+
+    @contextlib.asynccontextmanager
+    async def init_workspace(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        config: dict[str, str],
+    ) -> typing.AsyncIterator[TerraformRunner]:
+        """
+        Initialize the workspace and yield a runner of it. Every command of the
+        runner shares the credentials of the block, they are removed after it.
+        """
+        directory_path = self.get_directory_path(project)
+        write_config(directory_path, config)
+        with self.get_terraform_env(credentials) as env:
+            terraform = TerraformRunner(directory_path, env)
+            async with self.tracker.stage(DeployJobStage.INIT) as stage:
+                stage.exit_code = (await terraform.init()).exit_code
+            yield terraform
+
+    @contextlib.asynccontextmanager
+    async def init_rendered_workspace(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB | None = None,
+    ) -> typing.AsyncIterator[tuple[TerraformRunner, dict[str, str]]]:
+        """
+        `init_workspace` with the rendered configuration of the project, yield
+        a runner and the configuration. Names the stored structure of
+        `project_deploy` lacks are read from the state once the backend is
+        initialized, which doesn't depend on them.
+        """
+        if project_deploy is None:
+            missing_names = set()
+            config = self.render(project, credentials)
+        else:
+            missing_names = self.get_missing_names(project_deploy)
+            config = self.render_with_new_names(project, credentials, project_deploy)
+        async with self.init_workspace(project, credentials, config) as terraform:
+            if missing_names:
+                state_names = read_state_values(
+                    await terraform.show(),
+                    {name: self.state_names[name] for name in missing_names},
+                )
+                LOGGER.info(f"Names {sorted(state_names)} are read from the state")
+                config = self.render(project, credentials, project_deploy, state_names)
+                write_config(terraform.directory_path, config)
+            yield terraform, config
+
+    @with_project_lock
+    @with_workspace
+    async def plan_data_lake(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB | None = None,
+    ) -> PlanPreview:
+        LOGGER.info(f"Planning {self.name}")
+        async with self.init_rendered_workspace(
+            project, credentials, project_deploy
+        ) as (terraform, config):
+            config_hash = get_config_hash(get_config_file_hashes(config))
+            # the targets of the update, so it applies the previewed plan
+            targets = (
+                self.get_targets(config, project_deploy.config_file_hashes)
+                if project_deploy is not None
+                else None
+            )
+            async with self.tracker.stage(DeployJobStage.PLAN):
+                _, preview = await get_or_create_plan(
+                    terraform, project.id, config_hash, targets
+                )
+        return preview
+
+    @with_project_lock
+    @with_workspace
+    async def deploy_data_lake(
+        self, project: ProjectDB, credentials: ProjectCredentialsDB
+    ) -> DataLakeDeployResult:
+        LOGGER.info(f"Creating {self.name}")
+        config = self.render(project, credentials)
+        async with self.init_workspace(project, credentials, config) as terraform:
+            recovered = await recover_deployed_resources(
+                terraform, self.deployed_resources_model, self.outputs_mapping
+            )
+            if recovered:
+                LOGGER.info(f"{self.name} is already applied")
+                return self.get_deploy_result(recovered, config)
+
+            await self.apply(terraform, project, config)
+            LOGGER.info(f"{self.name} created")
+            return await self.read_deploy_result(terraform, config)
+
+    @with_project_lock
+    @with_workspace
+    async def redeploy_data_lake(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB,
+    ) -> DataLakeDeployResult | None:
+        if not self.get_missing_names(project_deploy):
+            config = self.render(project, credentials, project_deploy)
+            config_hash = get_config_hash(get_config_file_hashes(config))
+            if config_hash == project_deploy.config_hash:
+                LOGGER.info(f"{self.name} is up to date")
+                return None
+
+        async with self.init_rendered_workspace(
+            project, credentials, project_deploy
+        ) as (terraform, config):
+            targets = self.get_targets(config, project_deploy.config_file_hashes)
+            LOGGER.info(f"Updating {self.name}, targets: {targets or 'all'}")
+            await self.apply(terraform, project, config, targets)
+            LOGGER.info(f"{self.name} updated")
+            return await self.read_deploy_result(terraform, config)
+
+    def get_targets(
+        self, config: dict[str, str], deployed_file_hashes: dict[str, str] | None
+    ) -> list[str] | None:
+        """
+        Resources of the changed files, or None if the whole configuration has
+        to be applied: nothing is known about the deployed files, files were
+        added or removed, or a changed file configures more than resources
+        (backend, providers). Every template keeps dependent resources in
+        the same file, so targeting a file never misses a dependency.
+        """
+        if not deployed_file_hashes or set(deployed_file_hashes) != set(config):
+            return None
+        config_file_hashes = get_config_file_hashes(config)
+        changed_files = [
+            file_name
+            for file_name in sorted(config)
+            if config_file_hashes[file_name] != deployed_file_hashes[file_name]
+        ]
+        if not all(is_targetable(config[file_name]) for file_name in changed_files):
+            return None
+        return [
+            address
+            for file_name in changed_files
+            for address in get_resource_addresses(config[file_name])
+        ]
+
+    async def apply(
+        self,
+        terraform: TerraformRunner,
+        project: ProjectDB,
+        config: dict[str, str],
+        targets: list[str] | None = None,
+    ) -> None:
+        config_hash = get_config_hash(get_config_file_hashes(config))
+        try:
+            async with self.tracker.stage(DeployJobStage.PLAN):
+                plan_path, _ = await get_or_create_plan(
+                    terraform, project.id, config_hash, targets
+                )
+            try:
+                async with self.tracker.stage(DeployJobStage.APPLY) as stage:
+                    stage.exit_code = (await terraform.apply(plan_path)).exit_code
+            except TerraformCommandError as e:
+                if not is_stale_plan_error(e):
+                    raise
+                LOGGER.info("Saved terraform plan is stale, planning again")
+                remove_plans(project.id)
+                async with self.tracker.stage(DeployJobStage.PLAN):
+                    plan_path, _ = await get_or_create_plan(
+                        terraform, project.id, config_hash, targets
+                    )
+                async with self.tracker.stage(DeployJobStage.APPLY) as stage:
+                    stage.exit_code = (await terraform.apply(plan_path)).exit_code
+        finally:
+            # a plan can't be applied twice
+            remove_plans(project.id)
+
+    async def read_deploy_result(
+        self, terraform: TerraformRunner, config: dict[str, str]
+    ) -> DataLakeDeployResult:
+        async with self.tracker.stage(DeployJobStage.OUTPUT_PARSE):
+            deployed_resources = await read_deployed_resources(
+                terraform, self.deployed_resources_model, self.outputs_mapping
+            )
+        return self.get_deploy_result(deployed_resources, config)
+
+    def get_deploy_result(
+        self, deployed_resources: BaseModel, config: dict[str, str]
+    ) -> DataLakeDeployResult:
+        config_file_hashes = get_config_file_hashes(config)
+        return DataLakeDeployResult(
+            project_structure=deployed_resources.dict(),
+            config_hash=get_config_hash(config_file_hashes),
+            config_file_hashes=config_file_hashes,
+        )
+
+    @with_project_lock
+    @with_workspace
+    async def delete_data_lake(
+        self,
+        project: ProjectDB,
+        credentials: ProjectCredentialsDB,
+        project_deploy: ProjectDeployDB,
+    ):
+        LOGGER.info(f"Deleting {self.name}")
+        # the resources of the state are destroyed whatever their names
+        config = self.render_with_new_names(project, credentials, project_deploy)
+        async with self.init_workspace(project, credentials, config) as terraform:
+            async with self.tracker.stage(DeployJobStage.DESTROY) as stage:
+                stage.exit_code = (await terraform.destroy()).exit_code
+        remove_plans(project.id)
+        remove_workspace(project.id)
+        LOGGER.info(f"{self.name} deleted")
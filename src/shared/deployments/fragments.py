@@ -0,0 +1,200 @@
+"""
+Parts of the terraform configurations shared by the deployments, as terraform
+JSON documents. Values given per project are `Param`s, see
+`shared.terraform.templates`.
+"""
+import json
+
+from shared.terraform.templates import Param, ref
+
+STATE_BUCKET = "insmouth-lake-dev-proj-tf-state"
+QQ_STATE_BUCKET = "qqbucket"
+
+BIGQUERY_SCHEMA = [
+    {"name": "id", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "file", "type": "BYTES", "mode": "REQUIRED"},
+    {"name": "name", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "type", "type": "STRING", "mode": "REQUIRED"},
+    {"name": "size", "type": "INTEGER", "mode": "REQUIRED"},
+    {"name": "timestamp", "type": "TIMESTAMP", "mode": "REQUIRED"},
+    {"name": "source", "type": "STRING", "mode": "REQUIRED"},
+    {
+        "name": "user_tags",
+        "type": "RECORD",
+        "mode": "REPEATED",
+        "fields": [
+            {"name": "name", "type": "STRING", "mode": "REQUIRED"},
+            {"name": "value", "type": "STRING", "mode": "NULLABLE"},
+        ],
+    },
+    {
+        "name": "system_tags",
+        "type": "RECORD",
+        "mode": "REPEATED",
+        "fields": [
+            {"name": "name", "type": "STRING", "mode": "REQUIRED"},
+            {"name": "value", "type": "STRING", "mode": "NULLABLE"},
+        ],
+    },
+]
+
+
+def merge(*documents: dict) -> dict:
+    """One document of the blocks of `documents`, e.g. resources and their outputs"""
+    merged = {}
+    for document in documents:
+        for key, value in document.items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                value = merge(merged[key], value)
+            merged[key] = value
+    return merged
+
+
+def output(name: str, expression: str) -> dict:
+    return {"output": {name: {"value": ref(expression)}}}
+
+
+def state(bucket: str) -> dict:
+    """Remote state of the project, with the prefix given by the `state_prefix` param"""
+    return {
+        "terraform": {
+            "backend": {"gcs": {"bucket": bucket, "prefix": Param("state_prefix")}},
+            "required_providers": {
+                "aws": {"source": "hashicorp/aws", "version": "~> 3.0"},
+            },
+        },
+    }
+
+
+def aws_provider() -> dict:
+    return {"provider": {"aws": {"region": "us-east-1"}}}
+
+
+def google_provider() -> dict:
+    return {
+        "provider": {
+            "google": {"project": Param("gcp_project_id"), "region": "us-central1"}
+        }
+    }
+
+
+def aws_s3_bucket(force_destroy: bool = False) -> dict:
+    bucket = {"bucket": Param("s3_bucket_name")}
+    if force_destroy:
+        bucket["force_destroy"] = True
+    return merge(
+        {"resource": {"aws_s3_bucket": {"b": bucket}}},
+        output("s3_bucket_name", "aws_s3_bucket.b.bucket"),
+    )
+
+
+def aws_elasticsearch() -> dict:
+    domain = {
+        "domain_name": Param("opensearch_domain_name"),
+        "elasticsearch_version": "7.10",
+        "cluster_config": {
+            "instance_type": "t2.small.elasticsearch",
+            "instance_count": 3,
+        },
+        "ebs_options": {"ebs_enabled": True, "volume_size": 10, "volume_type": "gp2"},
+    }
+    return merge(
+        {"resource": {"aws_elasticsearch_domain": {"example": domain}}},
+        output(
+            "aws_elasticsearch_endpoint", "aws_elasticsearch_domain.example.endpoint"
+        ),
+        output(
+            "opensearch_domain_name", "aws_elasticsearch_domain.example.domain_name"
+        ),
+    )
+
+
+def aws_dynamodb() -> dict:
+    table = {
+        "name": Param("dynamodb_name"),
+        "billing_mode": "PROVISIONED",
+        "read_capacity": 1,
+        "write_capacity": 1,
+        "hash_key": "id",
+        "attribute": {"name": "id", "type": "S"},
+    }
+    return merge(
+        {"resource": {"aws_dynamodb_table": {"basic-dynamodb-table": table}}},
+        output("dynamodb_name", "aws_dynamodb_table.basic-dynamodb-table.name"),
+    )
+
+
+def gcp_bigquery() -> dict:
+    dataset = {
+        "dataset_id": Param("bigquery_dataset"),
+        "friendly_name": "Project Dataset",
+        "description": "This is a test description",
+        "location": "EU",
+        "labels": {"env": "default"},
+    }
+    table = {
+        "dataset_id": ref("google_bigquery_dataset.default.dataset_id"),
+        "table_id": Param("bigquery_table"),
+        "time_partitioning": {"type": "DAY"},
+        "labels": {"env": "default"},
+        "deletion_protection": False,
+        "schema": json.dumps(BIGQUERY_SCHEMA),
+    }
+    return merge(
+        {
+            "resource": {
+                "google_bigquery_dataset": {"default": dataset},
+                "google_bigquery_table": {"default": table},
+            }
+        },
+        output("bigquery_project", "google_bigquery_table.default.project"),
+        output("bigquery_dataset", "google_bigquery_dataset.default.dataset_id"),
+        output("bigquery_table", "google_bigquery_table.default.table_id"),
+    )
+
+
+def gcp_bigtable() -> dict:
+    instance = {
+        "name": Param("bigtable_instance"),
+        "deletion_protection": False,
+        "cluster": {
+            "cluster_id": Param("bigtable_cluster"),
+            "zone": "us-central1-a",
+            "num_nodes": 1,
+            "storage_type": "HDD",
+        },
+        "lifecycle": {"prevent_destroy": False},
+    }
+    table = {
+        "name": Param("bigtable_table"),
+        "instance_name": ref("google_bigtable_instance.instance.name"),
+        "lifecycle": {"prevent_destroy": False},
+        "column_family": {"family": "ColumnFamily"},
+    }
+    return merge(
+        {
+            "resource": {
+                "google_bigtable_instance": {"instance": instance},
+                "google_bigtable_table": {"table": table},
+            }
+        },
+        output("bigtable_project", "google_bigtable_instance.instance.project"),
+        output("bigtable_instance", "google_bigtable_instance.instance.name"),
+        output(
+            "bigtable_cluster",
+            "one(google_bigtable_instance.instance.cluster).cluster_id",
+        ),
+        output("bigtable_table", "google_bigtable_table.table.name"),
+    )
+
+
+def gcp_cloud_storage() -> dict:
+    bucket = {
+        "name": Param("cloud_storage_bucket"),
+        "location": "US",
+        "force_destroy": True,
+    }
+    return merge(
+        {"resource": {"google_storage_bucket": {"data_lake_storage": bucket}}},
+        output("cloud_storage_bucket", "google_storage_bucket.data_lake_storage.name"),
+    )
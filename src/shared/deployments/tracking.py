@@ -0,0 +1,66 @@
+import contextlib
+import datetime
+
+from config import settings
+from shared.models.jobs import DeployJobStage, DeployJobStageRecord
+from shared.terraform.exceptions import TerraformCommandError
+from utils.tracing import start_span
+
+
+def truncate_stderr(stderr: str) -> str:
+    return stderr[-settings.deploy_job_stderr_limit :]
+
+
+class StageTracker:
+    """
+    Times the stages of a deployment and records their exit codes and errors.
+
+    The base class only measures, subclasses persist the records by
+    overriding the hooks.
+    """
+
+    async def start_job(self) -> None:
+        pass
+
+    async def finish_job(self, error: str | None = None) -> None:
+        pass
+
+    async def start_stage(self, record: DeployJobStageRecord) -> None:
+        pass
+
+    async def finish_stage(self, record: DeployJobStageRecord) -> None:
+        pass
+
+    @contextlib.asynccontextmanager
+    async def job(self):
+        await self.start_job()
+        try:
+            yield
+        except Exception as e:
+            await self.finish_job(truncate_stderr(str(e) or type(e).__name__))
+            raise
+        await self.finish_job()
+
+    @contextlib.asynccontextmanager
+    async def stage(self, stage: DeployJobStage):
+        """
+        Track a stage, the yielded record takes the exit code of a successful
+        terraform command. Failed terraform commands record it by themselves.
+        """
+        record = DeployJobStageRecord(
+            stage=stage, started_at=datetime.datetime.utcnow()
+        )
+        await self.start_stage(record)
+        try:
+            with start_span("deploy.stage", stage.value):
+                yield record
+        except TerraformCommandError as e:
+            record.exit_code = e.result.exit_code
+            record.stderr = truncate_stderr("\n".join(e.result.stderr))
+            raise
+        except Exception as e:
+            record.stderr = truncate_stderr(str(e))
+            raise
+        finally:
+            record.finish()
+            await self.finish_stage(record)
@@ -0,0 +1,22 @@
+from enum import Enum
+
+from pydantic import UUID4, BaseModel
+
+
+class DeployBatchOperation(str, Enum):
+    DEPLOY = "DEPLOY"
+    DESTROY = "DESTROY"
+
+
+class DeployBatchItemStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    SKIPPED = "SKIPPED"
+
+
+class DeployBatchItem(BaseModel):
+    project: UUID4
+    status: DeployBatchItemStatus = DeployBatchItemStatus.QUEUED
+    detail: str | None = None
@@ -0,0 +1,21 @@
+from enum import Enum
+
+
+class ProjectDeployStatus(str, Enum):
+    # reserved by the API, the deploy is being applied
+    PENDING = "PENDING"
+    DEPLOYED = "DEPLOYED"
+    # a deployed project's configuration is being applied
+    UPDATING = "UPDATING"
+    # the first apply failed, the project can be deployed or destroyed again
+    FAILED = "FAILED"
+    DESTROYING = "DESTROYING"
+
+
+# the status a deploy gets when the task of its transient status fails, or is
+# lost, see ProjectDeployDB.get_status
+FAILED_DEPLOY_STATUSES = {
+    ProjectDeployStatus.PENDING: ProjectDeployStatus.FAILED,
+    ProjectDeployStatus.UPDATING: ProjectDeployStatus.DEPLOYED,
+    ProjectDeployStatus.DESTROYING: ProjectDeployStatus.FAILED,
+}
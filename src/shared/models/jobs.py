@@ -0,0 +1,52 @@
+import datetime
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class DeployJobOperation(str, Enum):
+    DEPLOY = "DEPLOY"
+    REDEPLOY = "REDEPLOY"
+    PLAN = "PLAN"
+    DESTROY = "DESTROY"
+
+
+class DeployJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+
+class DeployJobStage(str, Enum):
+    QUEUED = "QUEUED"
+    INIT = "INIT"
+    PLAN = "PLAN"
+    APPLY = "APPLY"
+    DESTROY = "DESTROY"
+    OUTPUT_PARSE = "OUTPUT_PARSE"
+    DB_WRITE = "DB_WRITE"
+
+
+class DeployJobStageRecord(BaseModel):
+    stage: DeployJobStage
+    started_at: datetime.datetime
+    finished_at: datetime.datetime | None = None
+    duration: float | None = None
+    exit_code: int | None = None
+    stderr: str | None = None
+
+    def finish(self) -> None:
+        self.finished_at = datetime.datetime.utcnow()
+        self.duration = (self.finished_at - self.started_at).total_seconds()
+
+
+class StageHistogramBucket(BaseModel):
+    # upper bound of the bucket in seconds, None for the overflow bucket
+    le: float | None
+    count: int
+
+
+class StageHistogram(BaseModel):
+    stage: DeployJobStage
+    buckets: list[StageHistogramBucket]
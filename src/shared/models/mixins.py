@@ -1,11 +1,18 @@
 from pydantic import UUID4, BaseModel
 
+from shared.models.batches import (
+    DeployBatchItem,
+    DeployBatchItemStatus,
+    DeployBatchOperation,
+)
 from shared.models.credentials import AWSCredentials, AzureCredentials, GCPCredentials
 from shared.models.deploy_types import (
     AWSProjectDeployType,
     AzureProjectDeployType,
     GCPProjectDeployType,
 )
+from shared.models.jobs import DeployJobOperation, DeployJobStageRecord, DeployJobStatus
+from shared.models.plans import PlanPreview
 from shared.models.providers import ServiceProviderType
 
 
@@ -60,3 +67,57 @@ class ProjectDeployMixin(BaseModel):
 
     def create_update_dict_superuser(self):
         return self.dict(exclude_unset=True, exclude={"id"})
+
+
+class ProjectDeployPlanMixin(PlanPreview):
+    project: UUID4 | None
+    deploy_type: AWSProjectDeployType | GCPProjectDeployType | AzureProjectDeployType
+
+
+class DeployBatchMixin(BaseModel):
+    operation: DeployBatchOperation
+    deploy_type: AWSProjectDeployType | GCPProjectDeployType | AzureProjectDeployType | None
+    items: list[DeployBatchItem] = []
+
+    def get_progress(self) -> dict[DeployBatchItemStatus, int]:
+        progress = {item_status: 0 for item_status in DeployBatchItemStatus}
+        for item in self.items:
+            progress[item.status] += 1
+        return progress
+
+    def create_update_dict(self):
+        return self.dict(
+            exclude_unset=True,
+            exclude={
+                "id",
+                "operation",
+                "deploy_type",
+            },
+        )
+
+    def create_update_dict_superuser(self):
+        return self.dict(exclude_unset=True, exclude={"id"})
+
+
+class DeployJobMixin(BaseModel):
+    project: UUID4
+    operation: DeployJobOperation
+    status: DeployJobStatus = DeployJobStatus.QUEUED
+    stages: list[DeployJobStageRecord] = []
+    error: str | None = None
+    batch: UUID4 | None = None
+    # hash of the configuration a PLAN job plans
+    config_hash: str | None = None
+
+    def create_update_dict(self):
+        return self.dict(
+            exclude_unset=True,
+            exclude={
+                "id",
+                "project",
+                "operation",
+            },
+        )
+
+    def create_update_dict_superuser(self):
+        return self.dict(exclude_unset=True, exclude={"id"})
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class ResourceChange(BaseModel):
+    address: str
+    actions: list[str]
+
+
+class PlanPreview(BaseModel):
+    config_hash: str
+    add: int = 0
+    change: int = 0
+    destroy: int = 0
+    resource_changes: list[ResourceChange] = []
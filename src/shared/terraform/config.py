@@ -0,0 +1,88 @@
+import glob
+import hashlib
+import json
+import os
+import re
+
+CONFIG_FILE_PATTERNS = ("*.tf", "*.tf.json")
+# top level blocks start at the beginning of a line in the rendered templates
+BLOCK_RE = re.compile(r'^(\w+)((?:\s+"[^"]*")*)\s*\{', re.MULTILINE)
+# blocks that only affect the resources they declare
+TARGETABLE_BLOCKS = {"resource", "output"}
+# labels of the blocks of JSON configurations are nested object keys
+JSON_BLOCK_LABELS = {"resource": 2, "data": 2, "output": 1, "provider": 1}
+
+
+def get_file_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_config_file_hashes(config: dict[str, str]) -> dict[str, str]:
+    return {file_name: get_file_hash(content) for file_name, content in config.items()}
+
+
+def get_config_hash(config_file_hashes: dict[str, str]) -> str:
+    """Hash of a rendered configuration, independent of the order of its files"""
+    return hashlib.sha256(
+        "\n".join(
+            f"{file_name}:{config_file_hashes[file_name]}"
+            for file_name in sorted(config_file_hashes)
+        ).encode()
+    ).hexdigest()
+
+
+def get_json_blocks(
+    block_type: str, body: dict, depth: int
+) -> list[tuple[str, list[str]]]:
+    if depth == 0:
+        return [(block_type, [])]
+    return [
+        (block_type, [label, *labels])
+        for label, nested_body in body.items()
+        for _, labels in get_json_blocks(block_type, nested_body, depth - 1)
+    ]
+
+
+def get_blocks(content: str) -> list[tuple[str, list[str]]]:
+    """Top level blocks of a terraform file as (block type, labels)"""
+    if content.lstrip().startswith("{"):
+        # a JSON configuration, native syntax never starts with a brace
+        return [
+            block
+            for block_type, body in json.loads(content).items()
+            for block in get_json_blocks(
+                block_type, body, JSON_BLOCK_LABELS.get(block_type, 0)
+            )
+        ]
+    return [
+        (block_type, re.findall(r'"([^"]*)"', labels))
+        for block_type, labels in BLOCK_RE.findall(content)
+    ]
+
+
+def get_resource_addresses(content: str) -> list[str]:
+    return [
+        ".".join(labels)
+        for block_type, labels in get_blocks(content)
+        if block_type == "resource"
+    ]
+
+
+def is_targetable(content: str) -> bool:
+    """Whether the file can be applied on its own with -target"""
+    blocks = get_blocks(content)
+    return bool(blocks) and all(
+        block_type in TARGETABLE_BLOCKS for block_type, _ in blocks
+    )
+
+
+def write_config(directory_path: str, config: dict[str, str]) -> None:
+    """Write the rendered files and remove configuration files that are not rendered anymore"""
+    os.makedirs(directory_path, exist_ok=True)
+    for pattern in CONFIG_FILE_PATTERNS:
+        for path in glob.glob(os.path.join(directory_path, pattern)):
+            if os.path.basename(path) not in config:
+                os.remove(path)
+    for file_name, content in config.items():
+        with open(os.path.join(directory_path, file_name), "w") as f:
+            f.write(content)
@@ -0,0 +1,19 @@
+class TerraformError(Exception):
+    pass
+
+
+class TerraformCommandError(TerraformError):
+    def __init__(self, result):
+        self.result = result
+        stderr = "\n".join(result.stderr[-10:])
+        super().__init__(
+            f"terraform {result.command} exited with code {result.exit_code}:\n{stderr}"
+        )
+
+
+class TerraformTimeoutError(TerraformError):
+    pass
+
+
+class TerraformOutputError(TerraformError):
+    pass
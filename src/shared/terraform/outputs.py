@@ -0,0 +1,97 @@
+import typing
+
+from pydantic import BaseModel
+
+from shared.terraform.exceptions import TerraformOutputError
+from shared.terraform.runner import TerraformRunner
+
+DeployedResources = typing.TypeVar("DeployedResources", bound=BaseModel)
+
+# Mirrors the structure of a deployed resources model, leaves are the names
+# of terraform outputs, e.g. {"s3": {"bucket_name": "s3_bucket_name"}}
+OutputsMapping = dict[str, typing.Any]
+
+# Values read from the resources in the state, as {terraform output name:
+# (resource address, path of the value in its attributes)}, e.g.
+# {"bucket_name": ("aws_s3_bucket.bucket", ("bucket",))}
+StateValues = dict[str, tuple[str, tuple[str | int, ...]]]
+
+
+def map_outputs(
+    model: typing.Type[DeployedResources],
+    mapping: OutputsMapping,
+    outputs: dict[str, dict],
+) -> DeployedResources:
+    """Build `model` from the result of `terraform output -json`"""
+
+    def resolve(node: OutputsMapping | str):
+        if isinstance(node, dict):
+            return {key: resolve(value) for key, value in node.items()}
+        if node not in outputs:
+            raise TerraformOutputError(f"terraform output '{node}' is missing")
+        return outputs[node]["value"]
+
+    return model.parse_obj(resolve(mapping))
+
+
+async def read_deployed_resources(
+    terraform: TerraformRunner,
+    model: typing.Type[DeployedResources],
+    mapping: OutputsMapping,
+) -> DeployedResources:
+    return map_outputs(model, mapping, await terraform.output())
+
+
+async def recover_deployed_resources(
+    terraform: TerraformRunner,
+    model: typing.Type[DeployedResources],
+    mapping: OutputsMapping,
+) -> DeployedResources | None:
+    """
+    Return the resources of an earlier successful apply recorded in the state,
+    or None if the state does not contain all of the outputs yet.
+    """
+    try:
+        return await read_deployed_resources(terraform, model, mapping)
+    except TerraformOutputError:
+        return None
+
+
+def read_state_values(state: dict, paths: StateValues) -> dict[str, typing.Any]:
+    """Values of `paths` in the result of `terraform show -json` without a plan"""
+    resources = {
+        resource["address"]: resource["values"]
+        for resource in state.get("values", {})
+        .get("root_module", {})
+        .get("resources", [])
+    }
+    values = {}
+    for output_name, (address, path) in paths.items():
+        value = resources.get(address)
+        try:
+            for key in path:
+                value = value[key]
+        except (KeyError, IndexError, TypeError):
+            value = None
+        if value is None:
+            raise TerraformOutputError(
+                f"'{output_name}' isn't in the state of {address}"
+            )
+        values[output_name] = value
+    return values
+
+
+def unmap_outputs(mapping: OutputsMapping, structure: dict) -> dict[str, typing.Any]:
+    """
+    Inverse of `map_outputs`: {terraform output name: value} of a stored
+    deployed resources structure. Values missing in the structure are skipped.
+    """
+    outputs = {}
+    for key, node in mapping.items():
+        if key not in structure:
+            continue
+        if isinstance(node, dict):
+            outputs.update(unmap_outputs(node, structure[key]))
+        else:
+            outputs[node] = structure[key]
+    return outputs
@@ -0,0 +1,114 @@
+"""
+Binary terraform plans by project and configuration, in `terraform_plans_dir`.
+
+A plan is reused by the workers sharing that directory: the workers of a
+host, or of every host if it is a shared volume. Other workers plan again.
+"""
+import asyncio
+import contextlib
+import glob
+import hashlib
+import os
+import time
+
+from config import settings
+from shared.models.plans import PlanPreview, ResourceChange
+from shared.terraform.exceptions import TerraformCommandError
+from shared.terraform.runner import TerraformRunner
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+STALE_PLAN_MESSAGE = "Saved plan is stale"
+
+
+def get_plan_path(project_id, plan_key: str) -> str:
+    return os.path.join(settings.terraform_plans_dir, str(project_id), plan_key)
+
+
+def remove_plans(project_id, keep: str | None = None) -> None:
+    """Remove the plan artifacts of a project, except the ones for `keep` config hash"""
+    plans_dir = os.path.join(settings.terraform_plans_dir, str(project_id))
+    for path in glob.glob(os.path.join(plans_dir, "*")):
+        if keep is None or not os.path.basename(path).startswith(keep):
+            os.remove(path)
+
+
+def prune_plans(max_age: float | None = None) -> list[str]:
+    """Remove the plans older than `max_age` seconds, return their paths"""
+    max_age = settings.terraform_plans_max_age if max_age is None else max_age
+    removed = []
+    for path in glob.glob(os.path.join(settings.terraform_plans_dir, "*", "*")):
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                removed.append(path)
+        except FileNotFoundError:
+            # removed by another worker meanwhile
+            continue
+    for plans_dir in glob.glob(os.path.join(settings.terraform_plans_dir, "*")):
+        if os.path.isdir(plans_dir) and not os.listdir(plans_dir):
+            with contextlib.suppress(OSError):
+                os.rmdir(plans_dir)
+    if removed:
+        LOGGER.info(f"Pruned {len(removed)} terraform plan files")
+    return removed
+
+
+def is_stale_plan_error(error: TerraformCommandError) -> bool:
+    return any(STALE_PLAN_MESSAGE in line for line in error.result.stderr)
+
+
+async def get_or_create_plan(
+    terraform: TerraformRunner,
+    project_id,
+    config_hash: str,
+    targets: list[str] | None = None,
+) -> tuple[str, PlanPreview]:
+    """
+    Return the path of the binary plan for `config_hash` and its preview.
+
+    A plan is created only if there is no artifact for this exact
+    configuration and targets yet, older plans of the project are removed.
+    """
+    plan_key = config_hash
+    if targets:
+        targets_hash = hashlib.sha256("\n".join(sorted(targets)).encode())
+        plan_key = f"{config_hash}-{targets_hash.hexdigest()[:16]}"
+    plan_path = get_plan_path(project_id, plan_key)
+    preview_path = f"{plan_path}.json"
+    if os.path.exists(plan_path) and os.path.exists(preview_path):
+        LOGGER.info(f"Reusing terraform plan {plan_path}")
+        with open(preview_path) as f:
+            return plan_path, PlanPreview.parse_raw(f.read())
+
+    remove_plans(project_id, keep=config_hash)
+    # plans of projects that are never deployed are only removed by age
+    await asyncio.get_running_loop().run_in_executor(None, prune_plans)
+    os.makedirs(os.path.dirname(plan_path), exist_ok=True)
+    # plan into a temporary file so a crashed plan never looks like a cached one
+    await terraform.plan(
+        f"-out={plan_path}.tmp", *(f"-target={target}" for target in targets or [])
+    )
+    os.replace(f"{plan_path}.tmp", plan_path)
+
+    preview = get_plan_preview(config_hash, await terraform.show(plan_path))
+    with open(preview_path, "w") as f:
+        f.write(preview.json())
+    return plan_path, preview
+
+
+def get_plan_preview(config_hash: str, plan: dict) -> PlanPreview:
+    """Summarize `terraform show -json` output without resource attribute values"""
+    preview = PlanPreview(config_hash=config_hash)
+    for resource_change in plan.get("resource_changes", []):
+        actions = resource_change["change"]["actions"]
+        if actions == ["no-op"] or actions == ["read"]:
+            continue
+        preview.add += "create" in actions
+        preview.change += "update" in actions
+        preview.destroy += "delete" in actions
+        preview.resource_changes.append(
+            ResourceChange(address=resource_change["address"], actions=actions)
+        )
+    return preview
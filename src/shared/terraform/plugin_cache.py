@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from config import settings
+from utils.file_lock import async_file_lock, file_lock
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+# Every provider the deployment templates need. The mirror directory is keyed
+# by a digest of this dict, so changing it never mixes old and new providers.
+REQUIRED_PROVIDERS = {
+    "aws": {"source": "hashicorp/aws", "version": "~> 3.0"},
+    "google": {"source": "hashicorp/google"},
+}
+
+LOCK_FILE_NAME = ".terraform.lock.hcl"
+CLI_CONFIG_NAME = "terraformrc"
+READY_MARKER_NAME = ".ready"
+
+CLI_CONFIG = """
+plugin_cache_dir = "{plugin_cache_dir}"
+
+provider_installation {{
+  filesystem_mirror {{
+    path    = "{mirror_dir}"
+    include = [{providers}]
+  }}
+  direct {{
+    exclude = [{providers}]
+  }}
+}}
+"""
+
+
+def providers_digest() -> str:
+    encoded = json.dumps(REQUIRED_PROVIDERS, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def get_plugin_cache_dir() -> str:
+    return os.path.join(settings.terraform_cache_dir, "plugin-cache")
+
+
+def get_mirror_dir() -> str:
+    return os.path.join(settings.terraform_cache_dir, "mirror", providers_digest())
+
+
+def is_mirror_ready() -> bool:
+    return os.path.exists(os.path.join(get_mirror_dir(), READY_MARKER_NAME))
+
+
+def get_init_lock_path() -> str:
+    return os.path.join(settings.terraform_cache_dir, ".lock")
+
+
+def init_lock():
+    """
+    Terraform does not support concurrent writes to a shared plugin cache, so
+    every provider installation on the host must run under this lock.
+    """
+    return file_lock(get_init_lock_path())
+
+
+def async_init_lock():
+    return async_file_lock(get_init_lock_path())
+
+
+def provider_env(env: dict) -> dict:
+    """Point terraform to the shared plugin cache and the local provider mirror"""
+    os.makedirs(get_plugin_cache_dir(), exist_ok=True)
+    env["TF_PLUGIN_CACHE_DIR"] = get_plugin_cache_dir()
+    if is_mirror_ready():
+        env["TF_CLI_CONFIG_FILE"] = os.path.join(get_mirror_dir(), CLI_CONFIG_NAME)
+    return env
+
+
+def seed_lock_file(directory_path: str) -> None:
+    """
+    Copy the dependency lock file produced by the warm-up into a workspace, so
+    init selects the mirrored provider versions without asking the registry.
+    """
+    workspace_lock_file = os.path.join(directory_path, LOCK_FILE_NAME)
+    if not is_mirror_ready() or os.path.exists(workspace_lock_file):
+        return
+    shutil.copyfile(os.path.join(get_mirror_dir(), LOCK_FILE_NAME), workspace_lock_file)
+
+
+def warm_up() -> None:
+    """Download the required providers into the mirror and the plugin cache"""
+    mirror_dir = get_mirror_dir()
+    with init_lock():
+        if is_mirror_ready():
+            LOGGER.info(f"Terraform provider mirror {mirror_dir} is already warm")
+            return
+
+        LOGGER.info(f"Warming up Terraform provider mirror {mirror_dir}")
+        os.makedirs(mirror_dir, exist_ok=True)
+        env = dict(os.environ, TF_PLUGIN_CACHE_DIR=get_plugin_cache_dir())
+        os.makedirs(env["TF_PLUGIN_CACHE_DIR"], exist_ok=True)
+        with tempfile.TemporaryDirectory() as working_dir:
+            with open(os.path.join(working_dir, "providers.tf.json"), "w") as f:
+                json.dump({"terraform": {"required_providers": REQUIRED_PROVIDERS}}, f)
+            for command in (["providers", "mirror", mirror_dir], ["init"]):
+                subprocess.run(
+                    ["terraform", f"-chdir={working_dir}", *command],
+                    env=env,
+                    check=True,
+                )
+            shutil.copyfile(
+                os.path.join(working_dir, LOCK_FILE_NAME),
+                os.path.join(mirror_dir, LOCK_FILE_NAME),
+            )
+
+        providers = ", ".join(
+            f'"registry.terraform.io/{provider["source"]}"'
+            for provider in REQUIRED_PROVIDERS.values()
+        )
+        with open(os.path.join(mirror_dir, CLI_CONFIG_NAME), "w") as f:
+            f.write(
+                CLI_CONFIG.format(
+                    plugin_cache_dir=get_plugin_cache_dir(),
+                    mirror_dir=mirror_dir,
+                    providers=providers,
+                )
+            )
+        open(os.path.join(mirror_dir, READY_MARKER_NAME), "w").close()
+        LOGGER.info("Terraform provider mirror is ready")
+
+
+if __name__ == "__main__":
+    warm_up()
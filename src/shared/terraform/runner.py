@@ -0,0 +1,182 @@
+import asyncio
+import collections
+import json
+import os
+import signal
+import time
+
+from pydantic import BaseModel
+
+from config import settings
+from shared.terraform.exceptions import TerraformCommandError, TerraformTimeoutError
+from shared.terraform.plugin_cache import async_init_lock, provider_env, seed_lock_file
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+# terraform prints whole JSON attributes on a single line, so allow lines
+# longer than the 64 KiB asyncio default
+STREAM_LIMIT = 1024 * 1024
+
+
+class TerraformResult(BaseModel):
+    command: str
+    exit_code: int
+    duration: float
+    stdout: list[str]
+    stderr: list[str]
+
+
+class TerraformRunner:
+    """
+    Runs terraform commands in a working directory without blocking the event loop.
+
+    Output is streamed line by line to the logger and only the last
+    `terraform_output_buffer_lines` lines of every stream are kept in memory.
+    """
+
+    def __init__(
+        self,
+        directory_path: str,
+        env: dict[str, str] | None = None,
+        timeout: float | None = None,
+    ):
+        self.directory_path = directory_path
+        self.env = provider_env(dict(os.environ, **(env or {})))
+        self.timeout = timeout or settings.terraform_command_timeout
+
+    async def init(self) -> TerraformResult:
+        seed_lock_file(self.directory_path)
+        # only the provider installation writes to the shared plugin cache,
+        # the backend is initialized (over the network) without the lock
+        async with async_init_lock():
+            await self.run("init", "-backend=false", "-input=false", "-no-color")
+        return await self.run("init", "-input=false", "-no-color")
+
+    async def plan(self, *args: str) -> TerraformResult:
+        return await self.run("plan", "-input=false", "-no-color", *args)
+
+    async def apply(self, *args: str) -> TerraformResult:
+        return await self.run(
+            "apply", "-input=false", "-no-color", "-auto-approve", *args
+        )
+
+    async def destroy(self, *args: str) -> TerraformResult:
+        return await self.run(
+            "destroy", "-input=false", "-no-color", "-auto-approve", *args
+        )
+
+    async def output(self) -> dict:
+        result = await self.run("output", "-json", buffer_lines=None)
+        return json.loads("\n".join(result.stdout) or "{}")
+
+    async def show(self, plan_path: str | None = None) -> dict:
+        """The plan at `plan_path`, or the state without it"""
+        args = [plan_path] if plan_path else []
+        result = await self.run("show", "-json", *args, buffer_lines=None)
+        return json.loads("\n".join(result.stdout))
+
+    async def run(
+        self,
+        command: str,
+        *args: str,
+        check: bool = True,
+        timeout: float | None = None,
+        buffer_lines: int | None = settings.terraform_output_buffer_lines,
+    ) -> TerraformResult:
+        """
+        Run `terraform <command> <args>`.
+
+        Raises TerraformCommandError on a non-zero exit code when `check` is set
+        and TerraformTimeoutError when the command runs longer than `timeout`.
+        On timeout or cancellation terraform is interrupted so that it can
+        release the state lock before exiting.
+        """
+        timeout = timeout or self.timeout
+        started_at = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            "terraform",
+            f"-chdir={self.directory_path}",
+            command,
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=self.env,
+            limit=STREAM_LIMIT,
+        )
+        stdout = collections.deque(maxlen=buffer_lines)
+        stderr = collections.deque(maxlen=buffer_lines)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    self._read_stream(process.stdout, stdout, command, "stdout"),
+                    self._read_stream(process.stderr, stderr, command, "stderr"),
+                    process.wait(),
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            await self._stop(process)
+            raise TerraformTimeoutError(
+                f"terraform {command} timed out after {timeout} seconds"
+            )
+        except asyncio.CancelledError:
+            await self._stop(process)
+            raise
+
+        result = TerraformResult(
+            command=command,
+            exit_code=process.returncode,
+            duration=time.monotonic() - started_at,
+            stdout=list(stdout),
+            stderr=list(stderr),
+        )
+        LOGGER.info(
+            f"terraform {command} in {self.directory_path} finished with exit code "
+            f"{result.exit_code} in {result.duration:.1f}s"
+        )
+        if check and result.exit_code != 0:
+            raise TerraformCommandError(result)
+        return result
+
+    async def _read_stream(
+        self,
+        stream: asyncio.StreamReader,
+        buffer: collections.deque,
+        command: str,
+        stream_name: str,
+    ) -> None:
+        while True:
+            try:
+                line = await stream.readline()
+            except ValueError:
+                # the line did not fit into STREAM_LIMIT and has been dropped
+                line = b"<line too long>\n"
+            if not line:
+                return
+            line = line.decode(errors="replace").rstrip("\n")
+            buffer.append(line)
+            LOGGER.debug(
+                "terraform %s %s: %s",
+                command,
+                stream_name,
+                line,
+                extra={
+                    "terraform_directory": self.directory_path,
+                    "terraform_command": command,
+                    "terraform_stream": stream_name,
+                },
+            )
+
+    async def _stop(self, process: asyncio.subprocess.Process) -> None:
+        if process.returncode is not None:
+            return
+        process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(
+                process.wait(), settings.terraform_interrupt_grace_period
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
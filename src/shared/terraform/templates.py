@@ -0,0 +1,87 @@
+import json
+import re
+import typing
+
+# parameters are encoded as strings no configuration value contains, and
+# replaced by the JSON of their values when a template is rendered
+PARAM_MARKER = "\x00"
+PARAM_RE = re.compile(r'"\\u0000(\w+)\\u0000"')
+
+
+class Param:
+    """Value of a template given when it is rendered, e.g. a resource name"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+def ref(expression: str) -> str:
+    """Terraform expression in a JSON configuration, e.g. a resource attribute"""
+    return f"${{{expression}}}"
+
+
+def _encode_param(value: typing.Any) -> str:
+    if isinstance(value, Param):
+        return f"{PARAM_MARKER}{value.name}{PARAM_MARKER}"
+    raise TypeError(f"{value!r} can't be used in a template")
+
+
+class ConfigTemplate:
+    """
+    Terraform JSON configuration file (`.tf.json`) with parameters.
+
+    The document is encoded once, with sorted keys, so rendering only joins
+    the encoded parts with the encoded parameter values, and the same values
+    always render the same file.
+    """
+
+    def __init__(self, document: dict):
+        encoded = json.dumps(document, indent=2, sort_keys=True, default=_encode_param)
+        # the text around the parameters, and the parameter names
+        parts = PARAM_RE.split(encoded + "\n")
+        self.chunks: list[str] = parts[::2]
+        self.param_names: list[str] = parts[1::2]
+
+    @property
+    def params(self) -> set[str]:
+        return set(self.param_names)
+
+    def render(self, params: dict[str, typing.Any]) -> str:
+        missing = self.params - params.keys()
+        if missing:
+            raise KeyError(f"Template parameters {sorted(missing)} are missing")
+        content = [self.chunks[0]]
+        for name, chunk in zip(self.param_names, self.chunks[1:]):
+            content.append(json.dumps(params[name]))
+            content.append(chunk)
+        return "".join(content)
+
+
+ConfigTemplates = dict[str, ConfigTemplate]
+
+TEMPLATES: dict[str, ConfigTemplates] = {}
+
+
+def register_templates(deploy_type: str, files: dict[str, dict]) -> ConfigTemplates:
+    """
+    Compile the configuration files of a deploy type, as {file name: document}.
+    Every file name must end with `.tf.json`.
+    """
+    if deploy_type in TEMPLATES:
+        raise ValueError(f"Templates of {deploy_type} are already registered")
+    for file_name in files:
+        if not file_name.endswith(".tf.json"):
+            raise ValueError(f"{file_name} isn't a terraform JSON configuration")
+    TEMPLATES[deploy_type] = {
+        file_name: ConfigTemplate(document) for file_name, document in files.items()
+    }
+    return TEMPLATES[deploy_type]
+
+
+def render_templates(
+    templates: ConfigTemplates, params: dict[str, typing.Any]
+) -> dict[str, str]:
+    """Terraform files as {file name: content}, every file gets every parameter"""
+    return {
+        file_name: template.render(params) for file_name, template in templates.items()
+    }
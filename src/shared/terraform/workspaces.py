@@ -0,0 +1,95 @@
+import asyncio
+import contextlib
+import os
+import shutil
+
+from config import settings
+from utils.file_lock import async_file_lock, file_lock
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+# Workspaces are terraform working directories built from the rendered
+# configuration and the remote backend, so any of them can be removed and
+# built again by `terraform init`. The state lives in the backend only.
+LOCKS_DIR_NAME = ".locks"
+
+
+def get_workspace_path(project_id) -> str:
+    return os.path.join(settings.terraform_workspaces_dir, str(project_id))
+
+
+def get_workspace_lock_path(project_id) -> str:
+    # outside of the workspace, so removing it doesn't remove the lock file
+    return os.path.join(
+        settings.terraform_workspaces_dir, LOCKS_DIR_NAME, f"{project_id}.lock"
+    )
+
+
+@contextlib.asynccontextmanager
+async def use_workspace(project_id):
+    """
+    Mark the workspace of the project as used by this process, it isn't
+    pruned until the block ends. Workspaces are pruned after that.
+    """
+    path = get_workspace_path(project_id)
+    async with async_file_lock(get_workspace_lock_path(project_id), shared=True):
+        try:
+            yield path
+        finally:
+            if os.path.isdir(path):
+                # the last use orders the workspaces for pruning
+                os.utime(path)
+    await asyncio.get_running_loop().run_in_executor(None, prune_workspaces)
+
+
+def remove_workspace(project_id) -> None:
+    shutil.rmtree(get_workspace_path(project_id), ignore_errors=True)
+
+
+def get_directory_size(path: str) -> int:
+    size = 0
+    for directory_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            with contextlib.suppress(FileNotFoundError):
+                # providers are symlinks to the plugin cache, they aren't counted
+                size += os.lstat(os.path.join(directory_path, file_name)).st_size
+    return size
+
+
+def prune_workspaces(disk_budget: int | None = None) -> list[str]:
+    """
+    Remove the least recently used workspaces until the rest fit in
+    `disk_budget` bytes. Workspaces in use are kept. Returns the removed
+    project ids.
+    """
+    if disk_budget is None:
+        disk_budget = settings.terraform_workspaces_disk_budget
+    workspaces_dir = settings.terraform_workspaces_dir
+    if not os.path.isdir(workspaces_dir):
+        return []
+
+    workspaces = []
+    for entry in os.scandir(workspaces_dir):
+        if entry.name == LOCKS_DIR_NAME or not entry.is_dir(follow_symlinks=False):
+            continue
+        workspaces.append(
+            (entry.stat().st_mtime, entry.name, get_directory_size(entry.path))
+        )
+    total_size = sum(size for _, _, size in workspaces)
+
+    removed = []
+    for _, project_id, size in sorted(workspaces):
+        if total_size <= disk_budget:
+            break
+        try:
+            with file_lock(get_workspace_lock_path(project_id), blocking=False):
+                remove_workspace(project_id)
+        except BlockingIOError:
+            continue
+        total_size -= size
+        removed.append(project_id)
+
+    if removed:
+        LOGGER.info(f"Pruned terraform workspaces of projects {removed}")
+    return removed
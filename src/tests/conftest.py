@@ -0,0 +1,41 @@
+from uuid import uuid4
+
+import jwt
+import pytest
+
+from config import settings
+from database.db import DatabaseWrapper
+
+JWT_ALGORITHM = "HS256"
+
+
+@pytest.fixture(autouse=True)
+def database_client():
+    yield
+    # the client is bound to the event loop of the test
+    DatabaseWrapper.close_client()
+
+
+@pytest.fixture
+def user_id():
+    return uuid4()
+
+
+def get_auth_headers(user_id) -> dict:
+    access_token = jwt.encode(
+        {"user_id": str(user_id), "aud": ["fastapi-users:auth"]},
+        settings.jwt_secret,
+        algorithm=JWT_ALGORITHM,
+    )
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+@pytest.fixture
+def auth_headers(user_id):
+    return get_auth_headers(user_id)
+
+
+@pytest.fixture
+def other_auth_headers():
+    """Headers of a user owning nothing"""
+    return get_auth_headers(uuid4())
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+from jose import JWTError, jwt
+
+from api import auth
+from api.auth import AUDIENCE, decode_token, get_key_set, verified_tokens
+from config import settings
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    get_key_set.cache_clear()
+    verified_tokens.clear()
+    yield
+    get_key_set.cache_clear()
+    verified_tokens.clear()
+
+
+def test_decode_token_verifies_once_until_it_expires(monkeypatch):
+    token = jwt.encode(
+        {"user_id": "user", "aud": [AUDIENCE], "exp": int(time.time()) + 10},
+        settings.jwt_secret,
+    )
+    calls = []
+    decode = auth.jwt.decode
+
+    def counted_decode(*args, **kwargs):
+        calls.append(1)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counted_decode)
+
+    assert decode_token(token)["user_id"] == "user"
+    assert decode_token(token)["user_id"] == "user"
+    assert len(calls) == 1
+
+    now = time.monotonic() + 11
+    monkeypatch.setattr("utils.cache.time.monotonic", lambda: now)
+    decode_token(token)
+    assert len(calls) == 2
+
+
+def test_decode_token_with_rotated_keys(monkeypatch):
+    monkeypatch.setattr(
+        settings,
+        "jwt_keys",
+        [{"kty": "oct", "alg": "HS512", "kid": "next", "k": "bmV4dA"}],
+    )
+    claims = {"user_id": "user", "aud": [AUDIENCE]}
+
+    next_token = jwt.encode(claims, "next", "HS512", headers={"kid": "next"})
+    assert decode_token(next_token)["user_id"] == "user"
+    assert decode_token(jwt.encode(claims, settings.jwt_secret))["user_id"] == "user"
+
+    with pytest.raises(JWTError):
+        decode_token(jwt.encode(claims, "next", "HS512", headers={"kid": "other"}))
+    with pytest.raises(JWTError):
+        decode_token(jwt.encode(claims, "other"))
@@ -0,0 +1,121 @@
+import datetime
+
+import pytest
+
+from database.models import (
+    DeployBatchDB,
+    ProjectCredentialsDB,
+    ProjectDB,
+    ProjectDeployDB,
+    get_deploy_batch_database,
+    get_project_database,
+    get_project_deploy_database,
+)
+from shared.deployments.base import DataLakeDeployResult
+from shared.models.batches import (
+    DeployBatchItem,
+    DeployBatchItemStatus,
+    DeployBatchOperation,
+)
+from shared.models.deploys import ProjectDeployStatus
+from worker import loop, tasks
+from worker.batches import dispatch_batch
+from worker.celery import app
+
+
+class Deployment:
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    async def deploy_data_lake(self, project, credentials):
+        return DataLakeDeployResult(project_structure={"s3": {"bucket_name": "b"}})
+
+
+@pytest.fixture
+def worker_loop(monkeypatch):
+    async def ensure_indexes():
+        pass
+
+    monkeypatch.setattr(loop, "ensure_indexes", ensure_indexes)
+    monkeypatch.setattr(loop, "remove_orphaned_credentials_files", lambda: None)
+    yield
+    loop.stop_loop(timeout=1)
+
+
+@pytest.fixture
+def eager(monkeypatch):
+    """Tasks sent to the broker run at once"""
+    monkeypatch.setattr(app.conf, "task_always_eager", True)
+    monkeypatch.setattr(tasks, "DEPLOYMENT_CLASSES", {"AWS_1": Deployment})
+
+
+async def create_batch(owner, count: int) -> tuple[DeployBatchDB, list[ProjectDB]]:
+    """Projects with deploys reserved by a deploy batch"""
+    projects = []
+    for _ in range(count):
+        project = await get_project_database().create(
+            ProjectDB(
+                name="test aws project",
+                service_provider="AWS",
+                owner=owner,
+                created_by=owner,
+                verified=True,
+            )
+        )
+        await get_project_deploy_database().create(
+            ProjectDeployDB(
+                project=project.id,
+                created_by=owner,
+                deploy_type="AWS_1",
+                status=ProjectDeployStatus.PENDING,
+                status_changed_at=datetime.datetime.utcnow(),
+            )
+        )
+        projects.append(project)
+    deploy_batch = await get_deploy_batch_database().create(
+        DeployBatchDB(
+            created_by=owner,
+            operation=DeployBatchOperation.DEPLOY,
+            deploy_type="AWS_1",
+            items=[DeployBatchItem(project=project.id) for project in projects],
+        )
+    )
+    return deploy_batch, projects
+
+
+async def get_statuses(deploy_batch, projects):
+    deploy_batch = await get_deploy_batch_database().get(deploy_batch.id)
+    project_deploys = [
+        await get_project_deploy_database().find_one({"project": project.id})
+        for project in projects
+    ]
+    return [item.status for item in deploy_batch.items], [
+        project_deploy.status for project_deploy in project_deploys
+    ]
+
+
+def test_failed_item_doesnt_stop_its_lane(worker_loop, eager, user_id):
+    deploy_batch, projects = loop.run(create_batch(user_id, 2))
+    signatures = [
+        tasks.deploy_datalake.si(
+            {"user_id": str(user_id)},
+            {"project": str(project.id), "deploy_type": "AWS_1"},
+            project.dict(),
+            ProjectCredentialsDB(
+                project=project.id,
+                created_by=user_id,
+                credentials={"access_key_id": "key", "secret_access_key": "secret"},
+            ).dict(),
+            batch_id=str(deploy_batch.id),
+        )
+        for project in projects
+    ]
+    # the first task fails before the deploy starts
+    signatures[0].args[3]["credentials"] = {}
+
+    dispatch_batch({"AWS": signatures}, concurrency=1)
+
+    assert loop.run(get_statuses(deploy_batch, projects)) == (
+        [DeployBatchItemStatus.FAILED, DeployBatchItemStatus.SUCCEEDED],
+        [ProjectDeployStatus.FAILED, ProjectDeployStatus.DEPLOYED],
+    )
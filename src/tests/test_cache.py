@@ -0,0 +1,19 @@
+from utils.cache import TTLCache
+
+
+def test_ttl_cache_expires_and_invalidates(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr("utils.cache.time.monotonic", lambda: now)
+    cache = TTLCache(ttl=5, maxsize=2)
+
+    cache.set(("user", "a"), 1)
+    cache.set(("user", "b"), 2)
+    cache.set(("user", "c"), 3)
+    assert cache.get(("user", "a")) is None
+    assert cache.get(("user", "b")) == 2
+
+    cache.invalidate(lambda key: key[1] == "b")
+    assert cache.get(("user", "b")) is None
+
+    now += 5
+    assert cache.get(("user", "c")) is None
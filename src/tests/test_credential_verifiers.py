@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+
+import pytest
+
+from api.credential_verifiers.amazon import sign_request
+from api.credential_verifiers.fake import FakeProvider
+from api.credential_verifiers.verifier import (
+    CredentialsVerifier,
+    VerificationUnavailable,
+)
+from shared.models.credentials import AWSCredentials
+from shared.models.providers import ServiceProviderType
+
+VALID = AWSCredentials(access_key_id="valid", secret_access_key="secret")
+INVALID = AWSCredentials(access_key_id="invalid", secret_access_key="secret")
+
+
+def get_verifier(provider: FakeProvider, **kwargs) -> CredentialsVerifier:
+    return CredentialsVerifier(
+        {ServiceProviderType.AWS: (AWSCredentials, provider.check)}, **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_verify_caches_results():
+    provider = FakeProvider(valid=[VALID], delay=0.05)
+    verifier = get_verifier(provider)
+
+    results = await asyncio.gather(
+        *(verifier.verify(ServiceProviderType.AWS, VALID) for _ in range(5))
+    )
+    assert results == [True] * 5
+    assert not await verifier.verify(ServiceProviderType.AWS, INVALID)
+    assert not await verifier.verify(ServiceProviderType.AWS, INVALID)
+    assert provider.checks == 2
+
+    # credentials of another provider are never checked
+    assert not await verifier.verify(ServiceProviderType.GCP, VALID)
+    assert provider.checks == 2
+
+
+@pytest.mark.asyncio
+async def test_verify_unavailable_provider():
+    provider = FakeProvider(valid=[VALID], delay=0.2)
+    verifier = get_verifier(provider, timeout=0.05)
+    with pytest.raises(VerificationUnavailable):
+        await verifier.verify(ServiceProviderType.AWS, VALID)
+
+    provider.available = False
+    verifier = get_verifier(provider)
+    provider.delay = 0
+    with pytest.raises(VerificationUnavailable):
+        await verifier.verify(ServiceProviderType.AWS, VALID)
+
+    provider.available = True
+    assert await verifier.verify(ServiceProviderType.AWS, VALID)
+
+
+def test_aws_signature():
+    # example of the AWS Signature Version 4 documentation
+    credentials = AWSCredentials(
+        access_key_id="AKIDEXAMPLE",
+        secret_access_key="wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY",
+    )
+    headers = sign_request(
+        credentials,
+        "GET",
+        "iam.amazonaws.com",
+        "Action=ListUsers&Version=2010-05-08",
+        "",
+        {"Content-Type": "application/x-www-form-urlencoded; charset=utf-8"},
+        "us-east-1",
+        "iam",
+        datetime.datetime(2015, 8, 30, 12, 36),
+    )
+    assert headers["authorization"].endswith(
+        "Signature=5d672d79c15b13162d9279b0855cfba6789a8edb4c82c400e06b5924a6f2b5d7"
+    )
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import stat
+
+from config import settings
+from utils.credentials import credentials_file, remove_orphaned_credentials_files
+from worker import loop
+
+
+def test_credentials_file_is_private_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "credentials_dir", str(tmp_path))
+
+    with credentials_file('{"key": "value"}', suffix=".json") as path:
+        assert os.path.dirname(path) == str(tmp_path)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        with open(path) as f:
+            assert f.read() == '{"key": "value"}'
+
+    assert not os.path.exists(path)
+
+
+def test_credentials_file_is_removed_on_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "credentials_dir", str(tmp_path))
+
+    try:
+        with credentials_file("{}") as path:
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+
+    assert not os.path.exists(path)
+
+
+def test_remove_orphaned_credentials_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "credentials_dir", str(tmp_path))
+    # pids are below the kernel limit of 2 ** 22, so this one never runs
+    orphaned = tmp_path / f"credentials_{2 ** 22 + 1}_abc.json"
+    orphaned.write_text("{}")
+
+    with credentials_file("{}") as path:
+        assert remove_orphaned_credentials_files() == [str(orphaned)]
+        assert os.path.exists(path)
+
+
+def test_worker_without_child_processes_removes_orphaned_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "credentials_dir", str(tmp_path))
+
+    async def ensure_indexes():
+        pass
+
+    monkeypatch.setattr(loop, "ensure_indexes", ensure_indexes)
+    orphaned = tmp_path / f"credentials_{2 ** 22 + 1}_abc.json"
+    orphaned.write_text("{}")
+
+    # the threads and solo pools never send worker_process_init
+    with credentials_file("{}") as path:
+        try:
+            loop.run(asyncio.sleep(0))
+        finally:
+            loop.stop_loop(timeout=1)
+        assert os.path.exists(path)
+    assert not orphaned.exists()
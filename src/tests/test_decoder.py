@@ -0,0 +1,39 @@
+import uuid
+
+from database.decoder import decode
+from database.models import ProjectCredentialsDB, ProjectDeployDB
+from shared.models.credentials import AWSCredentials
+from shared.models.deploy_types import GCPProjectDeployType
+
+
+def test_decode_matches_validation():
+    user_id = uuid.uuid4()
+    document = {
+        "_id": "object id",
+        "id": uuid.uuid4(),
+        "created_by": user_id,
+        "project": uuid.uuid4(),
+        "credentials": {"access_key_id": "key", "secret_access_key": "secret"},
+    }
+
+    credentials = decode(ProjectCredentialsDB, document)
+
+    assert isinstance(credentials.credentials, AWSCredentials)
+    assert credentials == ProjectCredentialsDB(**document)
+    assert "_id" not in credentials.dict()
+
+
+def test_decode_builds_enums_and_defaults():
+    document = {
+        "id": uuid.uuid4(),
+        "created_by": uuid.uuid4(),
+        "project": uuid.uuid4(),
+        "deploy_type": "GCP_2",
+        "project_structure": {},
+    }
+
+    deploy = decode(ProjectDeployDB, document)
+
+    assert deploy.deploy_type is GCPProjectDeployType.GCP_2
+    assert deploy.config_hash is None
+    assert deploy == ProjectDeployDB(**document)
@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+from uuid import uuid4
+
+import pytest
+
+from api.models import ProjectDeployCreate
+from config import settings
+from database.db import DatabaseWrapper
+from database.indexes import ensure_indexes
+from database.manager import ProjectDeployManager
+from database.models import ProjectDeployDB, get_project_deploy_database
+from shared.models.deploys import ProjectDeployStatus
+
+
+def get_manager() -> ProjectDeployManager:
+    return ProjectDeployManager(get_project_deploy_database())
+
+
+async def create_deploy(
+    project_id,
+    deploy_status: ProjectDeployStatus | None,
+    status_changed_at: datetime.datetime | None,
+) -> None:
+    """Write a deploy as older versions did, without the fields that are None"""
+    project_deploy = ProjectDeployDB(
+        project=project_id, created_by=project_id, deploy_type="AWS_1"
+    ).dict(exclude={"status", "status_changed_at"})
+    if deploy_status is not None:
+        project_deploy["status"] = deploy_status
+    if status_changed_at is not None:
+        project_deploy["status_changed_at"] = status_changed_at
+    await get_project_deploy_database().collection.insert_one(project_deploy)
+
+
+@pytest.mark.asyncio
+async def test_reserve(event_loop, user_id):
+    DatabaseWrapper.set_event_loop(event_loop)
+    await ensure_indexes()
+    project_id = uuid4()
+    project_deploy = ProjectDeployCreate(project=project_id, deploy_type="AWS_1")
+
+    reserved = await get_manager().reserve(project_deploy, user_id)
+    assert reserved.status == ProjectDeployStatus.PENDING
+    assert reserved.status_changed_at is not None
+    # the deploy is pending until its task finishes
+    assert await get_manager().reserve(project_deploy, user_id) is None
+
+    await get_manager().transition(
+        project_id, [ProjectDeployStatus.PENDING], ProjectDeployStatus.FAILED
+    )
+    project_deploy.deploy_type = "AWS_2"
+    reserved = await get_manager().reserve(project_deploy, user_id)
+    assert reserved.status == ProjectDeployStatus.PENDING
+    assert reserved.deploy_type == "AWS_2"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("deploy_status", [None, ProjectDeployStatus.FAILED])
+async def test_only_one_of_concurrent_reservations_wins(
+    event_loop, user_id, deploy_status
+):
+    DatabaseWrapper.set_event_loop(event_loop)
+    await ensure_indexes()
+    project_id = uuid4()
+    if deploy_status is not None:
+        await create_deploy(project_id, deploy_status, datetime.datetime.utcnow())
+    project_deploy = ProjectDeployCreate(project=project_id, deploy_type="AWS_1")
+
+    reserved = await asyncio.gather(
+        *(get_manager().reserve(project_deploy, user_id) for _ in range(5))
+    )
+
+    assert len([db_object for db_object in reserved if db_object]) == 1
+    project_deploy = await get_manager().get_by_project(project_id)
+    assert project_deploy.status == ProjectDeployStatus.PENDING
+
+
+@pytest.mark.asyncio
+async def test_transition_of_a_deploy_without_status(event_loop, user_id):
+    DatabaseWrapper.set_event_loop(event_loop)
+    project_id = uuid4()
+    await create_deploy(project_id, None, None)
+
+    assert not await get_manager().transition(
+        project_id, [ProjectDeployStatus.FAILED], ProjectDeployStatus.PENDING
+    )
+    # deploys written before the statuses were added are deployed
+    updating = await get_manager().transition(
+        project_id, [ProjectDeployStatus.DEPLOYED], ProjectDeployStatus.UPDATING
+    )
+    assert updating.status == ProjectDeployStatus.UPDATING
+    assert updating.status_changed_at is not None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "age, reclaimed",
+    [(60, False), (settings.deploy_status_timeout + 60, True), (None, True)],
+)
+async def test_abandoned_deploy_is_reserved_again(event_loop, user_id, age, reclaimed):
+    DatabaseWrapper.set_event_loop(event_loop)
+    await ensure_indexes()
+    project_id = uuid4()
+    status_changed_at = (
+        datetime.datetime.utcnow() - datetime.timedelta(seconds=age)
+        if age is not None
+        else None
+    )
+    # its worker crashed, or it was never enqueued
+    await create_deploy(project_id, ProjectDeployStatus.PENDING, status_changed_at)
+
+    project_deploy = await get_manager().get_by_project(project_id)
+    assert project_deploy.get_status() == (
+        ProjectDeployStatus.FAILED if reclaimed else ProjectDeployStatus.PENDING
+    )
+    reserved = await get_manager().reserve(
+        ProjectDeployCreate(project=project_id, deploy_type="AWS_1"), user_id
+    )
+    assert bool(reserved) == reclaimed
+    if reclaimed:
+        assert reserved.get_status() == ProjectDeployStatus.PENDING
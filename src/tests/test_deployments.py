@@ -0,0 +1,51 @@
+import importlib.metadata
+import subprocess
+import sys
+
+import pytest
+
+from shared.deployments import ENTRY_POINT_GROUP, DeploymentRegistry
+from shared.deployments.aws_deployments.aws_1 import AWSDataLakeDeployment1
+from shared.models.deploy_types import AWSProjectDeployType
+
+
+def test_worker_doesnt_import_the_web_framework():
+    imported = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, worker.tasks; print(' '.join(sys.modules))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+
+    assert "fastapi" not in imported
+    assert "shared.deployments.aws_deployments.aws_1" not in imported
+
+
+def test_registry_resolves_builtin_and_entry_point_deployments(monkeypatch):
+    entry_point = importlib.metadata.EntryPoint(
+        name="PLUGIN_1",
+        value="shared.deployments.aws_deployments.aws_1:AWSDataLakeDeployment1",
+        group=ENTRY_POINT_GROUP,
+    )
+    monkeypatch.setattr(
+        importlib.metadata,
+        "entry_points",
+        lambda group: [entry_point] if group == ENTRY_POINT_GROUP else [],
+    )
+    registry = DeploymentRegistry(
+        {
+            AWSProjectDeployType.AWS_1: (
+                "shared.deployments.aws_deployments.aws_1:AWSDataLakeDeployment1"
+            )
+        }
+    )
+
+    assert registry[AWSProjectDeployType.AWS_1] is AWSDataLakeDeployment1
+    assert registry["PLUGIN_1"] is AWSDataLakeDeployment1
+    assert list(registry) == ["AWS_1", "PLUGIN_1"]
+    with pytest.raises(KeyError):
+        registry["UNKNOWN"]
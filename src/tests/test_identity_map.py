@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from database.identity_map import IdentityMap, get_identity_map
+
+
+class Loader:
+    def __init__(self):
+        self.loads = 0
+
+    async def __call__(self):
+        self.loads += 1
+        await asyncio.sleep(0)
+        return self.loads
+
+
+@pytest.mark.asyncio
+async def test_lookups_of_a_key_share_one_load():
+    identity_map = IdentityMap()
+    loader = Loader()
+
+    started = identity_map.load(("ProjectDB", "id", 1), loader)
+    assert await identity_map.load(("ProjectDB", "id", 1), loader) == 1
+    assert await started == 1
+    assert await identity_map.load(("ProjectDB", "id", 2), loader) == 2
+    assert loader.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_the_lookups_of_the_model():
+    identity_map = IdentityMap()
+    projects = Loader()
+    deploys = Loader()
+    await identity_map.load(("ProjectDB", "id", 1), projects)
+    await identity_map.load(("ProjectDeployDB", "project", 1), deploys)
+
+    identity_map.invalidate("ProjectDB")
+
+    assert await identity_map.load(("ProjectDB", "id", 1), projects) == 2
+    assert await identity_map.load(("ProjectDeployDB", "project", 1), deploys) == 1
+
+
+@pytest.mark.asyncio
+async def test_every_request_has_its_own_identity_map():
+    loader = Loader()
+    first_request = get_identity_map()
+    first_map = await first_request.__anext__()
+    await first_map.load(("ProjectDB", "id", 1), loader)
+    prefetched = first_map.load(("ProjectDB", "id", 2), loader)
+    with pytest.raises(StopAsyncIteration):
+        await first_request.__anext__()
+    # lookups nobody awaited end with the request
+    await asyncio.gather(prefetched, return_exceptions=True)
+    assert prefetched.cancelled()
+
+    second_request = get_identity_map()
+    second_map = await second_request.__anext__()
+    assert second_map is not first_map
+    assert await second_map.load(("ProjectDB", "id", 1), loader) == 2
@@ -0,0 +1,28 @@
+import pytest
+
+from database.db import DatabaseWrapper
+from database.indexes import ensure_indexes, get_index_drift
+from worker import loop
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_the_declared_indexes(event_loop):
+    DatabaseWrapper.set_event_loop(event_loop)
+    await ensure_indexes()
+    # existing indexes are kept
+    await ensure_indexes()
+
+    assert await get_index_drift() == {}
+    project_deploy_indexes = (
+        await DatabaseWrapper.get_project_deploy_collection().index_information()
+    )
+    # reservations of project deploys rely on it
+    assert project_deploy_indexes["project_1"]["unique"]
+
+
+def test_worker_without_child_processes_creates_the_indexes():
+    # the threads and solo pools never send worker_process_init
+    try:
+        assert loop.run(get_index_drift()) == {}
+    finally:
+        loop.stop_loop(timeout=1)
@@ -0,0 +1,112 @@
+import asyncio
+import uuid
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from config import settings
+from database.locks import LocalLockService, LockLost, MongoLockService
+from shared.deployments.base import TerraformDataLakeDeployment, with_project_lock
+
+
+class SleepingDeployment(TerraformDataLakeDeployment):
+    name = "sleeping"
+
+    def __init__(self, lock_service):
+        super().__init__(lock_service=lock_service)
+        self.running = 0
+        self.max_running = 0
+
+    @with_project_lock
+    async def deploy_data_lake(self, project, credentials):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+
+
+class Project:
+    def __init__(self):
+        self.id = uuid.uuid4()
+
+
+@pytest.mark.asyncio
+async def test_operations_of_a_project_wait_for_each_other():
+    deployment = SleepingDeployment(LocalLockService())
+    project = Project()
+
+    await asyncio.gather(
+        *[deployment.deploy_data_lake(project, None) for _ in range(3)]
+    )
+
+    assert deployment.max_running == 1
+
+
+@pytest.mark.asyncio
+async def test_operations_of_different_projects_run_in_parallel():
+    deployment = SleepingDeployment(LocalLockService())
+
+    await asyncio.gather(
+        *[deployment.deploy_data_lake(Project(), None) for _ in range(3)]
+    )
+
+    assert deployment.max_running == 3
+
+
+class LosingLockService(MongoLockService):
+    """Leases acquired in memory that can't be renewed"""
+
+    def __init__(self):
+        super().__init__(ttl=0.03, wait_timeout=1, poll_interval=0.01)
+        self.released = []
+
+    async def try_acquire(self, name, owner):
+        return True
+
+    async def renew(self, name, owner):
+        return False
+
+    async def release(self, name, owner):
+        self.released.append(name)
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_cancels_the_block():
+    lock_service = LosingLockService()
+
+    with pytest.raises(LockLost):
+        async with lock_service.lock("project:1"):
+            await asyncio.sleep(1)
+
+    assert lock_service.released == ["project:1"]
+
+
+class UnreleasableLockService(MongoLockService):
+    """Leases acquired in memory whose release fails"""
+
+    async def try_acquire(self, name, owner):
+        return True
+
+    async def renew(self, name, owner):
+        return True
+
+    async def release(self, name, owner):
+        raise AutoReconnect("connection closed")
+
+
+@pytest.mark.asyncio
+async def test_failed_release_doesnt_hide_the_error_of_the_block():
+    with pytest.raises(ValueError):
+        async with UnreleasableLockService().lock("project:1"):
+            raise ValueError()
+
+
+def test_lock_settings_are_read_when_the_service_is_created(monkeypatch):
+    monkeypatch.setattr(settings, "lock_ttl", 1)
+    monkeypatch.setattr(settings, "lock_poll_interval", 0.5)
+
+    lock_service = MongoLockService(wait_timeout=2)
+
+    assert lock_service.ttl == 1
+    assert lock_service.wait_timeout == 2
+    assert lock_service.poll_interval == 0.5
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from config import settings
+from shared.terraform.plans import get_or_create_plan, get_plan_path, prune_plans
+
+PLAN = {
+    "resource_changes": [
+        {"address": "aws_s3_bucket.b", "change": {"actions": ["create"]}},
+        {"address": "aws_dynamodb_table.t", "change": {"actions": ["no-op"]}},
+    ]
+}
+
+
+class FakeTerraform:
+    def __init__(self):
+        self.plans = []
+
+    async def plan(self, *args):
+        out = next(arg[len("-out=") :] for arg in args if arg.startswith("-out="))
+        open(out, "w").close()
+        self.plans.append(args)
+
+    async def show(self, plan_path):
+        return PLAN
+
+
+@pytest.fixture(autouse=True)
+def plans_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "terraform_plans_dir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_plan_is_created_once_per_config_and_targets():
+    terraform = FakeTerraform()
+
+    plan_path, preview = await get_or_create_plan(terraform, "project", "hash")
+    assert preview.add == 1 and preview.change == 0 and preview.destroy == 0
+    assert [change.address for change in preview.resource_changes] == [
+        "aws_s3_bucket.b"
+    ]
+    assert await get_or_create_plan(terraform, "project", "hash") == (
+        plan_path,
+        preview,
+    )
+    assert len(terraform.plans) == 1
+
+    targeted_path, _ = await get_or_create_plan(
+        terraform, "project", "hash", ["aws_s3_bucket.b"]
+    )
+    assert targeted_path != plan_path
+    assert "-target=aws_s3_bucket.b" in terraform.plans[1]
+
+    # plans of another configuration replace the project's old ones
+    await get_or_create_plan(terraform, "project", "other")
+    assert not os.path.exists(plan_path)
+
+
+@pytest.mark.asyncio
+async def test_old_plans_are_pruned(plans_dir):
+    terraform = FakeTerraform()
+    old_path, _ = await get_or_create_plan(terraform, "old-project", "hash")
+    long_ago = time.time() - settings.terraform_plans_max_age - 1
+    for path in (old_path, f"{old_path}.json"):
+        os.utime(path, (long_ago, long_ago))
+    new_path, _ = await get_or_create_plan(terraform, "new-project", "hash")
+
+    assert prune_plans() == []
+    assert not os.path.exists(plans_dir / "old-project")
+    assert os.path.exists(new_path)
+    assert get_plan_path("new-project", "hash") == new_path
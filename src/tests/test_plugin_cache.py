@@ -0,0 +1,103 @@
+import asyncio
+import os
+import stat
+
+import pytest
+
+from config import settings
+from shared.terraform import plugin_cache
+from shared.terraform.runner import TerraformRunner
+from utils.file_lock import async_file_lock, file_lock
+
+# records its arguments, and writes a lock file like `terraform init` does
+FAKE_TERRAFORM = """#!/bin/sh
+echo "$@" >> "$TERRAFORM_CALLS"
+touch "${1#-chdir=}/.terraform.lock.hcl"
+"""
+
+
+@pytest.fixture
+def calls_path(tmp_path, monkeypatch):
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    executable = bin_path / "terraform"
+    executable.write_text(FAKE_TERRAFORM)
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("TERRAFORM_CALLS", str(tmp_path / "calls"))
+    monkeypatch.setattr(settings, "terraform_cache_dir", str(tmp_path / "cache"))
+    return tmp_path / "calls"
+
+
+def test_warm_up_writes_mirror_config(calls_path):
+    assert "TF_CLI_CONFIG_FILE" not in plugin_cache.provider_env({})
+
+    plugin_cache.warm_up()
+
+    mirror_dir = plugin_cache.get_mirror_dir()
+    env = plugin_cache.provider_env({})
+    assert env["TF_PLUGIN_CACHE_DIR"] == plugin_cache.get_plugin_cache_dir()
+    assert env["TF_CLI_CONFIG_FILE"] == os.path.join(mirror_dir, "terraformrc")
+    with open(env["TF_CLI_CONFIG_FILE"]) as f:
+        cli_config = f.read()
+    assert f'path    = "{mirror_dir}"' in cli_config
+    assert '"registry.terraform.io/hashicorp/google"' in cli_config
+
+    # warm mirrors aren't downloaded again
+    plugin_cache.warm_up()
+    assert len(calls_path.read_text().splitlines()) == 2
+
+
+def test_seed_lock_file(calls_path, tmp_path):
+    plugin_cache.warm_up()
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+
+    plugin_cache.seed_lock_file(str(workspace))
+
+    assert (workspace / ".terraform.lock.hcl").exists()
+
+
+@pytest.mark.asyncio
+async def test_init_locks_only_the_provider_installation(calls_path, tmp_path):
+    await TerraformRunner(str(tmp_path)).init()
+
+    providers_init, backend_init = calls_path.read_text().splitlines()
+    assert "-backend=false" in providers_init
+    assert "-backend=false" not in backend_init
+
+
+@pytest.mark.asyncio
+async def test_async_file_lock_waits_for_the_lock(tmp_path):
+    path = str(tmp_path / "lock")
+    acquired = asyncio.Event()
+
+    async def wait_for_lock():
+        async with async_file_lock(path, poll_interval=0.01):
+            acquired.set()
+
+    with file_lock(path):
+        waiter = asyncio.create_task(wait_for_lock())
+        await asyncio.sleep(0.05)
+        assert not acquired.is_set()
+    await asyncio.wait_for(waiter, 1)
+    assert acquired.is_set()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_async_file_lock_waiter_never_takes_the_lock(tmp_path):
+    path = str(tmp_path / "lock")
+
+    async def wait_for_lock():
+        async with async_file_lock(path, poll_interval=0.01):
+            pass
+
+    with file_lock(path):
+        waiter = asyncio.create_task(wait_for_lock())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    with file_lock(path, blocking=False):
+        pass
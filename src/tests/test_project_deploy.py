@@ -0,0 +1,380 @@
+import collections
+import datetime
+from uuid import UUID, uuid4
+
+import httpx
+import pytest
+
+from api.app import get_application
+from api.router import project_deploy
+from database.indexes import ensure_indexes
+from database.manager import DeployJobManager, ProjectDeployManager
+from database.models import (
+    ProjectCredentialsDB,
+    ProjectDB,
+    ProjectDeployDB,
+    get_deploy_job_database,
+    get_project_credentials_database,
+    get_project_database,
+    get_project_deploy_database,
+)
+from shared.models.deploys import ProjectDeployStatus
+from shared.models.jobs import DeployJobStatus
+from worker.tasks import deploy_datalake, destroy_datalake, plan_datalake
+
+
+async def create_project(
+    owner,
+    deploy_status: ProjectDeployStatus | None = None,
+    verified: bool = True,
+    credentials: bool = True,
+):
+    project = await get_project_database().create(
+        ProjectDB(
+            name="test aws project",
+            service_provider="AWS",
+            owner=owner,
+            created_by=owner,
+            verified=verified,
+        )
+    )
+    if credentials:
+        await get_project_credentials_database().create(
+            ProjectCredentialsDB(
+                project=project.id,
+                created_by=owner,
+                credentials={"access_key_id": "key", "secret_access_key": "secret"},
+            )
+        )
+    if deploy_status:
+        await get_project_deploy_database().create(
+            ProjectDeployDB(
+                project=project.id,
+                created_by=owner,
+                deploy_type="AWS_1",
+                status=deploy_status,
+                status_changed_at=datetime.datetime.utcnow(),
+            )
+        )
+    return project
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    """Arguments of the tasks the API enqueued, by task name"""
+    enqueued = collections.defaultdict(list)
+
+    def get_delay(task):
+        return lambda *args, **kwargs: enqueued[task.name].append(args)
+
+    for task in (deploy_datalake, plan_datalake):
+        monkeypatch.setattr(task, "delay", get_delay(task))
+    return enqueued
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Task signatures of the batches the API dispatched"""
+    dispatched = []
+    monkeypatch.setattr(project_deploy, "dispatch_batch", dispatched.append)
+    return dispatched
+
+
+@pytest.fixture
+def deploy_lookups(monkeypatch):
+    """Projects whose deploy was looked up"""
+    lookups = []
+    get_by_project = ProjectDeployManager.get_by_project
+
+    def record_lookup(self, project_id):
+        lookups.append(project_id)
+        return get_by_project(self, project_id)
+
+    monkeypatch.setattr(ProjectDeployManager, "get_by_project", record_lookup)
+    return lookups
+
+
+async def get_deploy_status(project_id) -> ProjectDeployStatus | None:
+    project_deploy = await get_project_deploy_database().find_one(
+        {"project": project_id}
+    )
+    return project_deploy.status if project_deploy else None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "deploy_status, status_code",
+    [
+        (None, 202),
+        (ProjectDeployStatus.FAILED, 202),
+        (ProjectDeployStatus.PENDING, 400),
+    ],
+)
+async def test_plan_project_deploy(
+    event_loop, user_id, auth_headers, enqueued, deploy_status, status_code
+):
+    app = get_application(event_loop)
+    project = await create_project(user_id, deploy_status)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.post(
+            f"/v1/project_deploy/{project.id}/plan",
+            json={"deploy_type": "AWS_1"},
+            headers=auth_headers,
+        )
+    assert response.status_code == status_code, response.content
+    if status_code == 202:
+        # a failed deploy is planned like a new one
+        (args,) = enqueued[plan_datalake.name]
+        assert args[-1] is None
+
+
+@pytest.mark.asyncio
+async def test_plan_is_enqueued_once(event_loop, user_id, auth_headers, enqueued):
+    app = get_application(event_loop)
+    project = await create_project(user_id)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+
+        async def request_plan() -> dict:
+            response = await async_client.post(
+                f"/v1/project_deploy/{project.id}/plan",
+                json={"deploy_type": "AWS_1"},
+                headers=auth_headers,
+            )
+            assert response.status_code == 202, response.content
+            return response.json()
+
+        polls = [await request_plan() for _ in range(3)]
+        assert len({poll["job_id"] for poll in polls}) == 1
+        assert len(enqueued[plan_datalake.name]) == 1
+
+        # a failed plan is enqueued again
+        await DeployJobManager(get_deploy_job_database()).finish(
+            UUID(polls[0]["job_id"]), DeployJobStatus.FAILED
+        )
+        assert (await request_plan())["job_id"] != polls[0]["job_id"]
+        assert len(enqueued[plan_datalake.name]) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_project_deploy_ignores_worker_fields(
+    event_loop, user_id, auth_headers, enqueued
+):
+    app = get_application(event_loop)
+    await ensure_indexes()
+    project = await create_project(user_id)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.post(
+            f"/v1/project_deploy/{project.id}",
+            json={
+                "deploy_type": "AWS_1",
+                "config_hash": "forged",
+                "config_file_hashes": {"a": "b"},
+            },
+            headers=auth_headers,
+        )
+    assert response.status_code == 201, response.content
+    project_deploy = await get_project_deploy_database().find_one(
+        {"project": project.id}
+    )
+    assert project_deploy.status == ProjectDeployStatus.PENDING
+    assert project_deploy.config_hash is None
+    assert project_deploy.config_file_hashes is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "method, task, deploy_status",
+    [
+        ("POST", deploy_datalake, None),
+        ("DELETE", destroy_datalake, ProjectDeployStatus.DEPLOYED),
+    ],
+)
+async def test_deploy_that_cant_be_enqueued_fails(
+    event_loop, user_id, auth_headers, monkeypatch, method, task, deploy_status
+):
+    def delay(*args, **kwargs):
+        raise ConnectionError("broker unreachable")
+
+    monkeypatch.setattr(task, "delay", delay)
+    app = get_application(event_loop)
+    project = await create_project(user_id, deploy_status)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        with pytest.raises(ConnectionError):
+            await async_client.request(
+                method,
+                f"/v1/project_deploy/{project.id}",
+                json={"deploy_type": "AWS_1"},
+                headers=auth_headers,
+            )
+    # it can be deployed or destroyed again
+    assert await get_deploy_status(project.id) == ProjectDeployStatus.FAILED
+
+
+@pytest.mark.asyncio
+async def test_bulk_deploy(event_loop, user_id, auth_headers, dispatched):
+    app = get_application(event_loop)
+    # the client doesn't run the startup handlers
+    await ensure_indexes()
+    new = await create_project(user_id)
+    failed = await create_project(user_id, ProjectDeployStatus.FAILED)
+    deployed = await create_project(user_id, ProjectDeployStatus.DEPLOYED)
+    unverified = await create_project(user_id, verified=False)
+    without_credentials = await create_project(user_id, credentials=False)
+    other_users = await create_project(uuid4())
+    project_ids = [
+        new.id,
+        failed.id,
+        deployed.id,
+        unverified.id,
+        without_credentials.id,
+        other_users.id,
+        new.id,
+    ]
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.post(
+            "/v1/project_deploy/bulk",
+            json={
+                "project_ids": [str(project_id) for project_id in project_ids],
+                "deploy_type": "AWS_1",
+            },
+            headers=auth_headers,
+        )
+        assert response.status_code == 202, response.content
+        deploy_batch = response.json()
+        assert [item["detail"] for item in deploy_batch["items"]] == [
+            None,
+            None,
+            "project already deployed",
+            "project doesn't have valid credentials",
+            "project doesn't have credentials",
+            "project not found",
+        ]
+        assert deploy_batch["progress"]["QUEUED"] == 2
+        assert deploy_batch["progress"]["SKIPPED"] == 4
+        assert len(dispatched[0]["AWS"]) == 2
+        assert await get_deploy_status(new.id) == ProjectDeployStatus.PENDING
+        assert await get_deploy_status(failed.id) == ProjectDeployStatus.PENDING
+
+        # reserved projects are skipped by the next batch
+        response = await async_client.post(
+            "/v1/project_deploy/bulk",
+            json={"project_ids": [str(new.id)], "deploy_type": "AWS_1"},
+            headers=auth_headers,
+        )
+        assert response.json()["progress"]["SKIPPED"] == 1
+
+        response = await async_client.get(
+            f"/v1/project_deploy/bulk/{deploy_batch['id']}", headers=auth_headers
+        )
+        assert response.status_code == 200, response.content
+        assert response.json()["progress"] == deploy_batch["progress"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_destroy(event_loop, user_id, auth_headers, dispatched):
+    app = get_application(event_loop)
+    deployed = await create_project(user_id, ProjectDeployStatus.DEPLOYED)
+    failed = await create_project(user_id, ProjectDeployStatus.FAILED)
+    pending = await create_project(user_id, ProjectDeployStatus.PENDING)
+    not_deployed = await create_project(user_id)
+    project_ids = [deployed.id, failed.id, pending.id, not_deployed.id]
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.post(
+            "/v1/project_deploy/bulk/destroy",
+            json={"project_ids": [str(project_id) for project_id in project_ids]},
+            headers=auth_headers,
+        )
+    assert response.status_code == 202, response.content
+    assert response.json()["progress"]["QUEUED"] == 2
+    assert response.json()["progress"]["SKIPPED"] == 2
+    assert len(dispatched[0]["AWS"]) == 2
+    assert await get_deploy_status(deployed.id) == ProjectDeployStatus.DESTROYING
+    assert await get_deploy_status(failed.id) == ProjectDeployStatus.DESTROYING
+    assert await get_deploy_status(pending.id) == ProjectDeployStatus.PENDING
+
+
+@pytest.mark.asyncio
+async def test_bulk_deploy_that_cant_be_dispatched_fails(
+    event_loop, user_id, auth_headers, monkeypatch
+):
+    def dispatch_batch(signatures):
+        raise ConnectionError("broker unreachable")
+
+    monkeypatch.setattr(project_deploy, "dispatch_batch", dispatch_batch)
+    app = get_application(event_loop)
+    project = await create_project(user_id)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        with pytest.raises(ConnectionError):
+            await async_client.post(
+                "/v1/project_deploy/bulk",
+                json={"project_ids": [str(project.id)], "deploy_type": "AWS_1"},
+                headers=auth_headers,
+            )
+    assert await get_deploy_status(project.id) == ProjectDeployStatus.FAILED
+
+
+@pytest.mark.asyncio
+async def test_get_bulk_of_another_user(
+    event_loop, user_id, auth_headers, other_auth_headers, dispatched
+):
+    app = get_application(event_loop)
+    project = await create_project(user_id)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.post(
+            "/v1/project_deploy/bulk",
+            json={"project_ids": [str(project.id)], "deploy_type": "AWS_1"},
+            headers=auth_headers,
+        )
+        batch_id = response.json()["id"]
+        response = await async_client.get(
+            f"/v1/project_deploy/bulk/{batch_id}", headers=other_auth_headers
+        )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "method, path",
+    [("POST", "/v1/project_deploy/{}/plan"), ("DELETE", "/v1/project_deploy/{}")],
+)
+async def test_project_objects_are_prefetched_for_the_owner_only(
+    event_loop, user_id, other_auth_headers, deploy_lookups, method, path
+):
+    app = get_application(event_loop)
+    project = await create_project(user_id, ProjectDeployStatus.DEPLOYED)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.request(
+            method, path.format(project.id), json={"deploy_type": "AWS_1"}
+        )
+        assert response.status_code == 403
+        response = await async_client.request(
+            method,
+            path.format(project.id),
+            json={"deploy_type": "AWS_1"},
+            headers=other_auth_headers,
+        )
+        assert response.status_code == 404
+    assert deploy_lookups == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "method, path",
+    [("POST", "/v1/project_deploy/{}/plan"), ("PUT", "/v1/project_deploy/{}")],
+)
+async def test_project_without_credentials(
+    event_loop, user_id, auth_headers, method, path
+):
+    app = get_application(event_loop)
+    project = await create_project(
+        user_id, ProjectDeployStatus.DEPLOYED, credentials=False
+    )
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.request(
+            method,
+            path.format(project.id),
+            json={"deploy_type": "AWS_1"},
+            headers=auth_headers,
+        )
+    assert response.status_code == 400
+    assert response.json() == {"detail": "project doesn't have credentials"}
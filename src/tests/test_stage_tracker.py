@@ -0,0 +1,45 @@
+import pytest
+
+from shared.deployments.tracking import StageTracker
+from shared.models.jobs import DeployJobStage
+from shared.terraform.exceptions import TerraformCommandError
+from shared.terraform.runner import TerraformResult
+
+
+class RecordingTracker(StageTracker):
+    def __init__(self):
+        self.records = []
+        self.error = None
+
+    async def finish_stage(self, record):
+        self.records.append(record)
+
+    async def finish_job(self, error=None):
+        self.error = error
+
+
+@pytest.mark.asyncio
+async def test_stage_records_terraform_failure():
+    tracker = RecordingTracker()
+    failed_apply = TerraformResult(
+        command="apply",
+        exit_code=1,
+        duration=0.1,
+        stdout=[],
+        stderr=["Error: quota exceeded"],
+    )
+
+    with pytest.raises(TerraformCommandError):
+        async with tracker.job():
+            async with tracker.stage(DeployJobStage.INIT) as stage:
+                stage.exit_code = 0
+            async with tracker.stage(DeployJobStage.APPLY):
+                raise TerraformCommandError(failed_apply)
+
+    init, apply = tracker.records
+    assert init.stage == DeployJobStage.INIT
+    assert init.exit_code == 0 and init.stderr is None
+    assert apply.exit_code == 1
+    assert apply.stderr == "Error: quota exceeded"
+    assert all(record.duration >= 0 for record in tracker.records)
+    assert "quota exceeded" in tracker.error
@@ -0,0 +1,30 @@
+from utils.profiling import parse_import_times, profile_startup
+
+# seconds to import the entry points, generous for slow CI machines: going
+# past them means startup regressed, see `python -m utils.profiling`
+API_STARTUP_BUDGET = 3
+WORKER_STARTUP_BUDGET = 2
+
+
+def test_parse_import_times():
+    imports = parse_import_times(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   config\n"
+        "import time:      1000 |       1120 | main\n"
+    )
+    assert [(module.module, module.depth) for module in imports] == [
+        ("config", 1),
+        ("main", 0),
+    ]
+    assert imports[1].self_time == 0.001
+
+
+def test_api_startup_budget():
+    report = profile_startup("main")
+    assert [phase.name for phase in report.phases] == ["sentry", "application"]
+    assert report.entry_point_time < API_STARTUP_BUDGET, report.json()
+
+
+def test_worker_startup_budget():
+    report = profile_startup("worker.tasks")
+    assert report.entry_point_time < WORKER_STARTUP_BUDGET, report.json()
@@ -0,0 +1,56 @@
+from shared.deployments.aws_deployments.aws_1 import AWSDataLakeDeployment1
+from shared.terraform.config import (
+    get_config_file_hashes,
+    get_config_hash,
+    get_resource_addresses,
+    is_targetable,
+)
+
+STATE = """
+terraform {
+  backend "gcs" {}
+}
+"""
+
+BUCKET = """
+resource "aws_s3_bucket" "b" {
+  bucket = "name"
+}
+
+output "s3_bucket_name" {
+    value = aws_s3_bucket.b.bucket
+}
+"""
+
+
+def test_config_hash_ignores_file_order():
+    config = {"state.tf": STATE, "bucket.tf": BUCKET}
+    reversed_config = {"bucket.tf": BUCKET, "state.tf": STATE}
+
+    assert get_config_hash(get_config_file_hashes(config)) == get_config_hash(
+        get_config_file_hashes(reversed_config)
+    )
+
+
+def test_resource_blocks():
+    assert get_resource_addresses(BUCKET) == ["aws_s3_bucket.b"]
+    assert is_targetable(BUCKET)
+    assert not is_targetable(STATE)
+
+
+def test_targets_of_changed_files():
+    deployment = AWSDataLakeDeployment1()
+    config = {"state.tf": STATE, "bucket.tf": BUCKET}
+    deployed_file_hashes = get_config_file_hashes(config)
+
+    changed_bucket = dict(config, **{"bucket.tf": BUCKET.replace("name", "new")})
+    assert deployment.get_targets(changed_bucket, deployed_file_hashes) == [
+        "aws_s3_bucket.b"
+    ]
+
+    changed_state = dict(config, **{"state.tf": STATE.replace("gcs", "s3")})
+    assert deployment.get_targets(changed_state, deployed_file_hashes) is None
+
+    added_file = dict(config, **{"es.tf": BUCKET})
+    assert deployment.get_targets(added_file, deployed_file_hashes) is None
+    assert deployment.get_targets(config, None) is None
@@ -0,0 +1,181 @@
+import asyncio
+import contextlib
+import json
+import os
+import types
+import uuid
+
+import pytest
+
+from config import settings
+from database.locks import LocalLockService
+from database.models import ProjectDB, ProjectDeployDB
+from shared.deployments.base import MissingResourceNames
+from shared.deployments.gcp_deployments.gcp_2 import GCPDataLakeDeployment2
+from shared.terraform.config import get_config_file_hashes
+from shared.terraform.exceptions import TerraformOutputError
+from shared.terraform.runner import TerraformRunner
+
+LEGACY_CLUSTER = "c9f6e0a8b1d2"
+
+# stored before the cluster was added to the structure
+LEGACY_STRUCTURE = {
+    "bigtable": {
+        "project": "gcp-project",
+        "instance": "in0123456789",
+        "table": "table0123456789",
+    },
+    "cloud_storage": {"bucket": "bucket0123456789"},
+}
+
+STATE = {
+    "values": {
+        "root_module": {
+            "resources": [
+                {
+                    "address": "google_bigtable_instance.instance",
+                    "values": {
+                        "name": "in0123456789",
+                        "cluster": [{"cluster_id": LEGACY_CLUSTER}],
+                    },
+                }
+            ]
+        }
+    }
+}
+
+
+class Deployment(GCPDataLakeDeployment2):
+    def get_terraform_env(self, credentials):
+        return contextlib.nullcontext({})
+
+
+class FakeTerraform:
+    """Terraform of a deployed legacy project, records the applied cluster"""
+
+    def __init__(self):
+        self.plans = []
+        self.applied_clusters = []
+
+    async def init(self, terraform):
+        return types.SimpleNamespace(exit_code=0)
+
+    async def show(self, terraform, plan_path=None):
+        return {"resource_changes": []} if plan_path else STATE
+
+    async def plan(self, terraform, *args):
+        out = next(arg[len("-out=") :] for arg in args if arg.startswith("-out="))
+        open(out, "w").close()
+        self.plans.append(args)
+
+    async def apply(self, terraform, *args):
+        with open(os.path.join(terraform.directory_path, "bigtable.tf.json")) as f:
+            bigtable = json.load(f)
+        instance = bigtable["resource"]["google_bigtable_instance"]["instance"]
+        self.applied_clusters.append(instance["cluster"]["cluster_id"])
+        return types.SimpleNamespace(exit_code=0)
+
+    async def output(self, terraform):
+        return {
+            "bigtable_project": {"value": "gcp-project"},
+            "bigtable_instance": {"value": "in0123456789"},
+            "bigtable_cluster": {"value": self.applied_clusters[-1]},
+            "bigtable_table": {"value": "table0123456789"},
+            "cloud_storage_bucket": {"value": "bucket0123456789"},
+        }
+
+
+@pytest.fixture
+def terraform(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "terraform_workspaces_dir", str(tmp_path / "ws"))
+    monkeypatch.setattr(settings, "terraform_plans_dir", str(tmp_path / "plans"))
+    terraform = FakeTerraform()
+    for name in ("init", "show", "plan", "apply", "output"):
+        # a function, bound to the runner like the method it replaces
+        monkeypatch.setattr(
+            TerraformRunner,
+            name,
+            lambda *args, name=name: getattr(terraform, name)(*args),
+        )
+    return terraform
+
+
+def get_project_objects(project_structure: dict):
+    owner = uuid.uuid4()
+    project = ProjectDB(
+        name="gcp project", service_provider="GCP", owner=owner, created_by=owner
+    )
+    credentials = types.SimpleNamespace(
+        credentials=types.SimpleNamespace(project_id="gcp-project")
+    )
+    project_deploy = ProjectDeployDB(
+        project=project.id,
+        created_by=owner,
+        deploy_type="GCP_2",
+        project_structure=project_structure,
+    )
+    return project, credentials, project_deploy
+
+
+def test_legacy_structure_isnt_rendered_with_new_names():
+    project, credentials, project_deploy = get_project_objects(LEGACY_STRUCTURE)
+
+    with pytest.raises(MissingResourceNames):
+        Deployment().get_config_hash(project, credentials, project_deploy)
+
+    # a deploy that wasn't applied has its new names
+    project_deploy.project_structure = {}
+    Deployment().get_config_hash(project, credentials, project_deploy)
+
+
+@pytest.mark.asyncio
+async def test_redeploy_of_a_legacy_structure_keeps_the_cluster(terraform):
+    project, credentials, project_deploy = get_project_objects(LEGACY_STRUCTURE)
+    deployment = Deployment(lock_service=LocalLockService())
+
+    result = await deployment.redeploy_data_lake(project, credentials, project_deploy)
+
+    assert terraform.applied_clusters == [LEGACY_CLUSTER]
+    assert result.project_structure["bigtable"]["cluster"] == LEGACY_CLUSTER
+    # the next updates render the stored names
+    project_deploy.project_structure = result.project_structure
+    project_deploy.config_hash = result.config_hash
+    assert (
+        deployment.get_config_hash(project, credentials, project_deploy)
+        == result.config_hash
+    )
+
+
+@pytest.mark.asyncio
+async def test_redeploy_without_the_cluster_in_the_state_is_refused(
+    terraform, monkeypatch
+):
+    monkeypatch.setattr(terraform, "show", lambda *args: asyncio.sleep(0, {}))
+    project, credentials, project_deploy = get_project_objects(LEGACY_STRUCTURE)
+    deployment = Deployment(lock_service=LocalLockService())
+
+    with pytest.raises(TerraformOutputError):
+        await deployment.redeploy_data_lake(project, credentials, project_deploy)
+    assert terraform.applied_clusters == []
+
+
+@pytest.mark.asyncio
+async def test_update_applies_the_previewed_plan(terraform):
+    structure = dict(
+        LEGACY_STRUCTURE,
+        bigtable=dict(LEGACY_STRUCTURE["bigtable"], cluster=LEGACY_CLUSTER),
+    )
+    project, credentials, project_deploy = get_project_objects(structure)
+    deployment = Deployment(lock_service=LocalLockService())
+    config = deployment.render(project, credentials, project_deploy)
+    # only the bucket changed since the deploy
+    project_deploy.config_hash = "deployed"
+    project_deploy.config_file_hashes = dict(
+        get_config_file_hashes(config), **{"bucket.tf.json": "deployed"}
+    )
+
+    await deployment.plan_data_lake(project, credentials, project_deploy)
+    await deployment.redeploy_data_lake(project, credentials, project_deploy)
+
+    (plan_args,) = terraform.plans
+    assert "-target=google_storage_bucket.data_lake_storage" in plan_args
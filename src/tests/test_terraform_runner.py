@@ -0,0 +1,91 @@
+import os
+import stat
+
+import pytest
+from pydantic import BaseModel
+
+from config import settings
+from shared.terraform.exceptions import TerraformCommandError, TerraformTimeoutError
+from shared.terraform.outputs import read_deployed_resources, recover_deployed_resources
+from shared.terraform.runner import TerraformRunner
+
+FAKE_TERRAFORM = """#!/bin/sh
+case "$2" in
+  apply)
+    for i in 1 2 3 4 5; do echo "line $i"; done
+    echo "warning" >&2
+    ;;
+  output)
+    echo '{"endpoint": {"sensitive": false, "type": "string",'
+    echo '"value": "search.example.com"}}'
+    ;;
+  destroy)
+    echo "Error: state is locked" >&2
+    exit 1
+    ;;
+  plan)
+    exec sleep 10
+    ;;
+esac
+"""
+
+
+@pytest.fixture
+def terraform(tmp_path, monkeypatch):
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    executable = bin_path / "terraform"
+    executable.write_text(FAKE_TERRAFORM)
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(settings, "terraform_cache_dir", str(tmp_path / "cache"))
+    return TerraformRunner(str(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_run_keeps_output_tail(terraform):
+    result = await terraform.run("apply", buffer_lines=2)
+    assert result.exit_code == 0
+    assert result.stdout == ["line 4", "line 5"]
+    assert result.stderr == ["warning"]
+
+
+@pytest.mark.asyncio
+async def test_output_is_parsed(terraform):
+    outputs = await terraform.output()
+    assert outputs["endpoint"]["value"] == "search.example.com"
+
+
+@pytest.mark.asyncio
+async def test_failed_command_raises(terraform):
+    with pytest.raises(TerraformCommandError) as exc_info:
+        await terraform.destroy()
+    assert exc_info.value.result.exit_code == 1
+    assert exc_info.value.result.stderr == ["Error: state is locked"]
+
+
+@pytest.mark.asyncio
+async def test_command_timeout(terraform):
+    with pytest.raises(TerraformTimeoutError):
+        await terraform.run("plan", timeout=0.5)
+
+
+class SearchResource(BaseModel):
+    endpoint: str
+
+
+class DeployedResources(BaseModel):
+    search: SearchResource
+
+
+@pytest.mark.asyncio
+async def test_deployed_resources_from_outputs(terraform):
+    resources = await read_deployed_resources(
+        terraform, DeployedResources, {"search": {"endpoint": "endpoint"}}
+    )
+    assert resources.search.endpoint == "search.example.com"
+
+    recovered = await recover_deployed_resources(
+        terraform, DeployedResources, {"search": {"endpoint": "missing"}}
+    )
+    assert recovered is None
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from shared.terraform.config import get_resource_addresses, is_targetable
+from shared.terraform.templates import ConfigTemplate, Param, ref
+
+BUCKET = {
+    "resource": {"aws_s3_bucket": {"b": {"bucket": Param("bucket_name")}}},
+    "output": {"s3_bucket_name": {"value": ref("aws_s3_bucket.b.bucket")}},
+}
+
+
+def test_render_template():
+    template = ConfigTemplate(BUCKET)
+    content = template.render({"bucket_name": 'name "quoted"'})
+
+    assert json.loads(content) == {
+        "resource": {"aws_s3_bucket": {"b": {"bucket": 'name "quoted"'}}},
+        "output": {"s3_bucket_name": {"value": "${aws_s3_bucket.b.bucket}"}},
+    }
+    assert content == template.render({"bucket_name": 'name "quoted"'})
+    assert template.params == {"bucket_name"}
+
+
+def test_render_template_without_params():
+    with pytest.raises(KeyError):
+        ConfigTemplate(BUCKET).render({})
+
+
+def test_json_resource_blocks():
+    content = ConfigTemplate(BUCKET).render({"bucket_name": "name"})
+    assert get_resource_addresses(content) == ["aws_s3_bucket.b"]
+    assert is_targetable(content)
+
+    state = json.dumps({"terraform": {"backend": {"gcs": {}}}})
+    assert not is_targetable(state)
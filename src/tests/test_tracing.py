@@ -0,0 +1,131 @@
+import asyncio
+import contextlib
+
+import pytest
+import sentry_sdk
+from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
+from sentry_sdk.transport import Transport
+
+from config import settings
+from utils.tracing import TailSamplingMiddleware, start_span, traces_sampler
+
+
+class RecordingTransport(Transport):
+    def __init__(self):
+        super().__init__()
+        self.transactions = []
+
+    def capture_event(self, event):
+        pass
+
+    def capture_envelope(self, envelope):
+        transaction = envelope.get_transaction_event()
+        if transaction is not None:
+            self.transactions.append(transaction)
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    # requests start sampled for TailSamplingMiddleware to decide
+    monkeypatch.setattr(settings, "tracing_slow_request_threshold", 0.1)
+    transport = RecordingTransport()
+    sentry_sdk.init(
+        dsn="https://key@sentry.invalid/1",
+        transport=transport,
+        traces_sampler=traces_sampler,
+        default_integrations=False,
+        auto_enabling_integrations=False,
+    )
+    yield transport
+    sentry_sdk.Hub.current.bind_client(None)
+
+
+def get_application(delay: float = 0, status: int = 200, error: bool = False):
+    async def app(scope, receive, send):
+        with start_span("db.mongo", "projects.get"):
+            await asyncio.sleep(delay)
+        if error:
+            raise RuntimeError("failed")
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+async def request(app) -> None:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/project",
+        "headers": [],
+        "query_string": b"",
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+        "scheme": "http",
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    await SentryAsgiMiddleware(app)(scope, receive, send)
+
+
+def test_sampler_follows_parent_and_samples_up_front():
+    assert traces_sampler({"parent_sampled": False, "asgi_scope": {}}) == 0
+    assert traces_sampler({"asgi_scope": {"type": "http"}}) == 0.01
+    assert traces_sampler({"asgi_scope": {"type": "websocket"}}) == 0.01
+    assert traces_sampler({"celery_job": {}}) == 0.01
+
+
+def test_sampler_samples_requests_to_decide_later_if_slow_ones_are_kept(
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "tracing_slow_request_threshold", 1.0)
+
+    assert traces_sampler({"asgi_scope": {"type": "http"}}) == 1
+    assert traces_sampler({"asgi_scope": {"type": "websocket"}}) == 0.01
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "app, kept",
+    [
+        (get_application(), False),
+        (get_application(delay=0.2), True),
+        (get_application(status=503), True),
+        (get_application(error=True), True),
+    ],
+)
+async def test_tail_sampling_keeps_slow_and_failed_requests(transport, app, kept):
+    app = TailSamplingMiddleware(app, threshold=0.1, sample_rate=0)
+    try:
+        await request(app)
+    except RuntimeError:
+        pass
+    sentry_sdk.flush()
+
+    assert len(transport.transactions) == kept
+    if kept:
+        (span,) = transport.transactions[0]["spans"]
+        assert span["op"] == "db.mongo"
+
+
+@pytest.mark.asyncio
+async def test_tail_sampling_keeps_sampled_requests(transport):
+    await request(TailSamplingMiddleware(get_application(), 0.1, sample_rate=1))
+    sentry_sdk.flush()
+
+    assert len(transport.transactions) == 1
+
+
+def test_no_span_without_a_sampled_transaction(transport):
+    assert isinstance(start_span("db.mongo", "get"), contextlib.nullcontext)
+    with sentry_sdk.start_transaction(name="task", sampled=False):
+        with start_span("db.mongo", "projects.get") as span:
+            assert span is None
+    with sentry_sdk.start_transaction(name="task", sampled=True):
+        with start_span("db.mongo", "projects.get") as span:
+            assert span.op == "db.mongo"
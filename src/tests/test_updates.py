@@ -0,0 +1,105 @@
+import httpx
+import pytest
+
+from api.app import get_application
+from database.db import DatabaseWrapper
+from database.exceptions import ObjectVersionConflict
+from database.manager import ProjectManager
+from database.models import ProjectDB, get_project_database
+
+
+async def create_project(owner) -> ProjectDB:
+    return await get_project_database().create(
+        ProjectDB(
+            name="test project",
+            service_provider="AWS",
+            owner=owner,
+            created_by=owner,
+            verified=True,
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_update_sets_only_the_updated_fields(event_loop, user_id):
+    DatabaseWrapper.set_event_loop(event_loop)
+    project = await create_project(user_id)
+    # written by another request meanwhile
+    await get_project_database().update_fields({"id": project.id}, {"verified": False})
+
+    project.name = "renamed"
+    await get_project_database().update(project, ["name"])
+
+    stored = await get_project_database().get(project.id)
+    assert stored.name == "renamed"
+    assert not stored.verified
+    assert stored.version == project.version == 1
+
+
+@pytest.mark.asyncio
+async def test_update_of_a_stale_version_conflicts(event_loop, user_id):
+    DatabaseWrapper.set_event_loop(event_loop)
+    project = await create_project(user_id)
+    stale = project.copy()
+    project.name = "first"
+    await get_project_database().update(project, ["name"], check_version=True)
+
+    stale.name = "second"
+    with pytest.raises(ObjectVersionConflict):
+        await get_project_database().update(stale, ["name"], check_version=True)
+
+    stored = await get_project_database().get(project.id)
+    assert (stored.name, stored.version) == ("first", 1)
+
+
+@pytest.mark.asyncio
+async def test_objects_without_a_version_are_updated_as_version_0(event_loop, user_id):
+    DatabaseWrapper.set_event_loop(event_loop)
+    project = ProjectDB(
+        name="test project", service_provider="AWS", owner=user_id, created_by=user_id
+    )
+    await DatabaseWrapper.get_projects_collection().insert_one(
+        project.dict(exclude={"version"})
+    )
+
+    project = await get_project_database().get(project.id)
+    project.name = "renamed"
+    await get_project_database().update(project, ["name"], check_version=True)
+
+    assert (await get_project_database().get(project.id)).version == 1
+
+
+@pytest.mark.asyncio
+async def test_patch_project(event_loop, user_id, auth_headers, monkeypatch):
+    app = get_application(event_loop)
+    project = await create_project(user_id)
+    update = ProjectManager.update
+
+    async def update_after_another_request(
+        self, object_update, current_object, *args, **kwargs
+    ):
+        if object_update.name == "conflicting":
+            # the copy keeps the version the endpoint read
+            await get_project_database().update(current_object.copy(), ["name"])
+        return await update(self, object_update, current_object, *args, **kwargs)
+
+    monkeypatch.setattr(ProjectManager, "update", update_after_another_request)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        response = await async_client.patch(
+            f"/v1/projects/{project.id}",
+            json={"name": "renamed", "service_provider": "AWS"},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200, response.content
+        assert response.json()["name"] == "renamed"
+        assert response.json()["verified"]
+
+        response = await async_client.patch(
+            f"/v1/projects/{project.id}",
+            json={"name": "conflicting", "service_provider": "AWS"},
+            headers=auth_headers,
+        )
+        assert response.status_code == 409, response.content
+
+    stored = await get_project_database().get(project.id)
+    assert (stored.name, stored.version) == ("renamed", 2)
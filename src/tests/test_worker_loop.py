@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+
+from worker import loop
+
+
+@pytest.fixture(autouse=True)
+def setup_steps(monkeypatch):
+    """Steps of the process setup run when the loop starts"""
+    steps = []
+
+    async def ensure_indexes():
+        steps.append("indexes")
+
+    monkeypatch.setattr(loop, "ensure_indexes", ensure_indexes)
+    monkeypatch.setattr(
+        loop, "remove_orphaned_credentials_files", lambda: steps.append("files")
+    )
+    return steps
+
+
+def test_start_loop_sets_the_process_up_without_the_prefork_signal(setup_steps):
+    # the threads and solo pools start the loop with their first task
+    assert loop.run(asyncio.sleep(0, result=1)) == 1
+    assert loop.run(asyncio.sleep(0, result=2)) == 2
+    loop.stop_loop(timeout=1)
+
+    assert setup_steps == ["indexes", "files"]
+
+
+def test_stop_loop_leaves_tasks_ignoring_cancellation_running():
+    async def ignore_cancellation():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.5)
+
+    event_loop = loop.start_loop()
+    asyncio.run_coroutine_threadsafe(ignore_cancellation(), event_loop)
+    time.sleep(0.05)
+
+    started_at = time.monotonic()
+    loop.stop_loop(timeout=0.1)
+    assert time.monotonic() - started_at < 0.5
+    assert event_loop.is_running()
+
+    loop.stop_loop(timeout=1)
+    assert event_loop.is_closed()
@@ -0,0 +1,31 @@
+import os
+
+from config import settings
+from shared.terraform.workspaces import (
+    get_workspace_lock_path,
+    get_workspace_path,
+    prune_workspaces,
+)
+from utils.file_lock import file_lock
+
+
+def create_workspace(project_id: str, size: int, mtime: int) -> None:
+    path = get_workspace_path(project_id)
+    os.makedirs(path)
+    with open(os.path.join(path, "main.tf"), "w") as f:
+        f.write("x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_prune_removes_least_recently_used_workspaces(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "terraform_workspaces_dir", str(tmp_path))
+    create_workspace("old", 100, mtime=1)
+    create_workspace("in-use", 100, mtime=2)
+    create_workspace("new", 100, mtime=3)
+
+    with file_lock(get_workspace_lock_path("in-use"), shared=True):
+        removed = prune_workspaces(disk_budget=100)
+
+    assert removed == ["old", "new"]
+    assert os.path.isdir(get_workspace_path("in-use"))
+    assert prune_workspaces(disk_budget=100) == []
@@ -0,0 +1,8 @@
+from shared.models.credentials import AWSCredentials
+
+
+def get_credentials_env(credentials: AWSCredentials) -> dict[str, str]:
+    return {
+        "AWS_ACCESS_KEY_ID": credentials.access_key_id,
+        "AWS_SECRET_ACCESS_KEY": credentials.secret_access_key,
+    }
@@ -0,0 +1,52 @@
+import collections
+import time
+import typing
+
+K = typing.TypeVar("K")
+V = typing.TypeVar("V")
+
+
+class TTLCache(typing.Generic[K, V]):
+    """
+    In-process cache whose entries expire `ttl` seconds after being set.
+
+    At most `maxsize` entries are kept, the least recently used ones are
+    dropped first.
+    Not shared between processes, so writes made by other processes are
+    only seen once the entry expires.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: collections.OrderedDict[
+            K, tuple[float, V]
+        ] = collections.OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Set an entry expiring after `ttl` seconds, at most the `ttl` of the cache"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: typing.Callable[[K], bool]) -> None:
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
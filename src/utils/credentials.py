@@ -0,0 +1,71 @@
+import contextlib
+import os
+import tempfile
+import typing
+
+from config import settings
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+# files are named after the process that wrote them, so the files left by a
+# killed process can be told apart from the ones in use
+FILE_PREFIX = "credentials_"
+
+
+def get_credentials_dir() -> str:
+    """`credentials_dir` if it exists (tmpfs, nothing reaches the disk), else the temp dir"""
+    if os.path.isdir(settings.credentials_dir):
+        return settings.credentials_dir
+    return tempfile.gettempdir()
+
+
+@contextlib.contextmanager
+def credentials_file(content: str, suffix: str = "") -> typing.Iterator[str]:
+    """
+    Write `content` to a file readable by the current user only and yield its
+    path. The file is removed when the block ends, whatever the outcome.
+    """
+    fd, path = tempfile.mkstemp(
+        suffix=suffix,
+        prefix=f"{FILE_PREFIX}{os.getpid()}_",
+        dir=get_credentials_dir(),
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        yield path
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove_orphaned_credentials_files() -> list[str]:
+    """
+    Remove the credentials files of processes that don't run anymore, e.g.
+    killed before their blocks ended. Returns the removed paths.
+    """
+    directory_path = get_credentials_dir()
+    removed = []
+    for entry in os.scandir(directory_path):
+        if not entry.name.startswith(FILE_PREFIX):
+            continue
+        pid = entry.name[len(FILE_PREFIX) :].split("_", 1)[0]
+        if not pid.isdigit() or is_process_alive(int(pid)):
+            continue
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(entry.path)
+            removed.append(entry.path)
+    if removed:
+        LOGGER.info(f"Removed {len(removed)} orphaned credentials files")
+    return removed
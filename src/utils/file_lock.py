@@ -0,0 +1,46 @@
+import asyncio
+import contextlib
+import fcntl
+import os
+
+
+@contextlib.contextmanager
+def file_lock(path: str, shared: bool = False, blocking: bool = True):
+    """
+    Hold an advisory flock on `path` for the duration of the block.
+
+    flock is shared between every process on the host, so it is safe to use
+    across Celery worker processes. With `blocking=False` a BlockingIOError
+    is raised if the lock is already held.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        flags |= fcntl.LOCK_NB
+    with open(path, "a") as f:
+        fcntl.flock(f, flags)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextlib.asynccontextmanager
+async def async_file_lock(path: str, shared: bool = False, poll_interval: float = 0.1):
+    """
+    `file_lock` that polls for the lock without blocking the loop or a thread,
+    so a cancelled waiter gives up at once
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB
+    with open(path, "a") as f:
+        while True:
+            try:
+                fcntl.flock(f, flags)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -1,11 +1,12 @@
-import json
-import uuid
+import contextlib
+import typing
 
 from shared.models.credentials import GCPCredentials
+from utils.credentials import credentials_file
 
 
-def get_credentials_tmp_path(credentials: GCPCredentials) -> str:
-    gcp_credentials_path = f"/tmp/{str(uuid.uuid4()).replace('-', '')}_gcp_credentials"
-    with open(gcp_credentials_path, "w") as f:
-        json.dump(credentials.dict(), f)
-    return gcp_credentials_path
+@contextlib.contextmanager
+def credentials_env(credentials: GCPCredentials) -> typing.Iterator[dict[str, str]]:
+    """Environment pointing to a key file of the credentials, removed after the block"""
+    with credentials_file(credentials.json(), suffix=".json") as path:
+        yield {"GOOGLE_APPLICATION_CREDENTIALS": path}
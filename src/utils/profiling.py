@@ -0,0 +1,144 @@
+"""
+Startup profile of an entry point, e.g. `python -m utils.profiling main` or
+`python -m utils.profiling worker.tasks`, printed as a JSON report of the
+import time of every module and of the phases recorded by `startup_phase`.
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from pydantic import BaseModel
+
+from utils.logger import setup_logger
+
+LOGGER = setup_logger()
+
+# "import time: self [us] | cumulative | imported package", nested imports
+# are indented by two spaces per level
+IMPORT_TIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+PHASES_MARKER = "startup phases: "
+
+
+class StartupPhase(BaseModel):
+    name: str
+    duration: float
+
+
+class ModuleImport(BaseModel):
+    module: str
+    # seconds spent in the module itself, and with the modules it imported
+    self_time: float
+    cumulative_time: float
+    depth: int
+
+
+class StartupReport(BaseModel):
+    entry_point: str
+    # seconds the process took to start and import the entry point
+    total_time: float
+    # seconds of the import of the entry point, phases run by it included
+    entry_point_time: float
+    phases: list[StartupPhase]
+    imports: list[ModuleImport]
+
+
+_phases: list[StartupPhase] = []
+
+
+@contextlib.contextmanager
+def startup_phase(name: str):
+    """Record the duration of a step of the startup of a process"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase = StartupPhase(name=name, duration=time.perf_counter() - started_at)
+        _phases.append(phase)
+        LOGGER.debug(f"Startup phase {name} took {phase.duration:.3f}s")
+
+
+def get_startup_phases() -> list[StartupPhase]:
+    return list(_phases)
+
+
+def parse_import_times(output: str) -> list[ModuleImport]:
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            self_time, cumulative_time, indent, module = match.groups()
+            imports.append(
+                ModuleImport(
+                    module=module,
+                    self_time=int(self_time) / 1e6,
+                    cumulative_time=int(cumulative_time) / 1e6,
+                    depth=len(indent) // 2,
+                )
+            )
+    return imports
+
+
+def profile_startup(entry_point: str) -> StartupReport:
+    """Import `entry_point` in a new interpreter and report where the time went"""
+    code = (
+        "import time\n"
+        "started_at = time.perf_counter()\n"
+        f"import {entry_point}\n"
+        "entry_point_time = time.perf_counter() - started_at\n"
+        "from utils import profiling\n"
+        "print(profiling.PHASES_MARKER + profiling.dump_phases(entry_point_time))\n"
+    )
+    started_at = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    total_time = time.perf_counter() - started_at
+    phases_line = next(
+        line for line in result.stdout.splitlines() if line.startswith(PHASES_MARKER)
+    )
+    dumped = json.loads(phases_line[len(PHASES_MARKER) :])
+    return StartupReport(
+        entry_point=entry_point,
+        total_time=total_time,
+        entry_point_time=dumped["entry_point_time"],
+        phases=dumped["phases"],
+        imports=parse_import_times(result.stderr),
+    )
+
+
+def dump_phases(entry_point_time: float) -> str:
+    return json.dumps(
+        {
+            "entry_point_time": entry_point_time,
+            "phases": [phase.dict() for phase in get_startup_phases()],
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("entry_point", help="module to import, e.g. main")
+    parser.add_argument(
+        "--top", type=int, default=30, help="slowest imports to report, 0 for all"
+    )
+    args = parser.parse_args()
+
+    report = profile_startup(args.entry_point)
+    if args.top:
+        report.imports = sorted(
+            report.imports, key=lambda module: module.self_time, reverse=True
+        )[: args.top]
+    print(report.json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Sentry setup and spans of the traced requests and tasks.
+
+Requests and tasks are traced at `tracing_sample_rate`, decided when they
+start. Spans are only recorded for sampled transactions, elsewhere
+`start_span` costs a context variable lookup.
+
+Slow and failed requests are traced too if `tracing_slow_request_threshold`
+is set: requests then all start sampled and `TailSamplingMiddleware` drops
+their transaction when they end if none of this applies.
+"""
+import contextlib
+import random
+import time
+import typing
+
+import sentry_sdk
+
+from config import settings
+
+
+def keeps_slow_requests() -> bool:
+    return settings.tracing_slow_request_threshold is not None
+
+
+def traces_sampler(sampling_context: dict) -> float:
+    """
+    Sample rate of a new transaction. Requests continuing a trace follow its
+    decision, HTTP requests are all sampled to be decided when they end if
+    slow requests are kept.
+    """
+    parent_sampled = sampling_context.get("parent_sampled")
+    if parent_sampled is not None:
+        return float(parent_sampled)
+    asgi_scope = sampling_context.get("asgi_scope")
+    if asgi_scope and asgi_scope["type"] == "http" and keeps_slow_requests():
+        return 1.0
+    return settings.tracing_sample_rate
+
+
+def init_tracing() -> None:
+    """Report errors to sentry, and trace unless `tracing_enabled` is unset"""
+    options = {}
+    if settings.tracing_enabled:
+        options["traces_sampler"] = traces_sampler
+    sentry_sdk.init(dsn=settings.sentry_url, **options)
+
+
+class TailSamplingMiddleware:
+    """
+    Keep the transaction of an HTTP request if it was sampled, it failed or
+    it took at least `threshold` seconds, drop it otherwise.
+
+    Runs inside SentryAsgiMiddleware, which starts the transaction.
+    """
+
+    def __init__(
+        self,
+        app,
+        threshold: float | None = None,
+        sample_rate: float | None = None,
+    ):
+        self.app = app
+        self.threshold = (
+            settings.tracing_slow_request_threshold if threshold is None else threshold
+        )
+        self.sample_rate = (
+            settings.tracing_sample_rate if sample_rate is None else sample_rate
+        )
+
+    async def __call__(self, scope, receive, send):
+        transaction = sentry_sdk.Hub.current.scope.transaction
+        if scope["type"] != "http" or transaction is None or not transaction.sampled:
+            await self.app(scope, receive, send)
+            return
+
+        sampled = bool(transaction.parent_sampled) or random.random() < self.sample_rate
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        failed = True
+        try:
+            await self.app(scope, receive, send_with_status)
+            failed = status_code >= 500
+        finally:
+            transaction.set_http_status(status_code)
+            slow = time.perf_counter() - started_at >= self.threshold
+            if not (sampled or failed or slow):
+                # an unsampled transaction isn't sent when it finishes
+                transaction.sampled = False
+
+
+def start_span(op: str, description: str) -> typing.ContextManager:
+    """Child span of the current span, nothing if it isn't sampled"""
+    parent = sentry_sdk.Hub.current.scope.span
+    if parent is None or not parent.sampled:
+        return contextlib.nullcontext()
+    return parent.start_child(op=op, description=description)
+
+
+async def in_hub(coroutine: typing.Awaitable, hub: sentry_sdk.Hub) -> typing.Any:
+    """
+    Await `coroutine` with the sentry `hub` of another thread, so its spans
+    and errors belong to the transaction of the task running there
+    """
+    with hub:
+        return await coroutine
@@ -0,0 +1,134 @@
+import asyncio
+import contextlib
+import functools
+import inspect
+import itertools
+import uuid
+
+from celery import chain, group
+from celery.canvas import Signature
+from celery.utils.log import get_task_logger
+from pydantic import UUID4
+
+from config import settings
+from database.manager import DeployBatchManager, ProjectDeployManager
+from database.models import get_deploy_batch_database, get_project_deploy_database
+from shared.models.batches import DeployBatchItemStatus
+from shared.models.deploys import ProjectDeployStatus
+from shared.models.providers import ServiceProviderType
+from worker.loop import run
+
+LOGGER = get_task_logger(__name__)
+
+
+@contextlib.asynccontextmanager
+async def batch_item(batch_id: str | None, project_id: UUID4):
+    """
+    Record the status of a batch item while its task runs.
+
+    Errors of batch items are recorded and swallowed, so the rest of the
+    chain the task belongs to keeps running, see `batch_task` for the other
+    errors of the task. Outside of a batch this does nothing.
+    """
+    if batch_id is None:
+        yield
+        return
+
+    batch_id = uuid.UUID(batch_id)
+    deploy_batch_manager = DeployBatchManager(get_deploy_batch_database())
+    await deploy_batch_manager.set_item_status(
+        batch_id, project_id, DeployBatchItemStatus.RUNNING
+    )
+    try:
+        yield
+    except Exception as e:
+        LOGGER.exception(f"Batch {batch_id} project {project_id} failed")
+        await deploy_batch_manager.set_item_status(
+            batch_id, project_id, DeployBatchItemStatus.FAILED, str(e)
+        )
+    else:
+        await deploy_batch_manager.set_item_status(
+            batch_id, project_id, DeployBatchItemStatus.SUCCEEDED
+        )
+
+
+async def fail_batch_item(
+    batch_id: UUID4,
+    project_id: UUID4,
+    from_status: ProjectDeployStatus,
+    to_status: ProjectDeployStatus,
+    detail: str,
+) -> None:
+    deploy_batch_manager = DeployBatchManager(get_deploy_batch_database())
+    await deploy_batch_manager.set_item_status(
+        batch_id, project_id, DeployBatchItemStatus.FAILED, detail
+    )
+    project_deploy_manager = ProjectDeployManager(get_project_deploy_database())
+    await project_deploy_manager.transition(project_id, [from_status], to_status)
+
+
+def batch_task(from_status: ProjectDeployStatus, to_status: ProjectDeployStatus):
+    """
+    Decorator of a task with a `project_db` and a `batch_id` argument that
+    never raises in a batch, since a chain stops at its first failed task.
+
+    Errors `batch_item` didn't record, e.g. of the task arguments, of the
+    item status updates or of a cancelled event loop, fail the item and
+    move the project's deploy from `from_status` to `to_status`.
+    """
+
+    def decorator(task):
+        signature = inspect.signature(task)
+
+        @functools.wraps(task)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            batch_id = arguments.get("batch_id")
+            if batch_id is None:
+                return task(*args, **kwargs)
+            try:
+                return task(*args, **kwargs)
+            except (Exception, asyncio.CancelledError) as e:
+                LOGGER.exception(f"Batch {batch_id} task failed")
+                try:
+                    run(
+                        fail_batch_item(
+                            uuid.UUID(batch_id),
+                            uuid.UUID(str(arguments["project_db"]["id"])),
+                            from_status,
+                            to_status,
+                            str(e),
+                        )
+                    )
+                except (Exception, asyncio.CancelledError):
+                    LOGGER.exception(f"Can't record the failure of batch {batch_id}")
+
+        return wrapper
+
+    return decorator
+
+
+def dispatch_batch(
+    signatures: dict[ServiceProviderType, list[Signature]],
+    concurrency: int | None = None,
+) -> None:
+    """
+    Run the task signatures with at most `concurrency` tasks per provider.
+
+    The signatures of every provider are spread over `concurrency` chains
+    and all of the chains are sent at once as a group. A chain starts its
+    next task when the previous one finishes, which doesn't need a result
+    backend, unlike a chord.
+    """
+    concurrency = concurrency or settings.bulk_deploy_concurrency
+    lanes = []
+    for provider_signatures in signatures.values():
+        provider_lanes = [[] for _ in range(min(concurrency, len(provider_signatures)))]
+        for lane, signature in zip(
+            itertools.cycle(provider_lanes), provider_signatures
+        ):
+            lane.append(signature)
+        lanes.extend(chain(*lane) for lane in provider_lanes)
+
+    if lanes:
+        group(lanes).apply_async()
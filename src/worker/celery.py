@@ -1,3 +1,11 @@
 from celery import Celery
 
+from config import settings
+
 app = Celery("worker", broker="amqp://rabbit", include=["worker.tasks"])
+
+if settings.worker_async_mode:
+    # tasks only wait for their coroutines on the shared event loop of the
+    # process (see worker.loop), so threads are enough to run many at once
+    app.conf.worker_pool = "threads"
+    app.conf.worker_concurrency = settings.worker_async_concurrency
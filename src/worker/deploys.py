@@ -0,0 +1,55 @@
+import asyncio
+import contextlib
+import typing
+
+from celery.utils.log import get_task_logger
+from pydantic import UUID4
+
+from database.manager import ProjectDeployManager
+from database.models import get_project_deploy_database
+from shared.models.deploys import ProjectDeployStatus
+
+LOGGER = get_task_logger(__name__)
+
+
+def deploy_status_on_error(
+    project_id: UUID4,
+    from_status: ProjectDeployStatus,
+    to_status: ProjectDeployStatus,
+) -> typing.AsyncContextManager:
+    """Move the project's deploy from `from_status` to `to_status` if the block fails"""
+    return deploy_statuses_on_error([project_id], from_status, to_status)
+
+
+@contextlib.asynccontextmanager
+async def deploy_statuses_on_error(
+    project_ids: list[UUID4],
+    from_status: ProjectDeployStatus,
+    to_status: ProjectDeployStatus,
+):
+    """`deploy_status_on_error` for the deploys of many projects"""
+    try:
+        yield
+    except Exception:
+        project_deploy_manager = ProjectDeployManager(get_project_deploy_database())
+        await asyncio.gather(
+            *(
+                project_deploy_manager.transition(project_id, [from_status], to_status)
+                for project_id in project_ids
+            )
+        )
+        raise
+
+
+async def finish_deploy_status(
+    project_id: UUID4,
+    from_status: ProjectDeployStatus,
+    fields: dict | None = None,
+) -> None:
+    """Move the project's deploy from `from_status` to deployed and set `fields`"""
+    project_deploy_manager = ProjectDeployManager(get_project_deploy_database())
+    project_deploy = await project_deploy_manager.transition(
+        project_id, [from_status], ProjectDeployStatus.DEPLOYED, fields
+    )
+    if project_deploy is None:
+        LOGGER.warning(f"Deploy of project {project_id} isn't {from_status.value}")
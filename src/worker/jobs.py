@@ -0,0 +1,71 @@
+import uuid
+
+from pydantic import UUID4
+
+from api.models import DeployJobCreate
+from database.manager import DeployJobManager
+from database.models import get_deploy_job_database
+from shared.deployments.tracking import StageTracker
+from shared.models.jobs import (
+    DeployJobOperation,
+    DeployJobStage,
+    DeployJobStageRecord,
+    DeployJobStatus,
+)
+
+
+class DeployJobTracker(StageTracker):
+    """
+    Stores the stages of a task in its deploy job.
+
+    Jobs are created by the API when the task is queued, tasks sent without a
+    job (e.g. by a bulk request) create it when they start.
+    """
+
+    def __init__(
+        self,
+        job_id: str | None,
+        project_id: UUID4,
+        operation: DeployJobOperation,
+        user_id: UUID4,
+        batch_id: str | None = None,
+    ):
+        self.job_id = uuid.UUID(job_id) if job_id else None
+        self.project_id = project_id
+        self.operation = operation
+        self.user_id = user_id
+        self.batch_id = uuid.UUID(batch_id) if batch_id else None
+
+    async def start_job(self) -> None:
+        self.manager = DeployJobManager(get_deploy_job_database())
+        if self.job_id is None:
+            # the time spent in the queue is unknown
+            deploy_job = await self.manager.create(
+                DeployJobCreate(
+                    project=self.project_id,
+                    operation=self.operation,
+                    batch=self.batch_id,
+                ),
+                self.user_id,
+            )
+            self.job_id = deploy_job.id
+            return
+
+        deploy_job = await self.manager.model_db.get(self.job_id)
+        for record in deploy_job.stages:
+            if record.stage == DeployJobStage.QUEUED and record.finished_at is None:
+                record.finish()
+                await self.manager.finish_stage(self.job_id, record)
+
+    async def finish_job(self, error: str | None = None) -> None:
+        await self.manager.finish(
+            self.job_id,
+            DeployJobStatus.FAILED if error else DeployJobStatus.SUCCEEDED,
+            error,
+        )
+
+    async def start_stage(self, record: DeployJobStageRecord) -> None:
+        await self.manager.start_stage(self.job_id, record)
+
+    async def finish_stage(self, record: DeployJobStageRecord) -> None:
+        await self.manager.finish_stage(self.job_id, record)
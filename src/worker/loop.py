@@ -0,0 +1,166 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import os
+import threading
+import typing
+
+import sentry_sdk
+from celery.signals import (
+    celeryd_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from celery.utils.log import get_task_logger
+
+from config import settings
+from database.db import DatabaseWrapper
+from database.indexes import ensure_indexes
+from shared.models.providers import ServiceProviderType
+from utils.credentials import remove_orphaned_credentials_files
+from utils.profiling import startup_phase
+from utils.tracing import in_hub, init_tracing
+
+LOGGER = get_task_logger(__name__)
+
+T = typing.TypeVar("T")
+
+# seconds of the shutdown beyond the interrupt grace period of terraform
+SHUTDOWN_MARGIN = 10
+
+_loop: asyncio.AbstractEventLoop | None = None
+_thread: threading.Thread | None = None
+_lock = threading.Lock()
+# process the loop was started by
+_pid: int | None = None
+_provider_semaphores: dict[ServiceProviderType, asyncio.Semaphore] = {}
+
+
+def start_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start the event loop of the worker process in a background thread.
+
+    Every task of the process runs its coroutines on this loop, so the Motor
+    client and its connection pool are created once and shared by them. The
+    loop starts with the first task of the process, or when a prefork child
+    starts, and sets the process up (see `setup_process`) in every pool.
+    """
+    global _loop, _thread, _pid
+    with _lock:
+        if _loop is not None and _pid != os.getpid():
+            # forked from a process with a loop, its thread didn't survive
+            _loop = None
+            _thread = None
+        if _loop is None:
+            with startup_phase("event loop"):
+                _loop = asyncio.new_event_loop()
+                _thread = threading.Thread(
+                    target=_loop.run_forever, name="worker-event-loop", daemon=True
+                )
+                _thread.start()
+                _pid = os.getpid()
+                # a client inherited from the parent process is bound to its loop
+                DatabaseWrapper.reset_wrapper()
+                DatabaseWrapper.set_event_loop(_loop)
+            LOGGER.info("Worker event loop started")
+            # tasks of other threads wait for the setup on the lock
+            try:
+                setup_process(_loop)
+            except Exception:
+                LOGGER.exception("Worker process setup failed")
+        return _loop
+
+
+def setup_process(loop: asyncio.AbstractEventLoop) -> None:
+    """One-time setup of the worker process, once its loop runs"""
+    with startup_phase("indexes"):
+        asyncio.run_coroutine_threadsafe(ensure_indexes(), loop).result()
+    with startup_phase("credentials files"):
+        remove_orphaned_credentials_files()
+
+
+def stop_loop(timeout: float | None = None) -> None:
+    """
+    Cancel the coroutines still running, close the Motor client and the loop.
+
+    If the coroutines haven't stopped after `timeout` seconds it is logged
+    and the loop is left running in its daemon thread, so they can still
+    interrupt their terraform commands while the process exits.
+    """
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), _loop).result(timeout)
+        except concurrent.futures.TimeoutError:
+            LOGGER.warning(f"Worker tasks didn't stop within {timeout} seconds")
+            return
+        _loop.call_soon_threadsafe(_loop.stop)
+        _thread.join(timeout)
+        _loop.close()
+        _loop = None
+        _thread = None
+        _provider_semaphores.clear()
+        LOGGER.info("Worker event loop stopped")
+
+
+def get_shutdown_timeout() -> float:
+    """Seconds the cancelled tasks get to interrupt their terraform commands"""
+    return settings.terraform_interrupt_grace_period + SHUTDOWN_MARGIN
+
+
+async def _shutdown() -> None:
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    DatabaseWrapper.close_client()
+    await asyncio.get_running_loop().shutdown_asyncgens()
+
+
+def run(coroutine: typing.Coroutine[typing.Any, typing.Any, T]) -> T:
+    """Run a coroutine on the worker event loop and wait for its result"""
+    loop = _loop or start_loop()
+    # spans of the coroutine belong to the transaction of the calling task
+    coroutine = in_hub(coroutine, sentry_sdk.Hub.current)
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+@contextlib.asynccontextmanager
+async def provider_slot(provider: ServiceProviderType):
+    """
+    Wait until fewer than `worker_provider_concurrency[provider]` tasks of the
+    process deploy to the provider. Providers without a limit never wait.
+    """
+    limit = settings.worker_provider_concurrency.get(provider)
+    if not limit:
+        yield
+        return
+    # only touched from the loop thread
+    if provider not in _provider_semaphores:
+        _provider_semaphores[provider] = asyncio.Semaphore(limit)
+    async with _provider_semaphores[provider]:
+        yield
+
+
+@celeryd_init.connect
+def on_worker_init(**kwargs):
+    # before the tasks are set up, so the celery integration traces them
+    with startup_phase("sentry"):
+        init_tracing()
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    # prefork children are set up before their first task, the pools without
+    # child processes start the loop with their first task
+    start_loop()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    # worker_shutdown covers the pools without child processes
+    stop_loop(timeout=get_shutdown_timeout())
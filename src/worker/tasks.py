@@ -1,28 +1,36 @@
-from asgiref.sync import async_to_sync
 from celery.utils.log import get_task_logger
 
-from api.models import JwtUserData, ProjectDeployCreate
-from database.db import DatabaseWrapper
-from database.manager import get_project_deploy_manager
+from api.models import JwtUserData, ProjectDeployCreate, ProjectDeployPlanCreate
+from database.manager import ProjectDeployManager, ProjectDeployPlanManager
 from database.models import (
     ProjectCredentialsDB,
     ProjectDB,
     ProjectDeployDB,
     get_project_deploy_database,
+    get_project_deploy_plan_database,
 )
 from shared.deployments import DEPLOYMENT_CLASSES
+from shared.models.deploys import ProjectDeployStatus
+from shared.models.jobs import DeployJobOperation, DeployJobStage
+from worker.batches import batch_item, batch_task
 from worker.celery import app
+from worker.deploys import deploy_status_on_error, finish_deploy_status
+from worker.jobs import DeployJobTracker
+from worker.loop import provider_slot, run
 
 LOGGER = get_task_logger(__name__)
 
 
 @app.task(bind=True)
+@batch_task(ProjectDeployStatus.PENDING, ProjectDeployStatus.FAILED)
 def deploy_datalake(
     self,
     jwt_user_data: dict,
     project_deploy: dict,
     project_db: dict,
     project_credentials: dict,
+    batch_id: str | None = None,
+    job_id: str | None = None,
 ):
     LOGGER.info("DEPLOY")
     jwt_user_data = JwtUserData(**jwt_user_data)
@@ -30,44 +38,163 @@ def deploy_datalake(
     project_db = ProjectDB(**project_db)
     project_credentials = ProjectCredentialsDB(**project_credentials)
 
-    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type]()
-    deploy_result = deployment_class.deploy_data_lake(project_db, project_credentials)
-    project_deploy.project_structure = deploy_result
-    project_deploy.project = project_db.id
+    tracker = DeployJobTracker(
+        job_id, project_db.id, DeployJobOperation.DEPLOY, project_db.owner, batch_id
+    )
+    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type](tracker)
 
-    # TODO: rewrite this. It will cause errors because of the concurrency
     async def update_project_deploy():
-        DatabaseWrapper.reset_wrapper()
-        project_deploy_manager = get_project_deploy_manager(
-            get_project_deploy_database()
-        )
-        await project_deploy_manager.create(project_deploy, jwt_user_data.user_id)
+        async with provider_slot(project_db.service_provider), batch_item(
+            batch_id, project_db.id
+        ), deploy_status_on_error(
+            project_db.id, ProjectDeployStatus.PENDING, ProjectDeployStatus.FAILED
+        ), tracker.job():
+            deploy_result = await deployment_class.deploy_data_lake(
+                project_db, project_credentials
+            )
 
-    async_to_sync(update_project_deploy)()
+            async with tracker.stage(DeployJobStage.DB_WRITE):
+                await finish_deploy_status(
+                    project_db.id, ProjectDeployStatus.PENDING, deploy_result.dict()
+                )
+                # plans created before the apply are outdated now
+                project_deploy_plan_manager = ProjectDeployPlanManager(
+                    get_project_deploy_plan_database()
+                )
+                await project_deploy_plan_manager.delete_by_project(project_db.id)
+
+    run(update_project_deploy())
     LOGGER.info("DEPLOY SUCCEEDED")
 
 
 @app.task(bind=True)
+def redeploy_datalake(
+    self,
+    jwt_user_data: dict,
+    project_deploy: dict,
+    project_db: dict,
+    project_credentials: dict,
+    job_id: str | None = None,
+):
+    LOGGER.info("REDEPLOY")
+    jwt_user_data = JwtUserData(**jwt_user_data)
+    project_deploy = ProjectDeployDB(**project_deploy)
+    project_db = ProjectDB(**project_db)
+    project_credentials = ProjectCredentialsDB(**project_credentials)
+
+    tracker = DeployJobTracker(
+        job_id, project_db.id, DeployJobOperation.REDEPLOY, project_db.owner
+    )
+    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type](tracker)
+
+    async def update_project_deploy():
+        # a failed update leaves the previous deploy
+        async with provider_slot(project_db.service_provider), deploy_status_on_error(
+            project_db.id, ProjectDeployStatus.UPDATING, ProjectDeployStatus.DEPLOYED
+        ), tracker.job():
+            deploy_result = await deployment_class.redeploy_data_lake(
+                project_db, project_credentials, project_deploy
+            )
+
+            async with tracker.stage(DeployJobStage.DB_WRITE):
+                await finish_deploy_status(
+                    project_db.id,
+                    ProjectDeployStatus.UPDATING,
+                    deploy_result.dict() if deploy_result else None,
+                )
+                if deploy_result is None:
+                    return
+                project_deploy_plan_manager = ProjectDeployPlanManager(
+                    get_project_deploy_plan_database()
+                )
+                await project_deploy_plan_manager.delete_by_project(project_db.id)
+
+    run(update_project_deploy())
+    LOGGER.info("REDEPLOY SUCCEEDED")
+
+
+@app.task(bind=True)
+def plan_datalake(
+    self,
+    jwt_user_data: dict,
+    project_deploy: dict,
+    project_db: dict,
+    project_credentials: dict,
+    deployed_project_deploy: dict | None = None,
+    job_id: str | None = None,
+):
+    LOGGER.info("PLAN")
+    jwt_user_data = JwtUserData(**jwt_user_data)
+    project_deploy = ProjectDeployCreate(**project_deploy)
+    project_db = ProjectDB(**project_db)
+    project_credentials = ProjectCredentialsDB(**project_credentials)
+    if deployed_project_deploy is not None:
+        deployed_project_deploy = ProjectDeployDB(**deployed_project_deploy)
+
+    tracker = DeployJobTracker(
+        job_id, project_db.id, DeployJobOperation.PLAN, project_db.owner
+    )
+    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type](tracker)
+
+    async def update_project_deploy_plan():
+        async with provider_slot(project_db.service_provider), tracker.job():
+            plan_preview = await deployment_class.plan_data_lake(
+                project_db, project_credentials, deployed_project_deploy
+            )
+
+            async with tracker.stage(DeployJobStage.DB_WRITE):
+                project_deploy_plan_manager = ProjectDeployPlanManager(
+                    get_project_deploy_plan_database()
+                )
+                await project_deploy_plan_manager.delete_by_project(project_db.id)
+                await project_deploy_plan_manager.create(
+                    ProjectDeployPlanCreate(
+                        **plan_preview.dict(),
+                        project=project_db.id,
+                        deploy_type=project_deploy.deploy_type,
+                    ),
+                    jwt_user_data.user_id,
+                )
+
+    run(update_project_deploy_plan())
+    LOGGER.info("PLAN SUCCEEDED")
+
+
+@app.task(bind=True)
+@batch_task(ProjectDeployStatus.DESTROYING, ProjectDeployStatus.FAILED)
 def destroy_datalake(
     self,
     project_deploy: dict,
     project_db: dict,
     project_credentials: dict,
+    batch_id: str | None = None,
+    job_id: str | None = None,
 ):
     LOGGER.info("DESTROY")
     project_deploy = ProjectDeployDB(**project_deploy)
     project_db = ProjectDB(**project_db)
     project_credentials = ProjectCredentialsDB(**project_credentials)
-    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type]()
-    deployment_class.delete_data_lake(project_db, project_credentials, project_deploy)
 
-    # TODO: rewrite this. It will cause errors because of the concurrency
+    tracker = DeployJobTracker(
+        job_id, project_db.id, DeployJobOperation.DESTROY, project_db.owner, batch_id
+    )
+    deployment_class = DEPLOYMENT_CLASSES[project_deploy.deploy_type](tracker)
+
     async def delete_project_deploy():
-        DatabaseWrapper.reset_wrapper()
-        project_deploy_manager = get_project_deploy_manager(
-            get_project_deploy_database()
-        )
-        await project_deploy_manager.delete(project_deploy)
+        async with provider_slot(project_db.service_provider), batch_item(
+            batch_id, project_db.id
+        ), deploy_status_on_error(
+            project_db.id, ProjectDeployStatus.DESTROYING, ProjectDeployStatus.FAILED
+        ), tracker.job():
+            await deployment_class.delete_data_lake(
+                project_db, project_credentials, project_deploy
+            )
+
+            async with tracker.stage(DeployJobStage.DB_WRITE):
+                project_deploy_manager = ProjectDeployManager(
+                    get_project_deploy_database()
+                )
+                await project_deploy_manager.delete(project_deploy)
 
-    async_to_sync(delete_project_deploy)()
+    run(delete_project_deploy())
     LOGGER.info("DESTROY SUCCEEDED")